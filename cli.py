@@ -11,6 +11,8 @@ from datetime import datetime
 # 加入專案根目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from services.chunk_service import ChunkService, ChunkSyncResult
+from services.semantic_search import SemanticSearchService
 from services.document_service import DocumentService
 from models.document import DocumentCategory
 
@@ -74,6 +76,41 @@ def cmd_upload(args):
     print(f"分類: {doc.category}")
 
 
+def cmd_upload_dir(args):
+    """批次上傳目錄或清單中的檔案"""
+    from services.batch_upload import (
+        failure_rows,
+        load_upload_items,
+        UploadCheckpoint,
+        UploadProgress,
+    )
+    
+    defaults = {
+        "department": args.department,
+        "category": args.category,
+        "uploaded_by": args.user,
+        "description": args.description,
+    }
+    checkpoint = UploadCheckpoint(args.checkpoint or os.path.abspath(args.source).rstrip(os.sep) + ".checkpoint")
+    items = [item for item in load_upload_items(args.source, defaults) if item.doc_code not in checkpoint]
+    if checkpoint.done:
+        print(f"依斷點紀錄略過已完成的 {len(checkpoint.done)} 筆: {checkpoint.path}")
+    print(f"準備上傳 {len(items)} 個檔案（{args.workers} 個並行）")
+    
+    progress = UploadProgress(len(items))
+    
+    def on_batch(batch_result):
+        checkpoint.record(batch_result)
+        progress(batch_result)
+    
+    service = DocumentService()
+    result = service.upload_files(items, workers=args.workers, batch_size=args.batch_size, on_batch=on_batch)
+    
+    if result.failed:
+        print(f"\n失敗 {len(result.failed)} 筆（重新執行相同命令即可重試）:")
+        print_table(["文件編號", "原因"], failure_rows(result))
+
+
 def cmd_version(args):
     """上傳新版本"""
     service = DocumentService()
@@ -91,17 +128,22 @@ def cmd_version(args):
 def cmd_list(args):
     """列出文件"""
     service = DocumentService()
-    
-    docs = service.search(
+    filters = dict(
         department=args.department,
         category=args.category,
         keyword=args.keyword,
         include_archived=args.archived
     )
     
-    if not docs:
-        print("沒有找到符合條件的文件")
-        return
+    next_cursor = None
+    if args.rank and args.keyword:
+        filters.pop("keyword")
+        docs = service.search_relevant(args.keyword, **filters, limit=args.page_size or 20)
+    elif args.page_size:
+        page = service.search_page(**filters, page_size=args.page_size, cursor=args.cursor)
+        docs, next_cursor = page.items, page.next_cursor
+    else:
+        docs = service.iter_search(**filters)
     
     headers = ["編號", "標題", "部門", "分類", "版本", "狀態", "更新時間"]
     rows = []
@@ -117,8 +159,14 @@ def cmd_list(args):
             format_date(doc.updated_at)
         ])
     
-    print(f"\n共找到 {len(docs)} 筆文件:\n")
+    if not rows:
+        print("沒有找到符合條件的文件")
+        return
+    
+    print(f"\n共找到 {len(rows)} 筆文件:\n")
     print_table(headers, rows)
+    if next_cursor:
+        print(f"\n下一頁: --cursor {next_cursor}")
 
 
 def cmd_info(args):
@@ -149,7 +197,7 @@ def cmd_info(args):
     headers = ["版本", "檔案名稱", "大小", "上傳者", "上傳時間", "說明"]
     rows = []
     
-    for v in doc.versions:
+    for v in service.get_version_history(doc.doc_code):
         rows.append([
             f"v{v.version}",
             v.file_name,
@@ -170,7 +218,8 @@ def cmd_download(args):
     file_path = service.download_file(
         doc_code=args.code,
         version_num=args.version,
-        save_path=args.output
+        save_path=args.output,
+        resume=args.resume
     )
     
     print(f"檔案已儲存至: {file_path}")
@@ -191,13 +240,18 @@ def cmd_restore(args):
 def cmd_stats(args):
     """顯示統計"""
     service = DocumentService()
-    stats = service.get_statistics()
+    if args.rebuild:
+        service.rebuild_statistics()
+        print("✓ 統計計數器已重建")
+    stats = service.get_statistics(detailed=args.detailed)
     
     print("\n" + "=" * 50)
     print("KM 文件管理系統統計")
     print("=" * 50)
     print(f"\n總文件數: {stats['total_documents']}")
     print(f"總版本數: {stats['total_versions']}")
+    print(f"實際儲存: {format_size(stats['stored_bytes'])}")
+    print(f"去重節省: {format_size(stats['bytes_saved'])}")
     
     if stats['by_department']:
         print("\n依部門統計:")
@@ -214,6 +268,19 @@ def cmd_stats(args):
         for status, count in stats['by_status'].items():
             print(f"  {status}: {count}")
     
+    if args.detailed:
+        print("\n依檔案類型容量:")
+        for file_type, size in stats['bytes_by_file_type'].items():
+            print(f"  {file_type}: {format_size(size)}")
+        
+        print("\n各部門版本數:")
+        for dept, count in stats['versions_by_department'].items():
+            print(f"  {dept}: {count}")
+        
+        print("\n每日上傳數:")
+        for day, count in stats['uploads_by_day'].items():
+            print(f"  {day}: {count}")
+    
     print("=" * 50)
 
 
@@ -233,6 +300,147 @@ def cmd_delete(args):
         print(f"找不到文件: {args.code}")
 
 
+def bulk_selection_args(args):
+    """由命令列參數組出批次操作的文件編號與查詢條件"""
+    codes = list(args.codes or [])
+    if args.codes_file:
+        with open(args.codes_file, encoding="utf-8") as f:
+            codes.extend(line.strip() for line in f if line.strip())
+    
+    query = {}
+    if args.department:
+        query["department"] = args.department
+    if args.category:
+        query["category"] = args.category
+    if args.status:
+        query["status"] = args.status
+    
+    if not codes and not query:
+        raise ValueError("請指定 --codes、--codes-file 或篩選條件（--department / --category / --status）")
+    return codes or None, query or None
+
+
+def cmd_bulk_archive(args):
+    """批次歸檔文件"""
+    service = DocumentService()
+    codes, query = bulk_selection_args(args)
+    service.archive_many(codes, query)
+
+
+def cmd_bulk_restore(args):
+    """批次恢復文件"""
+    service = DocumentService()
+    codes, query = bulk_selection_args(args)
+    service.restore_many(codes, query)
+
+
+def cmd_bulk_metadata(args):
+    """批次更新 Metadata"""
+    service = DocumentService()
+    codes, query = bulk_selection_args(args)
+    
+    metadata = {}
+    for item in args.set:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise ValueError(f"格式應為 KEY=VALUE: {item}")
+        metadata[key] = value
+    service.update_metadata_many(metadata, codes, query, merge=not args.replace)
+
+
+def cmd_bulk_delete(args):
+    """批次刪除文件"""
+    service = DocumentService()
+    codes, query = bulk_selection_args(args)
+    
+    if not args.force:
+        confirm = input("確定要刪除所有符合條件的文件？此操作無法復原 (y/N): ")
+        if confirm.lower() != 'y':
+            print("已取消")
+            return
+    
+    service.delete_many(codes, query, delete_files=not args.keep_files)
+
+
+def cmd_chunk_load(args):
+    """載入 AI 處理後的 chunks 檔案"""
+    service = ChunkService()
+    service.ensure_indexes()
+    
+    paths = []
+    for source in args.sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(
+                os.path.join(source, name) for name in os.listdir(source) if name.endswith("_chunks.json")
+            ))
+        else:
+            paths.append(source)
+    if not paths:
+        raise ValueError("找不到 *_chunks.json 檔案")
+    
+    result = ChunkSyncResult()
+    for path in paths:
+        result.merge(service.load_file(path))
+    print(f"\n共載入 {len(paths)} 個檔案，寫入 {result.written} 筆、未變更 {result.unchanged} 筆 chunks")
+
+
+def cmd_chunk_embed(args):
+    """計算條款 chunks 的向量（語意搜尋用）"""
+    service = SemanticSearchService()
+    service.ensure_indexes()
+    result = service.sync_embeddings(args.doc, force=args.force)
+    print(f"✓ 向量（{service.embedder.name}）: 計算 {result.embedded} 筆、"
+          f"未變更 {result.unchanged} 筆、刪除 {result.deleted} 筆")
+    
+    if args.build_ann:
+        index = service.build_ann_index(nlist=args.nlist)
+        print(f"✓ 已建立 ANN 索引: {service.ann_path}（{len(index)} 筆向量、{index.meta['nlist']} 群）")
+    elif service.ann_index() is not None:
+        index = service.ann_index()
+        if index.removed_count > len(index) * 0.2:
+            print(f"! ANN 索引中已刪除的向量達 {index.removed_count} 筆，建議以 --build-ann 重新建立")
+
+
+def cmd_chunk_search(args):
+    """查詢條款 chunks"""
+    service = ChunkService()
+    
+    if args.query:
+        hits = SemanticSearchService().search(args.query, args.limit or 10, args.doc)
+        if not hits:
+            print("沒有找到符合條件的條款（請先執行 chunk-embed）")
+            return
+        headers = ["Chunk", "條款", "標題", "相似度"]
+        rows = [[chunk.chunk_id, chunk.article_number, chunk.title, f"{score:.3f}"] for chunk, score in hits]
+        print(f"\n共找到 {len(rows)} 筆條款:\n")
+        print_table(headers, rows)
+        return
+    
+    if args.article:
+        chunk = service.get_article(args.article, args.doc)
+        chunks = [chunk] if chunk else []
+        if chunk and args.related:
+            chunks.extend(service.get_related_articles(args.article, args.doc))
+    elif args.keyword:
+        chunks = service.search_by_keyword(args.keyword, args.partial, args.doc, args.limit)
+    elif args.entity:
+        chunks = service.search_by_entity(args.entity, args.entity_type, args.partial, args.doc, args.limit)
+    else:
+        raise ValueError("請指定 --keyword、--entity、--article 或 --query")
+    
+    if not chunks:
+        print("沒有找到符合條件的條款")
+        return
+    
+    headers = ["Chunk", "條款", "標題", "摘要"]
+    rows = [
+        [chunk.chunk_id, chunk.article_number, chunk.title, chunk.summary[:40]]
+        for chunk in chunks
+    ]
+    print(f"\n共找到 {len(rows)} 筆條款:\n")
+    print_table(headers, rows)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="KM 文件管理系統 CLI",
@@ -242,6 +450,9 @@ def main():
   # 上傳新文件
   python cli.py upload -f doc.pdf -c HR-001 -t "請假規定" -d 人力資源部 -cat 規章 -u admin
 
+  # 批次上傳整個目錄（檔名即文件編號，中斷後重新執行會從斷點繼續）
+  python cli.py upload-dir ./sop/ -d 人力資源部 -cat SOP -u admin -w 8
+
   # 上傳新版本
   python cli.py version -c HR-001 -f doc_v2.pdf -u admin -desc "更新請假天數"
 
@@ -260,8 +471,26 @@ def main():
   # 歸檔文件
   python cli.py archive -c HR-001
 
+  # 批次歸檔某部門的 SOP
+  python cli.py bulk-archive -d 人力資源部 -cat SOP
+
+  # 批次更新 Metadata（編號清單檔每行一個編號）
+  python cli.py bulk-metadata --codes-file codes.txt --set owner=王小明
+
   # 查看統計
   python cli.py stats
+
+  # 載入 AI 處理後的條款 chunks，再依關鍵字 / 實體 / 條款查詢
+  python cli.py chunk-load data/processed/
+  python cli.py chunk-search -k 加班 --partial
+  python cli.py chunk-search -a 第30條 --related
+
+  # 計算 chunks 的向量後語意搜尋
+  python cli.py chunk-embed
+  python cli.py chunk-search -q "加班費怎麼計算" -n 5
+
+  # 向量很多時建立 ANN 索引（ANN_INDEX_PATH=data/ann_index）
+  python cli.py chunk-embed --build-ann
         """
     )
     
@@ -282,6 +511,18 @@ def main():
     upload_parser.add_argument("-o", "--owner", help="文件負責人")
     upload_parser.set_defaults(func=cmd_upload)
     
+    # upload-dir 命令
+    upload_dir_parser = subparsers.add_parser("upload-dir", help="批次上傳目錄或清單中的檔案")
+    upload_dir_parser.add_argument("source", help="目錄、CSV 清單或 manifest.json")
+    upload_dir_parser.add_argument("-d", "--department", help="所屬部門（清單未指定時使用）")
+    upload_dir_parser.add_argument("-cat", "--category", help="分類（清單未指定時使用）")
+    upload_dir_parser.add_argument("-u", "--user", help="上傳者（清單未指定時使用）")
+    upload_dir_parser.add_argument("-desc", "--description", help="版本說明")
+    upload_dir_parser.add_argument("-w", "--workers", type=int, default=4, help="同時上傳的檔案數")
+    upload_dir_parser.add_argument("-b", "--batch-size", type=int, help="每批寫入的筆數")
+    upload_dir_parser.add_argument("--checkpoint", help="斷點紀錄檔（預設為 <來源>.checkpoint）")
+    upload_dir_parser.set_defaults(func=cmd_upload_dir)
+    
     # version 命令
     version_parser = subparsers.add_parser("version", help="上傳新版本")
     version_parser.add_argument("-c", "--code", required=True, help="文件編號")
@@ -296,6 +537,9 @@ def main():
     list_parser.add_argument("-cat", "--category", help="分類篩選")
     list_parser.add_argument("-k", "--keyword", help="關鍵字搜尋")
     list_parser.add_argument("-a", "--archived", action="store_true", help="包含已歸檔文件")
+    list_parser.add_argument("-n", "--page-size", type=int, help="每頁筆數（不指定則列出全部）")
+    list_parser.add_argument("--cursor", help="上一頁輸出的分頁游標")
+    list_parser.add_argument("--rank", action="store_true", help="關鍵字搜尋依相關度排序")
     list_parser.set_defaults(func=cmd_list)
     
     # info 命令
@@ -307,7 +551,8 @@ def main():
     download_parser = subparsers.add_parser("download", help="下載文件")
     download_parser.add_argument("-c", "--code", required=True, help="文件編號")
     download_parser.add_argument("-v", "--version", type=int, help="版本號（預設最新）")
-    download_parser.add_argument("-o", "--output", help="輸出路徑")
+    download_parser.add_argument("-o", "--output", help="輸出路徑或目錄")
+    download_parser.add_argument("-r", "--resume", action="store_true", help="接續中斷的下載")
     download_parser.set_defaults(func=cmd_download)
     
     # archive 命令
@@ -322,6 +567,8 @@ def main():
     
     # stats 命令
     stats_parser = subparsers.add_parser("stats", help="顯示統計")
+    stats_parser.add_argument("--rebuild", action="store_true", help="由文件資料重建統計計數器")
+    stats_parser.add_argument("--detailed", action="store_true", help="顯示檔案類型容量、各部門版本數與每日上傳數")
     stats_parser.set_defaults(func=cmd_stats)
     
     # delete 命令
@@ -330,6 +577,67 @@ def main():
     delete_parser.add_argument("-f", "--force", action="store_true", help="強制刪除不確認")
     delete_parser.set_defaults(func=cmd_delete)
     
+    # 批次命令共用的選取條件
+    selection_parser = argparse.ArgumentParser(add_help=False)
+    selection_parser.add_argument("-c", "--codes", nargs="+", help="文件編號")
+    selection_parser.add_argument("--codes-file", help="文件編號清單檔（每行一個）")
+    selection_parser.add_argument("-d", "--department", help="部門篩選")
+    selection_parser.add_argument("-cat", "--category", help="分類篩選")
+    selection_parser.add_argument("-s", "--status", help="狀態篩選")
+    
+    # bulk-archive 命令
+    bulk_archive_parser = subparsers.add_parser("bulk-archive", parents=[selection_parser],
+                                                help="批次歸檔文件")
+    bulk_archive_parser.set_defaults(func=cmd_bulk_archive)
+    
+    # bulk-restore 命令
+    bulk_restore_parser = subparsers.add_parser("bulk-restore", parents=[selection_parser],
+                                                help="批次恢復文件")
+    bulk_restore_parser.set_defaults(func=cmd_bulk_restore)
+    
+    # bulk-metadata 命令
+    bulk_metadata_parser = subparsers.add_parser("bulk-metadata", parents=[selection_parser],
+                                                 help="批次更新 Metadata")
+    bulk_metadata_parser.add_argument("--set", action="append", required=True, metavar="KEY=VALUE",
+                                      help="要設定的欄位（可重複指定）")
+    bulk_metadata_parser.add_argument("--replace", action="store_true", help="完全覆蓋現有 Metadata")
+    bulk_metadata_parser.set_defaults(func=cmd_bulk_metadata)
+    
+    # bulk-delete 命令
+    bulk_delete_parser = subparsers.add_parser("bulk-delete", parents=[selection_parser],
+                                               help="批次刪除文件（慎用）")
+    bulk_delete_parser.add_argument("-f", "--force", action="store_true", help="強制刪除不確認")
+    bulk_delete_parser.add_argument("--keep-files", action="store_true", help="保留 GridFS 中的檔案")
+    bulk_delete_parser.set_defaults(func=cmd_bulk_delete)
+    
+    # chunk-load 命令
+    chunk_load_parser = subparsers.add_parser("chunk-load", help="載入條款 chunks")
+    chunk_load_parser.add_argument("sources", nargs="+", help="*_chunks.json 檔案或所在目錄")
+    chunk_load_parser.set_defaults(func=cmd_chunk_load)
+    
+    # chunk-embed 命令
+    chunk_embed_parser = subparsers.add_parser("chunk-embed", help="計算條款 chunks 的向量")
+    chunk_embed_parser.add_argument("--doc", help="只計算指定文件 ID")
+    chunk_embed_parser.add_argument("--force", action="store_true", help="重新計算所有向量")
+    chunk_embed_parser.add_argument("--build-ann", action="store_true",
+                                    help="建立（重新訓練）ANN 索引（需設定 ANN_INDEX_PATH）")
+    chunk_embed_parser.add_argument("--nlist", type=int, default=None, help="ANN 索引的分群數")
+    chunk_embed_parser.set_defaults(func=cmd_chunk_embed)
+    
+    # chunk-search 命令
+    chunk_search_parser = subparsers.add_parser("chunk-search", help="查詢條款 chunks")
+    chunk_search_group = chunk_search_parser.add_mutually_exclusive_group(required=True)
+    chunk_search_group.add_argument("-k", "--keyword", help="關鍵字")
+    chunk_search_group.add_argument("-e", "--entity", help="實體值")
+    chunk_search_group.add_argument("-a", "--article", help="條款編號，如 第30條")
+    chunk_search_group.add_argument("-q", "--query", help="語意搜尋的查詢文字（預設 10 筆）")
+    chunk_search_parser.add_argument("--entity-type", help="實體類型，如 角色")
+    chunk_search_parser.add_argument("--doc", help="只查詢指定文件 ID，如 LAW-001")
+    chunk_search_parser.add_argument("--partial", action="store_true", help="部分相符")
+    chunk_search_parser.add_argument("--related", action="store_true", help="一併列出相關條款（搭配 --article）")
+    chunk_search_parser.add_argument("-n", "--limit", type=int, default=0, help="最多筆數")
+    chunk_search_parser.set_defaults(func=cmd_chunk_search)
+    
     args = parser.parse_args()
     
     if args.command is None:
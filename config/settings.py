@@ -3,7 +3,13 @@ KM Document Management System - Configuration Settings
 """
 import os
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Any, Dict, Optional
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    """讀取可省略的整數環境變數"""
+    value = os.getenv(name)
+    return int(value) if value else None
 
 
 @dataclass
@@ -16,11 +22,63 @@ class Settings:
     mongo_username: Optional[str] = field(default_factory=lambda: os.getenv("MONGO_USERNAME"))
     mongo_password: Optional[str] = field(default_factory=lambda: os.getenv("MONGO_PASSWORD"))
     
+    # MongoDB 連線池設定（未設定者使用 pymongo 預設值）
+    mongo_max_pool_size: int = field(default_factory=lambda: int(os.getenv("MONGO_MAX_POOL_SIZE", "100")))
+    mongo_min_pool_size: int = field(default_factory=lambda: int(os.getenv("MONGO_MIN_POOL_SIZE", "0")))
+    mongo_max_idle_time_ms: Optional[int] = field(default_factory=lambda: _env_optional_int("MONGO_MAX_IDLE_TIME_MS"))
+    mongo_server_selection_timeout_ms: int = field(default_factory=lambda: int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000")))
+    mongo_connect_timeout_ms: int = field(default_factory=lambda: int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000")))
+    mongo_socket_timeout_ms: Optional[int] = field(default_factory=lambda: _env_optional_int("MONGO_SOCKET_TIMEOUT_MS"))
+    # 傳輸壓縮，依序協商，如 "zstd,snappy,zlib"（zstd/snappy 需安裝 zstandard/python-snappy）
+    mongo_compressors: str = field(default_factory=lambda: os.getenv("MONGO_COMPRESSORS", ""))
+    mongo_read_preference: str = field(default_factory=lambda: os.getenv("MONGO_READ_PREFERENCE", "primary"))
+    # 搜尋等讀取專用連線（reads）的讀取偏好
+    mongo_search_read_preference: str = field(default_factory=lambda: os.getenv("MONGO_SEARCH_READ_PREFERENCE", "secondaryPreferred"))
+    
     # 資料庫名稱
     database_name: str = field(default_factory=lambda: os.getenv("MONGO_DATABASE", "km_system"))
     
     # Collection 名稱
     documents_collection: str = "documents"
+    blobs_collection: str = "blobs"
+    stats_collection: str = "stats"
+    versions_collection: str = "versions"
+    chunks_collection: str = "chunks"
+    chunk_sources_collection: str = "chunk_sources"
+    chunk_embeddings_collection: str = "chunk_embeddings"
+    
+    # 新文件的版本歷史儲存方式：embedded（內嵌陣列）或 split（versions collection）
+    version_layout: str = field(default_factory=lambda: os.getenv("VERSION_LAYOUT", "embedded"))
+    
+    # GridFS 設定
+    gridfs_chunk_size: int = field(default_factory=lambda: int(os.getenv("GRIDFS_CHUNK_SIZE", str(255 * 1024))))
+    
+    # 寫入 GridFS 時的壓縮方式（none / zlib / zstd），已是壓縮格式的檔案類型不壓縮
+    compression: str = field(default_factory=lambda: os.getenv("COMPRESSION", "none"))
+    compression_level: int = field(default_factory=lambda: int(os.getenv("COMPRESSION_LEVEL", "3")))
+    
+    # 文字類檔案的新版本只儲存與前一版的差異，每隔 interval 個版本存一次完整快照
+    delta_storage: bool = field(default_factory=lambda: os.getenv("DELTA_STORAGE", "false").lower() in ("1", "true", "yes"))
+    delta_snapshot_interval: int = field(default_factory=lambda: int(os.getenv("DELTA_SNAPSHOT_INTERVAL", "10")))
+    # 超過此大小（bytes）的檔案不比對差異
+    delta_max_size: int = field(default_factory=lambda: int(os.getenv("DELTA_MAX_SIZE", str(16 * 1024 * 1024))))
+    
+    # chunk 語意搜尋的向量嵌入方式（hashing 為本機字元 n-gram 雜湊，不需外部服務）與維度
+    embedding_model: str = field(default_factory=lambda: os.getenv("EMBEDDING_MODEL", "hashing"))
+    embedding_dim: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_DIM", "512")))
+    # chunk 向量的 ANN 索引（IVF-PQ）目錄，建立後語意搜尋改用此索引（空字串表示不使用）
+    ann_index_path: str = field(default_factory=lambda: os.getenv("ANN_INDEX_PATH", ""))
+    ann_nprobe: int = field(default_factory=lambda: int(os.getenv("ANN_NPROBE", "16")))
+    ann_rerank: int = field(default_factory=lambda: int(os.getenv("ANN_RERANK", "16")))
+    
+    # get_by_doc_code 快取（筆數為 0 則停用，TTL 單位為秒）；預設停用，
+    # 多行程部署時其他行程的寫入只有 watch() 監聽 change stream 才會失效快取
+    doc_cache_size: int = field(default_factory=lambda: int(os.getenv("DOC_CACHE_SIZE", "0")))
+    doc_cache_ttl: float = field(default_factory=lambda: float(os.getenv("DOC_CACHE_TTL", "60")))
+    
+    # 批次作業設定
+    bulk_batch_size: int = field(default_factory=lambda: int(os.getenv("BULK_BATCH_SIZE", "500")))
+    lookup_batch_size: int = field(default_factory=lambda: int(os.getenv("LOOKUP_BATCH_SIZE", "1000")))
     
     @property
     def connection_string(self) -> str:
@@ -28,6 +86,23 @@ class Settings:
         if self.mongo_username and self.mongo_password:
             return f"mongodb://{self.mongo_username}:{self.mongo_password}@{self.mongo_host}:{self.mongo_port}/"
         return f"mongodb://{self.mongo_host}:{self.mongo_port}/"
+    
+    def client_options(self) -> Dict[str, Any]:
+        """產生 MongoClient 連線池與逾時參數"""
+        options: Dict[str, Any] = {
+            "maxPoolSize": self.mongo_max_pool_size,
+            "minPoolSize": self.mongo_min_pool_size,
+            "serverSelectionTimeoutMS": self.mongo_server_selection_timeout_ms,
+            "connectTimeoutMS": self.mongo_connect_timeout_ms,
+            "readPreference": self.mongo_read_preference,
+        }
+        if self.mongo_max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.mongo_max_idle_time_ms
+        if self.mongo_socket_timeout_ms is not None:
+            options["socketTimeoutMS"] = self.mongo_socket_timeout_ms
+        if self.mongo_compressors:
+            options["compressors"] = self.mongo_compressors
+        return options
 
 
 # 全域設定實例
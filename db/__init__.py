@@ -1,4 +1,23 @@
 # Database module
-from .connection import MongoDBConnection, get_db_connection
+from .connection import (
+    MongoDBConnection,
+    ConnectionManager,
+    get_db_connection,
+    get_connection_manager,
+    DEFAULT_CONNECTION,
+    READ_CONNECTION,
+)
+from .async_connection import AsyncMongoDBConnection, get_async_db_connection
+from .monitoring import PoolStatsListener
 
-__all__ = ["MongoDBConnection", "get_db_connection"]
+__all__ = [
+    "MongoDBConnection",
+    "ConnectionManager",
+    "get_db_connection",
+    "get_connection_manager",
+    "DEFAULT_CONNECTION",
+    "READ_CONNECTION",
+    "AsyncMongoDBConnection",
+    "get_async_db_connection",
+    "PoolStatsListener",
+]
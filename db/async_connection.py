@@ -0,0 +1,126 @@
+"""
+KM Document Management System - Async MongoDB Connection
+以 pymongo 原生 asyncio 驅動（AsyncMongoClient）建立連線
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from gridfs import AsyncGridFSBucket
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+
+from config.settings import get_settings, Settings
+from db.monitoring import PoolStatsListener
+
+
+class AsyncMongoDBConnection:
+    """非同步 MongoDB 連線"""
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self.pid = os.getpid()
+        self._settings = settings or get_settings()
+        self._pool_listener = PoolStatsListener()
+        self._client: Optional[AsyncMongoClient] = AsyncMongoClient(
+            self._settings.connection_string,
+            event_listeners=[self._pool_listener],
+            **self._settings.client_options()
+        )
+        self._db: AsyncDatabase = self._client[self._settings.database_name]
+        self._fs = AsyncGridFSBucket(self._db)
+
+    @property
+    def client(self) -> AsyncMongoClient:
+        """取得 AsyncMongoClient"""
+        return self._client
+
+    @property
+    def db(self) -> AsyncDatabase:
+        """取得資料庫實例"""
+        return self._db
+
+    @property
+    def fs(self) -> AsyncGridFSBucket:
+        """取得 GridFS Bucket"""
+        return self._fs
+
+    @property
+    def documents(self) -> AsyncCollection:
+        """取得 documents Collection"""
+        return self._db[get_settings().documents_collection]
+
+    @property
+    def blobs(self) -> AsyncCollection:
+        """取得 blobs Collection"""
+        return self._db[get_settings().blobs_collection]
+
+    @property
+    def versions(self) -> AsyncCollection:
+        """取得 versions Collection（split 版面的版本歷史）"""
+        return self._db[get_settings().versions_collection]
+
+    @property
+    def stats(self) -> AsyncCollection:
+        """取得 stats Collection（統計計數器）"""
+        return self._db[get_settings().stats_collection]
+
+    @property
+    def chunks(self) -> AsyncCollection:
+        """取得 chunks Collection（AI 處理後的條款 chunks）"""
+        return self._db[get_settings().chunks_collection]
+
+    @property
+    def chunk_sources(self) -> AsyncCollection:
+        """取得 chunk_sources Collection（各文件已載入的 manifest 版本）"""
+        return self._db[get_settings().chunk_sources_collection]
+    
+    @property
+    def chunk_embeddings(self) -> AsyncCollection:
+        """取得 chunk_embeddings Collection（chunk 的向量嵌入）"""
+        return self._db[get_settings().chunk_embeddings_collection]
+
+    @property
+    def closed(self) -> bool:
+        """連線是否已關閉"""
+        return self._client is None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """取得連線池統計"""
+        stats: Dict[str, Any] = self._pool_listener.snapshot()
+        stats["max_pool_size"] = self._settings.mongo_max_pool_size
+        stats["min_pool_size"] = self._settings.mongo_min_pool_size
+        return stats
+
+    async def ping(self) -> bool:
+        """測試連線狀態"""
+        try:
+            await self._client.admin.command("ping")
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        """關閉連線"""
+        if self._client:
+            await self._client.close()
+            self._client = None
+
+
+# 全域非同步連線（每個行程各自建立）
+_async_connection: Optional[AsyncMongoDBConnection] = None
+_lock = threading.Lock()
+
+
+def get_async_db_connection(settings: Optional[Settings] = None) -> AsyncMongoDBConnection:
+    """取得非同步資料庫連線實例"""
+    global _async_connection
+    conn = _async_connection
+    if conn is not None and not conn.closed and conn.pid == os.getpid():
+        return conn
+    with _lock:
+        conn = _async_connection
+        if conn is None or conn.closed or conn.pid != os.getpid():
+            conn = AsyncMongoDBConnection(settings)
+            _async_connection = conn
+        return conn
@@ -1,86 +1,331 @@
 """
 KM Document Management System - MongoDB Connection Manager
 """
-from typing import Optional
+import dataclasses
+import os
+import threading
+from typing import Any, Dict, Optional
 from pymongo import MongoClient
 from pymongo.database import Database
 from pymongo.collection import Collection
 from gridfs import GridFS
 
 from config.settings import get_settings, Settings
+from db.monitoring import PoolStatsListener
+
+
+# 具名連線：寫入/一般查詢使用 default，搜尋等可容忍延遲的讀取使用 reads
+DEFAULT_CONNECTION = "default"
+READ_CONNECTION = "reads"
 
 
 class MongoDBConnection:
-    """MongoDB 連線管理類別（單例模式）"""
+    """
+    MongoDB 連線（由 ConnectionManager 依名稱管理）
+    
+    記錄建立連線的 PID：fork 後在子行程第一次使用時重新建立 MongoClient，
+    因此服務物件持有的連線（DocumentService.conn、FileStore.conn 等）
+    不會沿用父行程的連線池。
+    """
     
-    _instance: Optional["MongoDBConnection"] = None
     _client: Optional[MongoClient] = None
     _db: Optional[Database] = None
     _fs: Optional[GridFS] = None
     
-    def __new__(cls, settings: Optional[Settings] = None):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-    
-    def __init__(self, settings: Optional[Settings] = None):
-        if self._client is None:
-            self._settings = settings or get_settings()
-            self._connect()
+    def __init__(self, settings: Optional[Settings] = None, name: str = DEFAULT_CONNECTION):
+        self.name = name
+        self._settings = settings or get_settings()
+        self._connect()
     
     def _connect(self) -> None:
         """建立資料庫連線"""
-        self._client = MongoClient(self._settings.connection_string)
+        self._pool_listener = PoolStatsListener()
+        self._client = MongoClient(
+            self._settings.connection_string,
+            event_listeners=[self._pool_listener],
+            **self._settings.client_options()
+        )
         self._db = self._client[self._settings.database_name]
         self._fs = GridFS(self._db)
+        # 連線建立完成後才記錄 PID：其他執行緒看到新的 PID 時一定取得新的 MongoClient
+        self.pid = os.getpid()
         print(f"✓ 已連線到 MongoDB: {self._settings.database_name}")
+        
+        if self._settings.mongo_min_pool_size > 0:
+            self.warm_up()
+    
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        """
+        預先建立連線，避免第一批請求等待連線建立
+        
+        以多個執行緒同時 ping，讓連線池一次開出所需連線。
+        
+        Args:
+            connections: 要建立的連線數（預設為 minPoolSize）
+        
+        Returns:
+            int: 目前已開啟的連線數
+        """
+        count = connections or self._settings.mongo_min_pool_size
+        if count <= 0:
+            return int(self._pool_listener.snapshot()["connections_open"])
+        
+        barrier = threading.Barrier(count)
+        
+        def ping() -> None:
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            self.ping()
+        
+        threads = [threading.Thread(target=ping, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        opened = int(self._pool_listener.snapshot()["connections_open"])
+        print(f"✓ 連線池預熱完成: {opened} 條連線")
+        return opened
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        取得連線池統計
+        
+        Returns:
+            dict: 連線建立/關閉/借出數、等待時間與連線池設定
+        """
+        stats: Dict[str, Any] = self._pool_listener.snapshot()
+        stats["max_pool_size"] = self._settings.mongo_max_pool_size
+        stats["min_pool_size"] = self._settings.mongo_min_pool_size
+        return stats
+    
+    def _check_pid(self) -> None:
+        """
+        偵測 fork：子行程捨棄父行程的 MongoClient（不在子行程關閉）並重新連線
+
+        重新連線時持有 ConnectionManager 的鎖，子行程中多個執行緒同時使用只會建立一個 MongoClient
+        """
+        if self.pid == os.getpid() or self._client is None:
+            return
+        with _manager.lock:
+            if self.pid != os.getpid() and self._client is not None:
+                self._connect()
     
     @property
     def client(self) -> MongoClient:
         """取得 MongoDB Client"""
+        self._check_pid()
         return self._client
     
+    @property
+    def pool_listener(self) -> PoolStatsListener:
+        """取得連線池事件監聽器（可輸出 Prometheus 格式）"""
+        return self._pool_listener
+    
     @property
     def db(self) -> Database:
         """取得資料庫實例"""
+        self._check_pid()
         return self._db
     
     @property
     def fs(self) -> GridFS:
         """取得 GridFS 實例"""
+        self._check_pid()
         return self._fs
     
     @property
     def documents(self) -> Collection:
         """取得 documents Collection"""
-        return self._db[get_settings().documents_collection]
+        return self.db[get_settings().documents_collection]
+    
+    @property
+    def blobs(self) -> Collection:
+        """取得 blobs Collection（內容雜湊 → GridFS 檔案與參照計數）"""
+        return self.db[get_settings().blobs_collection]
+    
+    @property
+    def versions(self) -> Collection:
+        """取得 versions Collection（split 版面的版本歷史）"""
+        return self.db[get_settings().versions_collection]
+    
+    @property
+    def stats(self) -> Collection:
+        """取得 stats Collection（統計計數器）"""
+        return self.db[get_settings().stats_collection]
+    
+    @property
+    def chunks(self) -> Collection:
+        """取得 chunks Collection（AI 處理後的條款 chunks）"""
+        return self.db[get_settings().chunks_collection]
+    
+    @property
+    def chunk_sources(self) -> Collection:
+        """取得 chunk_sources Collection（各文件已載入的 manifest 版本）"""
+        return self.db[get_settings().chunk_sources_collection]
+    
+    @property
+    def chunk_embeddings(self) -> Collection:
+        """取得 chunk_embeddings Collection（chunk 的向量嵌入）"""
+        return self.db[get_settings().chunk_embeddings_collection]
     
     def close(self) -> None:
         """關閉連線"""
         if self._client:
-            self._client.close()
+            if self.pid == os.getpid():
+                self._client.close()
             self._client = None
             self._db = None
             self._fs = None
-            MongoDBConnection._instance = None
             print("✓ 已關閉 MongoDB 連線")
     
+    @property
+    def closed(self) -> bool:
+        """連線是否已關閉"""
+        return self._client is None
+    
     def ping(self) -> bool:
         """測試連線狀態"""
         try:
-            self._client.admin.command('ping')
+            self.client.admin.command('ping')
             return True
         except Exception:
             return False
 
 
-# 全域連線實例
-_connection: Optional[MongoDBConnection] = None
+class ConnectionManager:
+    """
+    具名連線管理（執行緒安全、fork 安全）
+    
+    - 以鎖保護建立流程，多執行緒同時取得連線只會建立一個 MongoClient
+    - 偵測 PID 變化（並註冊 os.register_at_fork），子行程自動重新建立連線，
+      不會沿用父行程的 MongoClient；已交給服務物件的連線於下次使用時各自重新連線
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._settings: Dict[str, Settings] = {}
+        self._connections: Dict[str, MongoDBConnection] = {}
+    
+    def configure(self, name: str, settings: Optional[Settings] = None, **overrides: Any) -> None:
+        """
+        設定具名連線
+        
+        Args:
+            name: 連線名稱
+            settings: 連線設定（預設為全域設定）
+            **overrides: 覆寫的設定欄位，如 mongo_read_preference="secondaryPreferred"
+        """
+        settings = settings or get_settings()
+        if overrides:
+            settings = dataclasses.replace(settings, **overrides)
+        with self._lock:
+            self._settings[name] = settings
+            # 設定變更後，下次取得時重新建立
+            conn = self._connections.pop(name, None)
+        if conn is not None and conn.pid == os.getpid():
+            conn.close()
+    
+    def get(self, name: str = DEFAULT_CONNECTION, settings: Optional[Settings] = None) -> MongoDBConnection:
+        """取得具名連線（不存在時建立）"""
+        self._check_pid()
+        conn = self._connections.get(name)
+        if conn is not None and not conn.closed:
+            return conn
+        
+        with self._lock:
+            conn = self._connections.get(name)
+            if conn is not None and not conn.closed:
+                return conn
+            
+            if settings is not None:
+                self._settings[name] = settings
+            conn_settings = self._settings_for(name)
+            
+            # 讀取設定與預設連線相同時共用同一個連線池
+            if name != DEFAULT_CONNECTION and conn_settings == self._settings_for(DEFAULT_CONNECTION):
+                conn = self.get(DEFAULT_CONNECTION)
+            else:
+                conn = MongoDBConnection(conn_settings, name)
+            self._connections[name] = conn
+            return conn
+    
+    def close(self, name: Optional[str] = None) -> None:
+        """關閉指定連線（未指定則關閉全部）"""
+        with self._lock:
+            if name is None:
+                connections = list(self._connections.values())
+                self._connections.clear()
+            else:
+                conn = self._connections.pop(name, None)
+                # 與其他名稱共用的連線池保留給其他名稱使用
+                shared = any(other is conn for other in self._connections.values())
+                connections = [conn] if conn is not None and not shared else []
+        closed = set()
+        for conn in connections:
+            if id(conn) not in closed and conn.pid == os.getpid():
+                conn.close()
+                closed.add(id(conn))
+    
+    @property
+    def lock(self) -> threading.RLock:
+        """建立連線時使用的鎖（fork 後為子行程重設的鎖）"""
+        self._check_pid()
+        return self._lock
+    
+    def _settings_for(self, name: str) -> Settings:
+        """取得具名連線設定"""
+        if name in self._settings:
+            return self._settings[name]
+        base = self._settings.get(DEFAULT_CONNECTION) or get_settings()
+        if name == READ_CONNECTION:
+            return dataclasses.replace(
+                base, mongo_read_preference=base.mongo_search_read_preference
+            )
+        if name == DEFAULT_CONNECTION:
+            return base
+        raise KeyError(f"未設定的連線名稱: {name}")
+    
+    def _check_pid(self) -> None:
+        """偵測 fork：子行程捨棄父行程的連線"""
+        if self._pid != os.getpid():
+            self._after_fork()
+    
+    def _after_fork(self) -> None:
+        """
+        fork 後於子行程執行：重設鎖
+
+        保留連線物件（服務物件可能也持有同一物件），各連線於子行程第一次使用時
+        捨棄繼承的 MongoClient（不在子行程關閉）並重新連線，每個名稱仍只有一個連線池
+        """
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+
 
+# 全域連線管理器
+_manager = ConnectionManager()
 
-def get_db_connection(settings: Optional[Settings] = None) -> MongoDBConnection:
-    """取得資料庫連線實例"""
-    global _connection
-    if _connection is None:
-        _connection = MongoDBConnection(settings)
-    return _connection
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _manager._after_fork())
+
+
+def get_connection_manager() -> ConnectionManager:
+    """取得全域連線管理器"""
+    return _manager
+
+
+def get_db_connection(
+    settings: Optional[Settings] = None,
+    name: str = DEFAULT_CONNECTION
+) -> MongoDBConnection:
+    """
+    取得資料庫連線實例
+    
+    Args:
+        settings: 連線設定（首次建立該名稱的連線時使用）
+        name: 連線名稱，default 為主要連線，reads 為搜尋用的讀取連線
+    """
+    return _manager.get(name, settings)
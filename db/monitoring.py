@@ -0,0 +1,91 @@
+"""
+KM Document Management System - Connection Pool Monitoring
+以 pymongo 事件監聽器統計連線池狀態
+"""
+import threading
+from typing import Dict
+
+from pymongo import monitoring
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """連線池統計（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {
+            "pools_created": 0,
+            "pools_cleared": 0,
+            "connections_created": 0,
+            "connections_ready": 0,
+            "connections_closed": 0,
+            "connections_open": 0,
+            "checked_out": 0,
+            "checkouts_total": 0,
+            "checkout_failures": 0,
+            "checkout_wait_ms_total": 0.0,
+            "checkout_wait_ms_max": 0.0,
+        }
+
+    def _inc(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    # --- pymongo 事件 ---
+    def pool_created(self, event) -> None:
+        self._inc("pools_created")
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self._inc("pools_cleared")
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self._counters["connections_created"] += 1
+            self._counters["connections_open"] += 1
+
+    def connection_ready(self, event) -> None:
+        self._inc("connections_ready")
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self._counters["connections_closed"] += 1
+            self._counters["connections_open"] -= 1
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        self._inc("checkout_failures")
+
+    def connection_checked_out(self, event) -> None:
+        # pymongo 4.9+ 提供 duration（秒），舊版則略過等待時間統計
+        wait_ms = (getattr(event, "duration", None) or 0) * 1000
+        with self._lock:
+            self._counters["checked_out"] += 1
+            self._counters["checkouts_total"] += 1
+            self._counters["checkout_wait_ms_total"] += wait_ms
+            self._counters["checkout_wait_ms_max"] = max(
+                self._counters["checkout_wait_ms_max"], wait_ms
+            )
+
+    def connection_checked_in(self, event) -> None:
+        self._inc("checked_out", -1)
+
+    # --- 輸出 ---
+    def snapshot(self) -> Dict[str, float]:
+        """取得目前統計值"""
+        with self._lock:
+            return dict(self._counters)
+
+    def to_prometheus(self, prefix: str = "km_mongo_pool") -> str:
+        """以 Prometheus 文字格式輸出，供監控系統抓取"""
+        lines = []
+        for name, value in self.snapshot().items():
+            lines.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
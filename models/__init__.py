@@ -1,4 +1,8 @@
 # Models module
-from .document import Document, Version, DocumentStatus, DocumentCategory
+from .document import Document, DocumentSummary, Version, DocumentStatus, DocumentCategory, VersionLayout
+from .chunk import Chunk, Entity
 
-__all__ = ["Document", "Version", "DocumentStatus", "DocumentCategory"]
+__all__ = [
+    "Document", "DocumentSummary", "Version", "DocumentStatus", "DocumentCategory", "VersionLayout",
+    "Chunk", "Entity",
+]
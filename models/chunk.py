@@ -0,0 +1,93 @@
+"""
+KM Document Management System - Chunk Models
+AI 處理後的條款 chunk（data/processed/*_chunks.json 的每一筆）
+"""
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any
+from bson import ObjectId
+
+from models.document import slotted
+
+
+@slotted()
+@dataclass
+class Entity:
+    """條款中的實體（角色、概念、數值規定、程序、機構等）"""
+    type: str
+    value: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典"""
+        return {"type": self.type, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Entity":
+        """從字典建立"""
+        return cls(type=data.get("type", ""), value=data["value"])
+
+
+@slotted()
+@dataclass
+class Chunk:
+    """
+    條款 chunk
+
+    keywords、entities.value 與 article_number 建有索引，
+    取代筆記本中 ChunksManager 每次啟動時在記憶體重建的三種索引
+    """
+    chunk_id: str
+    doc_id: str
+    article_number: str
+    content: str
+    chapter: str = ""
+    title: str = ""
+    summary: str = ""
+    keywords: List[str] = field(default_factory=list)
+    entities: List[Entity] = field(default_factory=list)
+    related_articles: List[str] = field(default_factory=list)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    doc_version: int = 1
+    content_hash: str = ""
+    _id: Optional[ObjectId] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典（用於儲存到 MongoDB）"""
+        chunk = {
+            "chunk_id": self.chunk_id,
+            "doc_id": self.doc_id,
+            "article_number": self.article_number,
+            "chapter": self.chapter,
+            "title": self.title,
+            "content": self.content,
+            "summary": self.summary,
+            "keywords": self.keywords,
+            "entities": [e.to_dict() for e in self.entities],
+            "related_articles": self.related_articles,
+            "metadata": self.metadata,
+            "doc_version": self.doc_version,
+            "content_hash": self.content_hash
+        }
+        if self._id:
+            chunk["_id"] = self._id
+        return chunk
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Chunk":
+        """從字典建立（資料庫記錄或 *_chunks.json 的單筆 chunk）"""
+        chunk = cls.__new__(cls)
+        chunk._id = data.get("_id")
+        chunk.chunk_id = data["chunk_id"]
+        # *_chunks.json 的 chunk 沒有 doc_id，由 chunk_id 去掉序號取得
+        chunk.doc_id = data.get("doc_id") or data["chunk_id"].rsplit("-", 1)[0]
+        chunk.article_number = data["article_number"]
+        chunk.chapter = data.get("chapter", "")
+        chunk.title = data.get("title", "")
+        chunk.content = data.get("content", "")
+        chunk.summary = data.get("summary", "")
+        chunk.keywords = data.get("keywords") or []
+        chunk.entities = [Entity.from_dict(e) for e in data.get("entities") or []]
+        chunk.related_articles = data.get("related_articles") or []
+        chunk.metadata = data.get("metadata") or {}
+        chunk.doc_version = data.get("doc_version", 1)
+        chunk.content_hash = data.get("content_hash", "")
+        return chunk
@@ -1,13 +1,37 @@
 """
 KM Document Management System - Document Models
 """
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Type, TypeVar
+from collections.abc import Mapping
 from enum import Enum
 from bson import ObjectId
 
 
+T = TypeVar("T")
+
+
+def slotted(*extra: str):
+    """
+    為 dataclass 加上 __slots__（Python 3.10 起等同 dataclass(slots=True)）
+
+    實例不再帶有 __dict__，大量解碼文件時可明顯降低記憶體用量
+
+    Args:
+        extra: 欄位以外需要的 slot（例如延遲解碼用的暫存）
+    """
+    def wrap(cls: Type[T]) -> Type[T]:
+        names = tuple(f.name for f in fields(cls))
+        namespace = {
+            key: value for key, value in cls.__dict__.items()
+            if key not in names and key not in ("__dict__", "__weakref__")
+        }
+        namespace["__slots__"] = names + extra
+        return type(cls)(cls.__name__, cls.__bases__, namespace)
+    return wrap
+
+
 class DocumentStatus(str, Enum):
     """文件狀態"""
     ACTIVE = "active"
@@ -15,6 +39,12 @@ class DocumentStatus(str, Enum):
     DRAFT = "draft"
 
 
+class VersionLayout(str, Enum):
+    """版本歷史儲存方式"""
+    EMBEDDED = "embedded"  # 所有版本內嵌在 versions 陣列
+    SPLIT = "split"        # versions 陣列只保留最新版本，完整歷史存放在 versions collection
+
+
 class DocumentCategory(str, Enum):
     """文件分類"""
     REGULATION = "規章"
@@ -23,6 +53,7 @@ class DocumentCategory(str, Enum):
     TRAINING = "訓練教材"
 
 
+@slotted()
 @dataclass
 class Version:
     """版本資料結構"""
@@ -34,6 +65,9 @@ class Version:
     uploaded_by: str
     uploaded_at: datetime
     description: str = ""
+    content_hash: str = ""
+    compression: str = ""   # GridFS 內容的壓縮方式（空字串表示未壓縮）
+    stored_size: int = 0    # GridFS 實際儲存的大小（0 表示與 file_size 相同）
     
     def to_dict(self) -> Dict[str, Any]:
         """轉換為字典"""
@@ -45,27 +79,39 @@ class Version:
             "file_size": self.file_size,
             "uploaded_by": self.uploaded_by,
             "uploaded_at": self.uploaded_at,
-            "description": self.description
+            "description": self.description,
+            "content_hash": self.content_hash,
+            "compression": self.compression,
+            "stored_size": self.stored_size
         }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Version":
-        """從字典建立"""
-        return cls(
-            version=data["version"],
-            file_name=data["file_name"],
-            file_type=data["file_type"],
-            file_id=data["file_id"],
-            file_size=data["file_size"],
-            uploaded_by=data["uploaded_by"],
-            uploaded_at=data["uploaded_at"],
-            description=data.get("description", "")
-        )
+        """從字典建立（直接設定欄位，略過 __init__ 的參數處理）"""
+        version = cls.__new__(cls)
+        version.version = data["version"]
+        version.file_name = data["file_name"]
+        version.file_type = data["file_type"]
+        version.file_id = data["file_id"]
+        version.file_size = data["file_size"]
+        version.uploaded_by = data["uploaded_by"]
+        version.uploaded_at = data["uploaded_at"]
+        version.description = data.get("description", "")
+        version.content_hash = data.get("content_hash", "")
+        version.compression = data.get("compression", "")
+        version.stored_size = data.get("stored_size", 0)
+        return version
 
 
+@slotted("_raw_versions")
 @dataclass
 class Document:
-    """文件資料結構"""
+    """
+    文件資料結構
+
+    由 from_dict 建立時 versions 延遲解碼：第一次存取才轉為 Version，
+    列表與查詢只用到文件欄位時不需要建立每個版本的物件
+    """
     doc_code: str
     title: str
     department: str
@@ -76,6 +122,7 @@ class Document:
     metadata: Dict[str, Any] = field(default_factory=dict)
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
+    version_layout: str = VersionLayout.EMBEDDED.value
     _id: Optional[ObjectId] = None
     
     def to_dict(self) -> Dict[str, Any]:
@@ -90,7 +137,8 @@ class Document:
             "versions": [v.to_dict() if isinstance(v, Version) else v for v in self.versions],
             "metadata": self.metadata,
             "created_at": self.created_at,
-            "updated_at": self.updated_at
+            "updated_at": self.updated_at,
+            "version_layout": self.version_layout
         }
         if self._id:
             doc["_id"] = self._id
@@ -98,24 +146,35 @@ class Document:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Document":
-        """從字典建立"""
-        versions = [
-            Version.from_dict(v) if isinstance(v, dict) else v 
-            for v in data.get("versions", [])
-        ]
-        return cls(
-            _id=data.get("_id"),
-            doc_code=data["doc_code"],
-            title=data["title"],
-            department=data["department"],
-            category=data["category"],
-            status=data.get("status", DocumentStatus.ACTIVE.value),
-            current_version=data.get("current_version", 1),
-            versions=versions,
-            metadata=data.get("metadata", {}),
-            created_at=data.get("created_at", datetime.now()),
-            updated_at=data.get("updated_at", datetime.now())
-        )
+        """從字典建立（versions 保留原始資料，存取時才解碼）"""
+        doc = cls.__new__(cls)
+        doc._id = data.get("_id")
+        doc.doc_code = data["doc_code"]
+        doc.title = data["title"]
+        doc.department = data["department"]
+        doc.category = data["category"]
+        doc.status = data.get("status", DocumentStatus.ACTIVE.value)
+        doc.current_version = data.get("current_version", 1)
+        doc.metadata = data.get("metadata", {})
+        doc.created_at = data.get("created_at") or datetime.now()
+        doc.updated_at = data.get("updated_at") or datetime.now()
+        doc.version_layout = data.get("version_layout", VersionLayout.EMBEDDED.value)
+        doc._raw_versions = data.get("versions") or []
+        return doc
+    
+    def __getattr__(self, name: str) -> Any:
+        # 只有 slot 尚未設定時才會進到這裡：versions 第一次存取時解碼
+        if name == "versions":
+            raw = self._raw_versions
+            del self._raw_versions
+            self.versions = [Version.from_dict(v) if isinstance(v, Mapping) else v for v in raw]
+            return self.versions
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+    
+    @property
+    def split_versions(self) -> bool:
+        """版本歷史是否存放在 versions collection"""
+        return self.version_layout == VersionLayout.SPLIT.value
     
     def get_latest_version(self) -> Optional[Version]:
         """取得最新版本"""
@@ -124,8 +183,49 @@ class Document:
         return None
     
     def get_version(self, version_num: int) -> Optional[Version]:
-        """取得指定版本"""
+        """取得指定版本（split 版面只能取得內嵌的最新版本）"""
         for v in self.versions:
             if v.version == version_num:
                 return v
         return None
+
+
+@slotted()
+@dataclass
+class DocumentSummary:
+    """文件摘要（列表用，不含版本歷史與 Metadata；score 為全文檢索相關度）"""
+    doc_code: str
+    title: str
+    department: str
+    category: str
+    status: str
+    current_version: int
+    updated_at: datetime
+    _id: Optional[ObjectId] = None
+    score: Optional[float] = None
+    
+    # 對應的 MongoDB 投影
+    PROJECTION = {
+        "doc_code": 1,
+        "title": 1,
+        "department": 1,
+        "category": 1,
+        "status": 1,
+        "current_version": 1,
+        "updated_at": 1
+    }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentSummary":
+        """從字典建立"""
+        return cls(
+            _id=data.get("_id"),
+            doc_code=data["doc_code"],
+            title=data["title"],
+            department=data["department"],
+            category=data["category"],
+            status=data.get("status", DocumentStatus.ACTIVE.value),
+            current_version=data.get("current_version", 1),
+            updated_at=data.get("updated_at", datetime.now()),
+            score=data.get("score")
+        )
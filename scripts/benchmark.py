@@ -0,0 +1,907 @@
+#!/usr/bin/env python3
+"""
+KM Document Management System - Benchmark Script
+效能量測工具（需連線到 MongoDB，使用 BENCH_DATABASE 指定的資料庫，預設 km_benchmark）
+
+使用範例:
+  # 上傳：比較整檔讀入與串流寫入的峰值記憶體與吞吐量
+  python scripts/benchmark.py upload --sizes 10 500 2048
+
+  # 批次匯入：逐筆 upload_document vs bulk_import
+  python scripts/benchmark.py import --count 10000
+
+  # 非同步：AsyncDocumentService vs DocumentService（執行緒池）的並行吞吐量
+  python scripts/benchmark.py async --requests 2000 --concurrency 200
+
+  # 關鍵字搜尋：舊的 $regex 條件 vs 全文索引（以 explain 檢查是否使用索引）
+  python scripts/benchmark.py search --count 100000
+
+  # 統計：舊的 $push + Python 計數 vs $facet 重建 vs stats 計數器（直接寫入模擬文件，不含檔案）
+  python scripts/benchmark.py stats --count 1000000
+
+  # 壓縮：none / zlib / zstd 對文字、JSON、pdf（已壓縮）的儲存量與上傳/下載延遲
+  python scripts/benchmark.py compress --size-mb 20
+
+  # 差異儲存：連續修訂的儲存量，以及各基底鏈深度的還原延遲
+  python scripts/benchmark.py delta --size-kb 200 --versions 30 --interval 10
+
+  # JSON 讀取：json.load vs 串流逐筆讀取大型 chunks 檔案的峰值記憶體與耗時（不需連線）
+  python scripts/benchmark.py json --chunks 10000 200000
+
+  # 向量搜尋：暴力 cosine 搜尋的單筆延遲與批次查詢吞吐量，以及雜湊嵌入的速度（不需連線）
+  python scripts/benchmark.py vector --sizes 10000 100000 1000000 --dim 256
+
+  # ANN：IVF-PQ 索引在不同 nprobe / rerank 下的 recall@10（相對暴力搜尋）、QPS 與記憶體（不需連線）
+  python scripts/benchmark.py ann --sizes 100000 1000000 --nprobe 4 16 64 --rerank 0 16
+
+  # 解碼：dict / Document（延遲解碼 versions）/ DocumentSummary / RawBSONDocument 的耗時與記憶體（不需連線）
+  python scripts/benchmark.py decode --count 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# 加入專案根目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 量測一律使用獨立資料庫，避免清空正式資料
+BENCH_DATABASE = os.getenv("BENCH_DATABASE", "km_benchmark")
+os.environ["MONGO_DATABASE"] = BENCH_DATABASE
+
+
+def peak_rss_mb() -> float:
+    """目前行程的峰值 RSS（MB）"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 回傳 KB，macOS 回傳 bytes
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def make_file(size_mb: int, directory: str) -> str:
+    """建立指定大小的隨機內容檔案"""
+    path = os.path.join(directory, f"bench_{size_mb}mb.bin")
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def run_worker(args: list) -> dict:
+    """在獨立行程中執行量測，確保峰值 RSS 互不影響"""
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "worker", *args]
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def print_rows(headers, rows):
+    """列印結果表格"""
+    try:
+        from tabulate import tabulate
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    except ImportError:
+        print(" | ".join(headers))
+        print("-" * 80)
+        for row in rows:
+            print(" | ".join(str(cell) for cell in row))
+
+
+# ============================================================
+# upload: 整檔讀入 vs 串流寫入
+# ============================================================
+def worker_upload(mode: str, path: str) -> dict:
+    from db.connection import get_db_connection
+    from services.file_store import FileStore
+
+    conn = get_db_connection()
+    file_name = os.path.basename(path)
+
+    start = time.perf_counter()
+    if mode == "buffered":
+        # 原本的作法：整個檔案讀入記憶體後 fs.put
+        with open(path, "rb") as f:
+            data = f.read()
+            file_id = conn.fs.put(data, filename=file_name)
+    else:
+        stored, _ = FileStore(conn).put(path)
+        file_id = stored.file_id
+    elapsed = time.perf_counter() - start
+
+    conn.fs.delete(file_id)
+    return {"elapsed": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_upload(args):
+    headers = ["大小", "模式", "峰值 RSS (MB)", "吞吐量 (MB/s)"]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes:
+            path = make_file(size_mb, tmp)
+            for mode in ("buffered", "streaming"):
+                result = run_worker(["upload", mode, path])
+                rows.append([
+                    f"{size_mb} MB",
+                    mode,
+                    f"{result['peak_rss_mb']:.1f}",
+                    f"{size_mb / result['elapsed']:.1f}"
+                ])
+            os.remove(path)
+    print_rows(headers, rows)
+
+
+# ============================================================
+# import: 逐筆上傳 vs 批次匯入
+# ============================================================
+def reset_database(conn):
+    """清空量測資料庫"""
+    for name in conn.db.list_collection_names():
+        conn.db.drop_collection(name)
+
+
+def synthetic_items(count: int, prefix: str):
+    """產生模擬法規條文"""
+    from services.document_service import BulkImportItem
+
+    for i in range(count):
+        doc_code = f"{prefix}-{i:06d}"
+        content = f"第{i}條 模擬條文內容 " * 20
+        yield BulkImportItem(
+            doc_code=doc_code,
+            title=f"模擬條文 {i}",
+            department="人力資源部",
+            category="規章",
+            uploaded_by="benchmark",
+            file_name=f"{doc_code}.txt",
+            content=content.encode("utf-8"),
+            metadata={"keywords": ["模擬", f"條文{i % 100}"]}
+        )
+
+
+def bench_import(args):
+    import io
+    from db.connection import get_db_connection
+    from services.document_service import DocumentService
+
+    conn = get_db_connection()
+    service = DocumentService(conn)
+    reset_database(conn)
+
+    rows = []
+    # 逐筆上傳（原本匯入腳本的作法）
+    count = min(args.count, args.loop_count)
+    start = time.perf_counter()
+    for item in synthetic_items(count, "LOOP"):
+        if service.get_by_doc_code(item.doc_code) is None:
+            service.upload_document(
+                io.BytesIO(item.content), item.doc_code, item.title, item.department,
+                item.category, item.uploaded_by, item.metadata, file_name=item.file_name
+            )
+    elapsed = time.perf_counter() - start
+    rows.append(["逐筆 upload_document", count, f"{elapsed:.2f}", f"{count / elapsed:.0f}"])
+
+    start = time.perf_counter()
+    service.bulk_import(synthetic_items(args.count, "BULK"), batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    rows.append(["bulk_import", args.count, f"{elapsed:.2f}", f"{args.count / elapsed:.0f}"])
+
+    reset_database(conn)
+    print_rows(["方式", "筆數", "耗時 (s)", "筆/秒"], rows)
+
+
+# ============================================================
+# async: 同步服務（執行緒池）vs 非同步服務
+# ============================================================
+def bench_async(args):
+    import asyncio
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    from db.connection import get_db_connection
+    from services.async_document_service import AsyncDocumentService
+    from services.document_service import DocumentService
+
+    conn = get_db_connection()
+    service = DocumentService(conn)
+    reset_database(conn)
+    service.bulk_import(synthetic_items(1000, "SEED"))
+    content = b"benchmark upload content " * 40
+
+    def sync_search(i):
+        service.search(keyword=f"條文{i % 100}")
+
+    def sync_upload(i):
+        service.upload_document(
+            io.BytesIO(content + str(i).encode()), f"SYNC-{i:06d}", f"上傳 {i}",
+            "人力資源部", "規章", "benchmark", file_name="bench.txt"
+        )
+
+    def run_sync(func):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(func, range(args.requests)))
+        return time.perf_counter() - start
+
+    async def run_async(kind):
+        async_service = AsyncDocumentService()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(i):
+            async with semaphore:
+                if kind == "search":
+                    await async_service.search(keyword=f"條文{i % 100}")
+                else:
+                    await async_service.upload_document(
+                        io.BytesIO(content + str(i).encode()), f"ASYNC-{i:06d}", f"上傳 {i}",
+                        "人力資源部", "規章", "benchmark", file_name="bench.txt"
+                    )
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        await async_service.conn.close()
+        return elapsed
+
+    rows = []
+    for kind, func in (("search", sync_search), ("upload", sync_upload)):
+        elapsed = run_sync(func)
+        rows.append([kind, "DocumentService + 執行緒池", f"{elapsed:.2f}", f"{args.requests / elapsed:.0f}"])
+        elapsed = asyncio.run(run_async(kind))
+        rows.append([kind, "AsyncDocumentService", f"{elapsed:.2f}", f"{args.requests / elapsed:.0f}"])
+
+    reset_database(conn)
+    print_rows(["操作", "服務", "耗時 (s)", "請求/秒"], rows)
+
+
+# ============================================================
+# search: 無錨點 $regex vs 全文索引 / doc_code 前綴
+# ============================================================
+def plan_stages(plan: dict) -> list:
+    """列出查詢計畫中的所有 stage"""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return [stage for stage in stages if stage]
+
+
+def bench_search(args):
+    from db.connection import get_db_connection
+    from scripts.init_db import init_database
+    from services.document_service import DocumentService, build_search_query, SEARCH_SORT
+
+    conn = get_db_connection()
+    service = DocumentService(conn, conn)
+    reset_database(conn)
+    service.bulk_import(synthetic_items(args.count, "SRCH"))
+    init_database()
+
+    keywords = ["條文42", "SRCH-0001", "模擬條文 123"]
+    rows = []
+    for keyword in keywords:
+        legacy = {"status": {"$ne": "archived"}, "$or": [
+            {"title": {"$regex": keyword, "$options": "i"}},
+            {"metadata.keywords": keyword},
+            {"doc_code": {"$regex": keyword, "$options": "i"}}
+        ]}
+        for mode, query in (("$regex", legacy), ("索引", build_search_query(keyword=keyword))):
+            start = time.perf_counter()
+            hits = len(list(conn.documents.find(query, {"_id": 1}).sort(SEARCH_SORT)))
+            elapsed = time.perf_counter() - start
+
+            explain = conn.documents.find(query).sort(SEARCH_SORT).explain()
+            stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+            examined = explain.get("executionStats", {}).get("totalDocsExamined", "-")
+            rows.append([
+                keyword, mode, hits, f"{elapsed * 1000:.1f}", examined,
+                "COLLSCAN" if "COLLSCAN" in stages else ",".join(sorted(set(stages)))
+            ])
+
+    reset_database(conn)
+    print_rows(["關鍵字", "條件", "筆數", "耗時 (ms)", "掃描文件數", "查詢計畫"], rows)
+
+
+# ============================================================
+# stats: $push 陣列 vs $facet
+# ============================================================
+LEGACY_STATISTICS_PIPELINE = [
+    {
+        "$group": {
+            "_id": None,
+            "total_documents": {"$sum": 1},
+            "total_versions": {"$sum": {"$size": "$versions"}},
+            "by_department": {"$push": "$department"},
+            "by_category": {"$push": "$category"},
+            "by_status": {"$push": "$status"}
+        }
+    }
+]
+
+
+DEPARTMENTS = ["人力資源部", "財務部", "資訊部", "法務部", "業務部", "研發部"]
+CATEGORIES = ["規章", "SOP", "辦法", "訓練教材"]
+FILE_TYPES = ["pdf", "docx", "txt", "xlsx"]
+
+
+def synthetic_record(i: int) -> dict:
+    """第 i 筆模擬文件記錄（1~3 個版本）"""
+    from datetime import datetime, timedelta
+    from bson import ObjectId
+
+    uploaded_at = datetime(2024, 1, 1) + timedelta(minutes=i)
+    file_type = FILE_TYPES[i % len(FILE_TYPES)]
+    return {
+        "doc_code": f"STAT-{i:07d}",
+        "title": f"模擬文件 {i}",
+        "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "status": "archived" if i % 10 == 0 else "active",
+        "current_version": 1 + i % 3,
+        "versions": [
+            {
+                "version": v + 1,
+                "file_name": f"STAT-{i:07d}.{file_type}",
+                "file_type": file_type,
+                "file_id": ObjectId(),
+                "file_size": 1024 * (1 + i % 50),
+                "uploaded_by": "benchmark",
+                "uploaded_at": uploaded_at,
+                "description": ""
+            }
+            for v in range(1 + i % 3)
+        ],
+        "metadata": {},
+        "created_at": uploaded_at,
+        "updated_at": uploaded_at
+    }
+
+
+def seed_documents(conn, count: int, batch_size: int = 10000):
+    """直接寫入模擬文件記錄（不寫 GridFS），用於量測查詢與統計"""
+    batch = []
+    for i in range(count):
+        batch.append(synthetic_record(i))
+        if len(batch) >= batch_size:
+            conn.documents.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        conn.documents.insert_many(batch, ordered=False)
+
+
+def bench_stats(args):
+    from collections import Counter
+    from pymongo.errors import OperationFailure
+    from db.connection import get_db_connection
+    from services.document_service import DocumentService
+
+    conn = get_db_connection()
+    service = DocumentService(conn)
+    reset_database(conn)
+    print(f"寫入 {args.count} 筆模擬文件...")
+    seed_documents(conn, args.count)
+
+    rows = []
+    start = time.perf_counter()
+    try:
+        result = list(conn.documents.aggregate(LEGACY_STATISTICS_PIPELINE, allowDiskUse=True))[0]
+        for name in ("by_department", "by_category", "by_status"):
+            Counter(result[name])
+        rows.append(["$push + Python 計數", f"{time.perf_counter() - start:.2f}", "-"])
+    except OperationFailure as e:
+        rows.append(["$push + Python 計數", "失敗", str(e)[:60]])
+
+    measurements = (
+        ("$facet 重建計數器", service.rebuild_statistics),
+        ("stats 計數器 find_one", service.get_statistics),
+        ("計數器 + detailed $facet", lambda: service.get_statistics(detailed=True)),
+    )
+    for name, func in measurements:
+        start = time.perf_counter()
+        stats = func()
+        elapsed = time.perf_counter() - start
+        rows.append([
+            name,
+            f"{elapsed:.4f}",
+            f"{stats['total_documents']} 份文件 / {stats['total_versions']} 個版本"
+        ])
+
+    reset_database(conn)
+    print_rows(["方式", "耗時 (s)", "結果"], rows)
+
+
+# ============================================================
+# decode: BSON 解碼為模型物件的耗時與記憶體（不需連線 MongoDB）
+# ============================================================
+def bench_decode(args):
+    import gc
+    import tracemalloc
+    import bson
+    from bson.raw_bson import RawBSONDocument
+    from models.document import Document, DocumentSummary
+
+    print(f"產生 {args.count} 筆模擬文件的 BSON...")
+    payloads = [bson.encode(synthetic_record(i)) for i in range(args.count)]
+
+    def full_document(data):
+        doc = Document.from_dict(bson.decode(data))
+        doc.versions
+        return doc
+
+    modes = (
+        ("dict（bson.decode）", bson.decode),
+        ("Document（versions 延遲解碼）", lambda data: Document.from_dict(bson.decode(data))),
+        ("Document + 存取 versions", full_document),
+        ("DocumentSummary", lambda data: DocumentSummary.from_dict(bson.decode(data))),
+        ("RawBSONDocument", RawBSONDocument),
+    )
+    rows = []
+    for name, decode in modes:
+        gc.collect()
+        start = time.perf_counter()
+        items = [decode(data) for data in payloads]
+        elapsed = time.perf_counter() - start
+        del items
+
+        # 另外量測保留結果所佔用的記憶體（tracemalloc 會拖慢速度，不與耗時一起量）
+        gc.collect()
+        tracemalloc.start()
+        items = [decode(data) for data in payloads]
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del items
+
+        rows.append([
+            name,
+            f"{elapsed:.2f}",
+            f"{args.count / elapsed:,.0f}",
+            f"{retained / 1024 / 1024:.1f}",
+            f"{retained / args.count:.0f}"
+        ])
+    print_rows(["方式", "耗時 (s)", "筆/秒", "保留記憶體 (MB)", "每筆 (bytes)"], rows)
+
+
+# ============================================================
+# compress: 壓縮方式的儲存量與上傳/下載延遲
+# ============================================================
+def sample_content(kind: str, size: int) -> bytes:
+    """產生指定類型的模擬內容"""
+    import random
+    rng = random.Random(42)
+    if kind == "pdf":
+        # 已壓縮的內容近似隨機資料
+        return os.urandom(size)
+    if kind == "json":
+        records = []
+        length = 0
+        while length < size:
+            record = json.dumps({
+                "article_id": f"第{len(records) + 1}條",
+                "department": rng.choice(DEPARTMENTS),
+                "category": rng.choice(CATEGORIES),
+                "score": rng.random(),
+                "keywords": rng.sample(["工資", "工時", "休假", "加班", "契約", "退休"], 3)
+            }, ensure_ascii=False)
+            records.append(record)
+            length += len(record.encode())
+        return ("[" + ",".join(records) + "]").encode()[:size]
+    words = ["勞工", "雇主", "工資", "工作時間", "休息", "休假", "契約", "終止", "退休", "職業災害", "補償"]
+    lines = []
+    length = 0
+    while length < size:
+        line = f"第 {len(lines) + 1} 條　" + "、".join(rng.choices(words, k=12)) + "，依本法規定辦理。"
+        lines.append(line)
+        length += len(line.encode())
+    return "\n".join(lines).encode()[:size]
+
+
+def bench_compress(args):
+    import io
+    from db.connection import get_db_connection
+    from services.compression import HAS_ZSTD, NONE, ZLIB, ZSTD
+    from services.file_store import FileStore
+
+    conn = get_db_connection()
+    store = FileStore(conn)
+    codecs = [NONE, ZLIB] + ([ZSTD] if HAS_ZSTD else [])
+    if not HAS_ZSTD:
+        print("! 未安裝 zstandard，略過 zstd")
+
+    size = args.size_mb * 1024 * 1024
+    rows = []
+    for kind in ("txt", "json", "pdf"):
+        data = sample_content(kind, size)
+        for codec in codecs:
+            upload = download = 0.0
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                stored, _ = store.put(io.BytesIO(data), f"bench.{kind}", compression=codec)
+                upload += time.perf_counter() - start
+
+                start = time.perf_counter()
+                buffer = io.BytesIO()
+                store.copy_range(stored.file_id, buffer)
+                download += time.perf_counter() - start
+                assert buffer.getvalue() == data
+                conn.fs.delete(stored.file_id)
+
+            rows.append([
+                kind,
+                codec or "none",
+                f"{stored.bytes_stored / 1024 / 1024:.2f}",
+                f"{stored.bytes_stored / len(data):.1%}",
+                f"{upload / args.repeat * 1000:.0f}",
+                f"{download / args.repeat * 1000:.0f}"
+            ])
+    print_rows(["類型", "壓縮", "儲存量 (MB)", "壓縮比", "上傳 (ms)", "下載 (ms)"], rows)
+
+
+# ============================================================
+# delta: 差異儲存的儲存量與各鏈深度的還原延遲
+# ============================================================
+def revise(lines: list, changes: int, rng) -> list:
+    """模擬一次修訂：改寫幾行並新增一行"""
+    lines = list(lines)
+    for _ in range(changes):
+        n = rng.randrange(len(lines))
+        lines[n] = lines[n].rstrip("\n") + f"（修正 {rng.randrange(1000)}）\n"
+    lines.insert(rng.randrange(len(lines)), f"新增條文 {len(lines)}\n")
+    return lines
+
+
+def bench_delta(args):
+    import random
+    from collections import defaultdict
+    from config.settings import get_settings
+    from db.connection import get_db_connection
+    from services.file_store import FileStore, GRIDFS_BUCKET
+
+    conn = get_db_connection()
+    reset_database(conn)
+    get_settings().delta_snapshot_interval = args.interval
+    store = FileStore(conn)
+    rng = random.Random(42)
+
+    lines = sample_content("txt", args.size_kb * 1024).decode(errors="ignore").splitlines(keepends=True)
+    contents = []
+    chain = []
+    upload = 0.0
+    for version in range(args.versions):
+        if version:
+            lines = revise(lines, args.changes, rng)
+        data = "".join(lines).encode()
+        start = time.perf_counter()
+        if chain:
+            base = chain[-1]
+            stored = store.put_delta(data, "law.txt", base.file_id, base.content_hash)
+        else:
+            stored = store.put_bytes(data, "law.txt")
+        upload += time.perf_counter() - start
+        contents.append(data)
+        chain.append(stored)
+
+    files = conn.db[f"{GRIDFS_BUCKET}.files"]
+    by_depth = defaultdict(list)
+    for stored, data in zip(chain, contents):
+        metadata = files.find_one({"_id": stored.file_id}, {"metadata": 1}).get("metadata") or {}
+        depth = (metadata.get("delta") or {}).get("depth", 0)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            assert store.read_content(stored.file_id) == data
+        by_depth[depth].append(((time.perf_counter() - start) / args.repeat, stored.bytes_stored))
+
+    rows = []
+    for depth in sorted(by_depth):
+        samples = by_depth[depth]
+        rows.append([
+            depth,
+            len(samples),
+            f"{sum(size for _, size in samples) / len(samples) / 1024:.1f}",
+            f"{sum(elapsed for elapsed, _ in samples) / len(samples) * 1000:.2f}"
+        ])
+    print_rows(["鏈深度", "版本數", "平均儲存量 (KB)", "還原 (ms)"], rows)
+
+    full = sum(len(data) for data in contents)
+    stored_bytes = sum(stored.bytes_stored for stored in chain)
+    print(f"\n完整儲存: {full / 1024 / 1024:.2f} MB, 差異儲存: {stored_bytes / 1024 / 1024:.2f} MB "
+          f"({stored_bytes / full:.1%})，平均每版寫入 {upload / len(chain) * 1000:.1f} ms")
+    reset_database(conn)
+
+
+# ============================================================
+# json: json.load vs 串流讀取大型 chunks 檔案
+# ============================================================
+def make_chunks_file(count: int, directory: str) -> str:
+    """建立含 count 筆模擬 chunk 的 *_chunks.json"""
+    path = os.path.join(directory, f"bench_{count}_chunks.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"doc_id": "BENCH-001", "version": 1, "chunks": [')
+        for i in range(count):
+            if i:
+                f.write(",")
+            json.dump({
+                "chunk_id": f"BENCH-001-{i:07d}",
+                "article_number": f"第{i}條",
+                "chapter": f"第{i // 50}章",
+                "title": f"模擬條文 {i}",
+                "content": "雇主延長勞工工作時間者，其延長工作時間之工資依下列標準加給。" * 8,
+                "summary": "延長工作時間之工資加給標準",
+                "keywords": ["加班費", "工資", f"kw{i % 500}"],
+                "entities": [{"type": "數值規定", "value": "三分之一"}],
+                "related_articles": [f"第{max(i - 1, 0)}條"],
+            }, f, ensure_ascii=False)
+        f.write(f'], "total_chunks": {count}}}')
+    return path
+
+
+def worker_json(mode: str, path: str) -> dict:
+    from services.json_stream import open_array_stream
+
+    start = time.perf_counter()
+    count = 0
+    total = 0
+    if mode == "json.load":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for chunk in data["chunks"]:
+            count += 1
+            total += len(chunk["content"])
+    else:
+        with open_array_stream(path, "chunks") as stream:
+            for chunk in stream:
+                count += 1
+                total += len(chunk["content"])
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "peak_rss_mb": peak_rss_mb(), "count": count, "chars": total}
+
+
+def bench_json(args):
+    headers = ["chunks", "檔案大小 (MB)", "方式", "峰值 RSS (MB)", "耗時 (s)", "筆/秒"]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.chunks:
+            path = make_chunks_file(count, tmp)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for mode in ("json.load", "stream"):
+                result = run_worker(["json", mode, path])
+                rows.append([
+                    count,
+                    f"{size_mb:.1f}",
+                    mode,
+                    f"{result['peak_rss_mb']:.1f}",
+                    f"{result['elapsed']:.2f}",
+                    f"{count / result['elapsed']:,.0f}"
+                ])
+            os.remove(path)
+    print_rows(headers, rows)
+
+
+# ============================================================
+# vector: 暴力 cosine 搜尋
+# ============================================================
+def synthetic_vectors(count: int, dim: int, clusters: int = 1000, seed: int = 0):
+    """產生分群的模擬向量（同一主題的條文彼此相近）"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    step = 100000
+    for start in range(0, count, step):
+        size = min(step, count - start)
+        labels = rng.integers(0, clusters, size)
+        vectors[start:start + size] = centers[labels] + rng.standard_normal((size, dim), dtype=np.float32)
+    return vectors
+
+
+def bench_vector(args):
+    from services.embedding import HashingEmbedder
+    from services.vector_index import VectorIndex
+
+    # 嵌入速度（模擬條文）
+    embedder = HashingEmbedder(args.dim)
+    texts = [
+        f"第{i}條 雇主延長勞工工作時間者，其延長工作時間之工資依下列標準加給；編號 {i}。" * 4
+        for i in range(args.embed_count)
+    ]
+    start = time.perf_counter()
+    embedder.embed(texts)
+    elapsed = time.perf_counter() - start
+    print(f"雜湊嵌入（{embedder.name}）: {args.embed_count / elapsed:,.0f} 筆/秒\n")
+
+    headers = ["向量數", "矩陣 (MB)", "建立 (s)", "單筆查詢 (ms)", "單筆 QPS", f"批次 {args.batch} QPS"]
+    rows = []
+    for count in args.sizes:
+        vectors = synthetic_vectors(count, args.dim)
+        queries = synthetic_vectors(args.queries, args.dim, seed=1)
+
+        start = time.perf_counter()
+        index = VectorIndex(args.dim, capacity=count)
+        for offset in range(0, count, 100000):
+            batch = vectors[offset:offset + 100000]
+            index.add([str(i) for i in range(offset, offset + len(batch))], batch)
+        build = time.perf_counter() - start
+        del vectors
+
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, args.k)
+        single = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        for offset in range(0, len(queries), args.batch):
+            index.search_batch(queries[offset:offset + args.batch], args.k)
+        batched_qps = len(queries) / (time.perf_counter() - start)
+
+        rows.append([
+            f"{count:,}",
+            f"{index.nbytes / 1024 / 1024:.0f}",
+            f"{build:.2f}",
+            f"{single * 1000:.2f}",
+            f"{1 / single:,.0f}",
+            f"{batched_qps:,.0f}"
+        ])
+        del index
+    print_rows(headers, rows)
+
+
+# ============================================================
+# ann: IVF-PQ vs 暴力搜尋
+# ============================================================
+def bench_ann(args):
+    import numpy as np
+    from services.ann_index import IVFPQIndex
+    from services.vector_index import VectorIndex
+
+    headers = ["向量數", "nprobe", "rerank", "recall@10", "QPS", "暴力 QPS",
+               "常駐 (MB)", "暴力矩陣 (MB)", "磁碟 (MB)", "建立 (s)"]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            # 查詢與資料來自相同分布
+            data = synthetic_vectors(count + args.queries, args.dim)
+            vectors, queries = data[:count], data[count:]
+            ids = [str(i) for i in range(count)]
+            del data
+
+            exact = VectorIndex(args.dim, capacity=count)
+            exact.add(ids, vectors)
+            truth = [{item_id for item_id, _ in hits} for hits in exact.search_batch(queries, 10)]
+            start = time.perf_counter()
+            for query in queries[:20]:
+                exact.search(query, 10)
+            exact_qps = 20 / (time.perf_counter() - start)
+            exact_mb = exact.nbytes / 1024 / 1024
+            del exact
+
+            path = os.path.join(tmp, f"ann_{count}")
+            start = time.perf_counter()
+            IVFPQIndex.build(path, ids, vectors, nlist=args.nlist, subquantizers=args.subquantizers)
+            build = time.perf_counter() - start
+            del vectors
+
+            for nprobe in args.nprobe:
+                for rerank in args.rerank:
+                    index = IVFPQIndex(path, nprobe=nprobe, rerank=rerank)
+                    index.search(queries[0], 10)  # 載入與建立倒排串列
+                    start = time.perf_counter()
+                    results = [index.search(query, 10) for query in queries]
+                    qps = len(queries) / (time.perf_counter() - start)
+                    recall = np.mean([
+                        len(expected & {item_id for item_id, _ in hits}) / 10
+                        for expected, hits in zip(truth, results)
+                    ])
+                    rows.append([
+                        f"{count:,}", nprobe, rerank, f"{recall:.3f}", f"{qps:,.0f}", f"{exact_qps:,.0f}",
+                        f"{index.nbytes / 1024 / 1024:.1f}", f"{exact_mb:.0f}",
+                        f"{index.disk_bytes / 1024 / 1024:.0f}", f"{build:.1f}"
+                    ])
+    print_rows(headers, rows)
+    print("\n常駐：群中心、PQ 代表向量與倒排串列；PQ 編碼與 rerank 用的原始向量以 memmap 由作業系統分頁讀入")
+
+
+WORKERS = {
+    "upload": worker_upload,
+    "json": worker_json,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="KM 文件管理系統效能量測",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", help="量測項目")
+
+    upload_parser = subparsers.add_parser("upload", help="上傳峰值記憶體與吞吐量")
+    upload_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 500, 2048],
+                               help="檔案大小（MB）")
+    upload_parser.set_defaults(func=bench_upload)
+
+    import_parser = subparsers.add_parser("import", help="批次匯入吞吐量")
+    import_parser.add_argument("--count", type=int, default=10000, help="匯入筆數")
+    import_parser.add_argument("--loop-count", type=int, default=1000,
+                               help="逐筆上傳的筆數上限（避免量測過久）")
+    import_parser.add_argument("--batch-size", type=int, default=None, help="每批筆數")
+    import_parser.set_defaults(func=bench_import)
+
+    async_parser = subparsers.add_parser("async", help="同步 vs 非同步服務並行吞吐量")
+    async_parser.add_argument("--requests", type=int, default=2000, help="每種操作的請求數")
+    async_parser.add_argument("--concurrency", type=int, default=200, help="並行數")
+    async_parser.set_defaults(func=bench_async)
+
+    search_parser = subparsers.add_parser("search", help="關鍵字搜尋查詢計畫與耗時")
+    search_parser.add_argument("--count", type=int, default=100000, help="文件筆數")
+    search_parser.set_defaults(func=bench_search)
+
+    stats_parser = subparsers.add_parser("stats", help="統計 pipeline 耗時")
+    stats_parser.add_argument("--count", type=int, default=1000000, help="模擬文件筆數")
+    stats_parser.set_defaults(func=bench_stats)
+
+    compress_parser = subparsers.add_parser("compress", help="壓縮儲存量與上傳/下載延遲")
+    compress_parser.add_argument("--size-mb", type=int, default=20, help="每種內容的大小（MB）")
+    compress_parser.add_argument("--repeat", type=int, default=3, help="重複次數（取平均）")
+    compress_parser.set_defaults(func=bench_compress)
+
+    delta_parser = subparsers.add_parser("delta", help="差異儲存的儲存量與還原延遲")
+    delta_parser.add_argument("--size-kb", type=int, default=200, help="文件大小（KB）")
+    delta_parser.add_argument("--versions", type=int, default=30, help="版本數")
+    delta_parser.add_argument("--changes", type=int, default=5, help="每次修訂改寫的行數")
+    delta_parser.add_argument("--interval", type=int, default=10, help="完整快照間隔（版本數）")
+    delta_parser.add_argument("--repeat", type=int, default=5, help="每個版本的還原次數（取平均）")
+    delta_parser.set_defaults(func=bench_delta)
+
+    json_parser = subparsers.add_parser("json", help="大型 chunks 檔案讀取的峰值記憶體與耗時")
+    json_parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 200000],
+                             help="模擬檔案的 chunk 筆數")
+    json_parser.set_defaults(func=bench_json)
+
+    vector_parser = subparsers.add_parser("vector", help="暴力向量搜尋延遲與吞吐量")
+    vector_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                               help="向量數（100 萬筆 × 256 維約需 1 GB 記憶體）")
+    vector_parser.add_argument("--dim", type=int, default=256, help="向量維度")
+    vector_parser.add_argument("--queries", type=int, default=256, help="查詢數")
+    vector_parser.add_argument("--batch", type=int, default=64, help="批次查詢的筆數")
+    vector_parser.add_argument("-k", type=int, default=10, help="每個查詢的結果數")
+    vector_parser.add_argument("--embed-count", type=int, default=2000, help="量測嵌入速度的筆數")
+    vector_parser.set_defaults(func=bench_vector)
+
+    ann_parser = subparsers.add_parser("ann", help="ANN（IVF-PQ）索引的 recall、QPS 與記憶體")
+    ann_parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000], help="向量數")
+    ann_parser.add_argument("--dim", type=int, default=256, help="向量維度")
+    ann_parser.add_argument("--queries", type=int, default=200, help="查詢數")
+    ann_parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64], help="掃描的群數")
+    ann_parser.add_argument("--rerank", type=int, nargs="+", default=[0, 16], help="以原始向量重新排序的倍數")
+    ann_parser.add_argument("--nlist", type=int, default=None, help="分群數（預設為向量數的平方根）")
+    ann_parser.add_argument("--subquantizers", type=int, default=None, help="PQ 段數（預設每段 8 維）")
+    ann_parser.set_defaults(func=bench_ann)
+
+    decode_parser = subparsers.add_parser("decode", help="文件解碼耗時與記憶體")
+    decode_parser.add_argument("--count", type=int, default=100000, help="文件筆數")
+    decode_parser.set_defaults(func=bench_decode)
+
+    worker_parser = subparsers.add_parser("worker")
+    worker_parser.add_argument("name", choices=sorted(WORKERS))
+    worker_parser.add_argument("params", nargs="*")
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    if args.command == "worker":
+        print(json.dumps(WORKERS[args.name](*args.params)))
+        return
+
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
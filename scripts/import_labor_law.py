@@ -2,51 +2,42 @@
 """
 勞動基準法 JSON 匯入腳本
 將結構化的法規 JSON 批次匯入 KM 文件管理系統
+
+支援 JSON（{..., "articles": [...]}) 與 JSON Lines（第一行為法規欄位，之後每行一條條文），
+皆以串流逐條讀取。
 """
 import sys
 import os
-import json
-from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
 
 # 加入專案根目錄
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.document_service import DocumentService
+from services.document_service import DocumentService, BulkImportItem
+from services.json_stream import open_array_stream
 
 
-def import_labor_law_json(json_path: str):
-    """匯入勞基法 JSON 檔案"""
-    
-    print("=" * 60)
-    print("勞動基準法 批次匯入程式")
-    print("=" * 60)
-    
-    # 讀取 JSON
-    print(f"\n📂 讀取 JSON 檔案: {json_path}")
-    with open(json_path, "r", encoding="utf-8") as f:
-        law_data = json.load(f)
-    
-    print(f"   法規名稱: {law_data['law_name']}")
-    print(f"   版本: {law_data['version']}")
-    print(f"   條文數量: {len(law_data['articles'])} 條")
-    
-    # 建立服務
-    service = DocumentService()
-    
-    # 統計
-    success_count = 0
-    skip_count = 0
-    error_count = 0
-    
-    print("\n📝 開始匯入條文...\n")
-    
-    for article in law_data["articles"]:
-        article_id = article["article_id"]
-        doc_code = f"LAW-LSA-{article_id.replace('第', '').replace('條', '').zfill(3)}"
-        title = f"勞基法 {article_id} {article['title']}"
-        
-        # 建立條文內容檔案
-        content = f"""勞動基準法
+# 條文內容用到的法規欄位，需位於 articles 之前（串流讀取時才能在處理條文前取得）
+LAW_FIELDS = ("law_name", "version", "source", "effective_date")
+
+# 條文特有資料，存在時一併寫入 metadata
+ARTICLE_FIELDS = [
+    "definitions", "contract_types", "working_hours",
+    "overtime_limits", "rest_days", "annual_leave",
+    "age_restrictions", "night_work", "voluntary_retirement",
+    "mandatory_retirement", "compensation_types",
+    "current_minimum_wage", "principles", "holiday_types",
+]
+
+
+def article_item(article: Dict[str, Any], law_data: Dict[str, Any]) -> BulkImportItem:
+    """將一條條文轉為匯入項目"""
+    article_id = article["article_id"]
+    doc_code = f"LAW-LSA-{article_id.replace('第', '').replace('條', '').zfill(3)}"
+    title = f"勞基法 {article_id} {article['title']}"
+    
+    # 建立條文內容
+    content = f"""勞動基準法
 {article['chapter']}
 
 {article_id}（{article['title']}）
@@ -57,67 +48,40 @@ def import_labor_law_json(json_path: str):
 來源：{law_data['source']}
 版本：{law_data['version']}
 """
-        
-        # 寫入暫存檔
-        temp_file = f"/tmp/{doc_code}.txt"
-        with open(temp_file, "w", encoding="utf-8") as f:
-            f.write(content)
-        
-        # 準備 metadata
-        metadata = {
-            "law_name": law_data["law_name"],
-            "law_version": law_data["version"],
-            "effective_date": law_data["effective_date"],
-            "chapter": article["chapter"],
-            "article_id": article_id,
-            "article_title": article["title"],
-            "keywords": article.get("keywords", []),
-            "importance": article.get("importance", "medium"),
-            "source": law_data["source"]
-        }
-        
-        # 加入條文特有資料
-        for key in ["definitions", "contract_types", "working_hours", 
-                    "overtime_limits", "rest_days", "annual_leave",
-                    "age_restrictions", "night_work", "voluntary_retirement",
-                    "mandatory_retirement", "compensation_types", 
-                    "current_minimum_wage", "principles", "holiday_types"]:
-            if key in article:
-                metadata[key] = article[key]
-        
-        try:
-            # 檢查是否已存在
-            existing = service.get_by_doc_code(doc_code)
-            if existing:
-                print(f"   ⏭️  {doc_code} 已存在，略過")
-                skip_count += 1
-            else:
-                # 上傳文件
-                service.upload_document(
-                    file_path=temp_file,
-                    doc_code=doc_code,
-                    title=title,
-                    department="人力資源部",
-                    category="規章",
-                    uploaded_by="system_import",
-                    metadata=metadata,
-                    description=f"勞動基準法 {article_id} 自動匯入"
-                )
-                print(f"   ✅ {doc_code}: {title}")
-                success_count += 1
-                
-        except Exception as e:
-            print(f"   ❌ {doc_code} 匯入失敗: {e}")
-            error_count += 1
-        
-        # 清理暫存檔
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
     
-    # 匯入總表文件
-    print("\n📚 匯入法規總表...")
-    
-    # 建立總表檔案
+    # 準備 metadata
+    metadata = {
+        "law_name": law_data["law_name"],
+        "law_version": law_data["version"],
+        "effective_date": law_data["effective_date"],
+        "chapter": article["chapter"],
+        "article_id": article_id,
+        "article_title": article["title"],
+        "keywords": article.get("keywords", []),
+        "importance": article.get("importance", "medium"),
+        "source": law_data["source"]
+    }
+    
+    # 加入條文特有資料
+    for key in ARTICLE_FIELDS:
+        if key in article:
+            metadata[key] = article[key]
+    
+    return BulkImportItem(
+        doc_code=doc_code,
+        title=title,
+        department="人力資源部",
+        category="規章",
+        uploaded_by="system_import",
+        file_name=f"{doc_code}.txt",
+        content=content.encode("utf-8"),
+        metadata=metadata,
+        description=f"勞動基準法 {article_id} 自動匯入"
+    )
+
+
+def summary_item(law_data: Dict[str, Any], titles: List[str]) -> BulkImportItem:
+    """建立總表文件（titles 為已收錄條文的「條號 標題」）"""
     summary_content = f"""勞動基準法 總覽
 {'='*50}
 
@@ -134,8 +98,8 @@ def import_labor_law_json(json_path: str):
 {'='*50}
 已收錄條文：
 """
-    for article in law_data["articles"]:
-        summary_content += f"\n• {article['article_id']} {article['title']}"
+    for title in titles:
+        summary_content += f"\n• {title}"
     
     summary_content += f"""
 
@@ -143,42 +107,83 @@ def import_labor_law_json(json_path: str):
 最後更新：{law_data['last_updated']}
 """
     
-    summary_file = "/tmp/LAW-LSA-000.txt"
-    with open(summary_file, "w", encoding="utf-8") as f:
-        f.write(summary_content)
-    
-    try:
-        existing = service.get_by_doc_code("LAW-LSA-000")
-        if existing:
-            print("   ⏭️  LAW-LSA-000 總表已存在，略過")
-            skip_count += 1
-        else:
-            service.upload_document(
-                file_path=summary_file,
-                doc_code="LAW-LSA-000",
-                title="勞動基準法 總覽",
-                department="人力資源部",
-                category="規章",
-                uploaded_by="system_import",
-                metadata={
-                    "law_name": law_data["law_name"],
-                    "law_version": law_data["version"],
-                    "keywords": law_data["metadata"]["keywords"],
-                    "total_chapters": law_data["metadata"]["total_chapters"],
-                    "total_articles": law_data["metadata"]["total_articles"],
-                    "authority": law_data["metadata"]["authority"],
-                    "source": law_data["source"],
-                    "is_summary": True
-                },
-                description="勞動基準法總覽文件"
-            )
-            print("   ✅ LAW-LSA-000: 勞動基準法 總覽")
-            success_count += 1
-    except Exception as e:
-        print(f"   ❌ 總表匯入失敗: {e}")
-        error_count += 1
-    
-    os.remove(summary_file)
+    return BulkImportItem(
+        doc_code="LAW-LSA-000",
+        title="勞動基準法 總覽",
+        department="人力資源部",
+        category="規章",
+        uploaded_by="system_import",
+        file_name="LAW-LSA-000.txt",
+        content=summary_content.encode("utf-8"),
+        metadata={
+            "law_name": law_data["law_name"],
+            "law_version": law_data["version"],
+            "keywords": law_data["metadata"]["keywords"],
+            "total_chapters": law_data["metadata"]["total_chapters"],
+            "total_articles": law_data["metadata"]["total_articles"],
+            "authority": law_data["metadata"]["authority"],
+            "source": law_data["source"],
+            "is_summary": True
+        },
+        description="勞動基準法總覽文件"
+    )
+
+
+def law_items(stream, titles: List[str]) -> Iterator[BulkImportItem]:
+    """
+    逐條產生匯入項目，最後產生總表
+
+    總表用到的欄位（law_name_en、metadata、last_updated）可位於 articles 之後，
+    讀完所有條文時 stream.header 已完整。
+    """
+    missing = [name for name in LAW_FIELDS if name not in stream.header]
+    if missing:
+        raise ValueError(f"法規欄位 {', '.join(missing)} 需位於 articles 之前")
+    
+    for article in stream:
+        titles.append(f"{article['article_id']} {article['title']}")
+        yield article_item(article, stream.header)
+    yield summary_item(stream.header, titles)
+
+
+def import_labor_law_json(json_path: str, batch_size: Optional[int] = None):
+    """
+    匯入勞基法 JSON 檔案
+    
+    以串流逐條讀取 articles（.jsonl 則逐行讀取），邊讀邊分批匯入，
+    記憶體用量與條文總數無關。
+    """
+    
+    print("=" * 60)
+    print("勞動基準法 批次匯入程式")
+    print("=" * 60)
+    
+    # 讀取 JSON（只先讀到 articles 開頭）
+    print(f"\n📂 讀取 JSON 檔案: {json_path}")
+    
+    # 建立服務
+    service = DocumentService()
+    
+    titles: List[str] = []
+    with open_array_stream(json_path, "articles") as stream:
+        print(f"   法規名稱: {stream.header.get('law_name')}")
+        print(f"   版本: {stream.header.get('version')}")
+        
+        # 批次匯入（條文與總表）
+        print("\n📚 逐條讀取並批次匯入...")
+        result = service.bulk_import(law_items(stream, titles), batch_size=batch_size)
+    print(f"   條文數量: {len(titles)} 條")
+    
+    for doc_code in result.inserted:
+        print(f"   ✅ {doc_code}")
+    for doc_code in result.skipped:
+        print(f"   ⏭️  {doc_code} 已存在，略過")
+    for doc_code, error in result.failed.items():
+        print(f"   ❌ {doc_code} 匯入失敗: {error}")
+    
+    success_count = len(result.inserted)
+    skip_count = len(result.skipped)
+    error_count = len(result.failed)
     
     # 結果統計
     print("\n" + "=" * 60)
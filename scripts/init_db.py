@@ -9,7 +9,31 @@ import os
 # 加入專案根目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from pymongo import UpdateOne
+
 from db.connection import get_db_connection
+from services.chunk_service import CHUNK_INDEXES
+from services.semantic_search import EMBEDDING_INDEXES
+from services.document_service import DocumentService
+from services.text_search import TEXT_INDEX_NAME, TOKENS_FIELD, tokenize
+
+
+def backfill_search_tokens(conn, batch_size: int = 1000) -> int:
+    """為舊資料補上 search_tokens，回傳更新筆數"""
+    updated = 0
+    ops = []
+    cursor = conn.documents.find({TOKENS_FIELD: {"$exists": False}}, {"title": 1})
+    for doc in cursor:
+        ops.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {TOKENS_FIELD: tokenize(doc.get("title", ""))}}
+        ))
+        if len(ops) >= batch_size:
+            updated += conn.documents.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += conn.documents.bulk_write(ops, ordered=False).modified_count
+    return updated
 
 
 def init_database():
@@ -47,9 +71,20 @@ def init_database():
     conn.documents.create_index("status", name="idx_status")
     print("  ✓ status 索引")
     
-    # title 全文索引
-    conn.documents.create_index([("title", "text")], name="idx_title_text")
-    print("  ✓ title 全文索引")
+    # 標題全文索引（建立在 search_tokens 上，取代舊的 idx_title_text；
+    # 一個 collection 只能有一個全文索引）
+    if "idx_title_text" in conn.documents.index_information():
+        conn.documents.drop_index("idx_title_text")
+    conn.documents.create_index(
+        [(TOKENS_FIELD, "text")],
+        name=TEXT_INDEX_NAME,
+        default_language="none"
+    )
+    print("  ✓ 標題全文索引 (search_tokens)")
+    
+    # metadata.keywords 索引
+    conn.documents.create_index("metadata.keywords", name="idx_keywords")
+    print("  ✓ metadata.keywords 索引")
     
     # 複合索引：department + category + status
     conn.documents.create_index(
@@ -58,6 +93,40 @@ def init_database():
     )
     print("  ✓ 複合索引 (department, category, status)")
     
+    # 搜尋排序 / keyset 分頁索引
+    conn.documents.create_index(
+        [("updated_at", -1), ("_id", -1)],
+        name="idx_updated_id"
+    )
+    print("  ✓ 分頁索引 (updated_at, _id)")
+    
+    # versions collection（split 版面的版本歷史）
+    conn.versions.create_index(
+        [("doc_code", 1), ("version", 1)],
+        unique=True,
+        name="idx_doc_code_version"
+    )
+    print("  ✓ versions 索引 (doc_code, version)")
+    
+    # chunks collection（條款 chunks 的關鍵字、實體、條款索引）
+    for keys, name, options in CHUNK_INDEXES:
+        conn.chunks.create_index(keys, name=name, **options)
+        print(f"  ✓ chunks 索引 ({', '.join(key for key, _ in keys)})")
+    
+    # chunk_embeddings collection（chunk 向量）
+    for keys, name, options in EMBEDDING_INDEXES:
+        conn.chunk_embeddings.create_index(keys, name=name, **options)
+        print(f"  ✓ chunk_embeddings 索引 ({', '.join(key for key, _ in keys)})")
+    
+    # 舊資料補上全文檢索欄位
+    updated = backfill_search_tokens(conn)
+    if updated:
+        print(f"  ✓ 已補上 {updated} 筆文件的 search_tokens")
+    
+    # 統計計數器
+    DocumentService(conn).rebuild_statistics()
+    print("  ✓ 統計計數器 (stats)")
+    
     print("\n" + "=" * 50)
     print("✓ 資料庫初始化完成！")
     print("=" * 50)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+KM Document Management System - Version Layout Migration Script
+在內嵌（embedded）與分離（split）兩種版本歷史儲存方式之間轉換既有文件
+
+使用範例:
+  # 版本數達 50 的文件改為 split（最新版本保留在文件中，歷史移到 versions collection）
+  python scripts/migrate_versions.py --to split --min-versions 50
+
+  # 所有文件改回內嵌
+  python scripts/migrate_versions.py --to embedded
+
+  # 只列出會轉換的文件數
+  python scripts/migrate_versions.py --to split --dry-run
+"""
+import argparse
+import sys
+import os
+
+# 加入專案根目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ReplaceOne
+
+from db.connection import get_db_connection
+from models.document import VersionLayout
+from services.document_service import VERSION_RECORD_PROJECTION
+
+
+def migrate_to_split(conn, min_versions: int = 1, dry_run: bool = False):
+    """
+    將內嵌版本歷史移到 versions collection
+
+    版本記錄先以 upsert 寫入（可重複執行），再以 current_version 為條件更新文件；
+    轉換期間若有新版本上傳，該文件會略過，重新執行即可。
+    """
+    query = {
+        "version_layout": {"$ne": VersionLayout.SPLIT.value},
+        f"versions.{max(min_versions, 1) - 1}": {"$exists": True}
+    }
+    if dry_run:
+        return conn.documents.count_documents(query), 0
+
+    migrated = skipped = 0
+    for doc in conn.documents.find(query, {"doc_code": 1, "current_version": 1, "versions": 1}):
+        conn.versions.bulk_write([
+            ReplaceOne(
+                {"doc_code": doc["doc_code"], "version": version["version"]},
+                dict(version, doc_code=doc["doc_code"]),
+                upsert=True
+            )
+            for version in doc["versions"]
+        ], ordered=False)
+
+        result = conn.documents.update_one(
+            {
+                "_id": doc["_id"],
+                "current_version": doc["current_version"],
+                "version_layout": {"$ne": VersionLayout.SPLIT.value}
+            },
+            {
+                "$set": {
+                    "versions": doc["versions"][-1:],
+                    "version_layout": VersionLayout.SPLIT.value
+                }
+            }
+        )
+        if result.modified_count:
+            migrated += 1
+        else:
+            skipped += 1
+    return migrated, skipped
+
+
+def migrate_to_embedded(conn, dry_run: bool = False):
+    """將 versions collection 的版本歷史移回文件的 versions 陣列"""
+    query = {"version_layout": VersionLayout.SPLIT.value}
+    if dry_run:
+        return conn.documents.count_documents(query), 0
+
+    migrated = skipped = 0
+    for doc in conn.documents.find(query, {"doc_code": 1, "current_version": 1}):
+        history = list(
+            conn.versions.find({"doc_code": doc["doc_code"]}, VERSION_RECORD_PROJECTION).sort("version", 1)
+        )
+        if len(history) != doc["current_version"]:
+            # 版本記錄不完整，保留 split 以免遺失歷史
+            print(f"  ! 版本記錄不完整，略過: {doc['doc_code']} ({len(history)}/{doc['current_version']})")
+            skipped += 1
+            continue
+
+        result = conn.documents.update_one(
+            {"_id": doc["_id"], "current_version": doc["current_version"]},
+            {
+                "$set": {
+                    "versions": history,
+                    "version_layout": VersionLayout.EMBEDDED.value
+                }
+            }
+        )
+        if result.modified_count:
+            conn.versions.delete_many({"doc_code": doc["doc_code"]})
+            migrated += 1
+        else:
+            skipped += 1
+    return migrated, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="轉換文件的版本歷史儲存方式",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--to", required=True, choices=[layout.value for layout in VersionLayout],
+                        help="目標儲存方式")
+    parser.add_argument("--min-versions", type=int, default=1,
+                        help="轉為 split 時，只轉換版本數達此值的文件")
+    parser.add_argument("--dry-run", action="store_true", help="只計算符合條件的文件數")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn.ping():
+        print("✗ 無法連線到 MongoDB，請確認服務是否已啟動")
+        sys.exit(1)
+
+    if args.to == VersionLayout.SPLIT.value:
+        migrated, skipped = migrate_to_split(conn, args.min_versions, args.dry_run)
+    else:
+        migrated, skipped = migrate_to_embedded(conn, args.dry_run)
+
+    if args.dry_run:
+        print(f"✓ 符合條件的文件: {migrated} 筆")
+        return
+
+    print(f"✓ 已轉換為 {args.to}: {migrated} 筆")
+    if skipped:
+        print(f"! 略過（轉換期間有變更或記錄不完整，可重新執行）: {skipped} 筆")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+KM Document Management System - Chunk Sync Script
+依 data/manifest.json 增量同步 AI 處理後的 chunks 到 chunks collection
+
+只重新載入 manifest 中版本資訊（version、processed_path、chunk_count、ai_processed_at）
+有變更的文件；文件內以每個 chunk 的內容雜湊比對，只寫入新增、變更的 chunk 並刪除已移除的 chunk。
+
+使用範例:
+  # 增量同步
+  python scripts/sync_chunks.py
+
+  # 只列出需要同步的文件
+  python scripts/sync_chunks.py --dry-run
+
+  # 忽略已同步記錄，重新比對所有文件的 chunk 雜湊（仍只寫入有變更的 chunk）
+  python scripts/sync_chunks.py --force
+
+  # 一併刪除 manifest 中已不存在的文件的 chunks
+  python scripts/sync_chunks.py --prune
+
+  # 同步後一併計算新增、變更 chunk 的向量（語意搜尋用）
+  python scripts/sync_chunks.py --embed
+"""
+import argparse
+import sys
+import os
+import time
+
+# 加入專案根目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import get_db_connection
+from services.chunk_service import ChunkService
+from services.semantic_search import SemanticSearchService
+
+DEFAULT_MANIFEST = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "manifest.json"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="依 manifest.json 增量同步 chunks",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="manifest.json 路徑")
+    parser.add_argument("--force", action="store_true", help="忽略已同步記錄，重新比對所有文件")
+    parser.add_argument("--prune", action="store_true", help="刪除 manifest 中已不存在的文件的 chunks")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要同步的文件")
+    parser.add_argument("--embed", action="store_true", help="同步後計算新增、變更 chunk 的向量")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn.ping():
+        print("✗ 無法連線到 MongoDB，請確認服務是否已啟動")
+        sys.exit(1)
+
+    service = ChunkService(conn)
+    service.ensure_indexes()
+
+    start = time.perf_counter()
+    result = service.sync_manifest(args.manifest, force=args.force, prune=args.prune, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - start
+
+    if args.dry_run:
+        print(f"✓ 需要同步的文件: {len(result.synced_docs)} 份 {result.synced_docs}")
+        if result.removed_docs:
+            print(f"✓ 會刪除的文件: {len(result.removed_docs)} 份 {result.removed_docs}")
+        return
+
+    print(f"✓ 已同步 {len(result.synced_docs)} 份文件，未變更 {len(result.skipped_docs)} 份（{elapsed:.2f} 秒）")
+    print(f"  chunks: 新增 {result.inserted}, 更新 {result.updated}, "
+          f"未變更 {result.unchanged}, 刪除 {result.deleted}")
+    if result.removed_docs:
+        print(f"  已刪除 manifest 中不存在的文件: {', '.join(result.removed_docs)}")
+
+    if args.embed:
+        semantic = SemanticSearchService(conn)
+        semantic.ensure_indexes()
+        embedded = semantic.sync_embeddings()
+        print(f"✓ 向量: 計算 {embedded.embedded} 筆、未變更 {embedded.unchanged} 筆、刪除 {embedded.deleted} 筆")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,27 @@
 # Services module
-from .document_service import DocumentService
+from .document_service import (
+    DocumentService,
+    BulkImportItem,
+    BulkImportResult,
+    BulkOperationResult,
+    LookupResult,
+    SearchPage,
+)
+from .async_document_service import AsyncDocumentService
+from .cache import DocumentCache, get_document_cache
+from .chunk_service import ChunkService
+from .semantic_search import SemanticSearchService
 
-__all__ = ["DocumentService"]
+__all__ = [
+    "DocumentService",
+    "AsyncDocumentService",
+    "BulkImportItem",
+    "BulkImportResult",
+    "BulkOperationResult",
+    "LookupResult",
+    "SearchPage",
+    "DocumentCache",
+    "get_document_cache",
+    "ChunkService",
+    "SemanticSearchService",
+]
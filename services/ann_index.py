@@ -0,0 +1,464 @@
+"""
+KM Document Management System - ANN Index
+chunk 向量的近似最近鄰索引（IVF-PQ）
+
+向量數量大時，暴力搜尋每次都要與所有向量計算內積。IVF-PQ 先以 k-means 將向量分成
+nlist 群（倒排串列），查詢只掃描最接近的 nprobe 群；群內向量以乘積量化（PQ）壓縮：
+與群中心的殘差切成 m 段，每段以 256 個代表向量之一的編號（1 byte）表示，
+查詢時先算出每段與代表向量的內積表，候選向量的分數只需查表相加。
+儲存原始向量時，再以精確內積重新排序前 k × rerank 名候選。
+
+索引存放在一個目錄（皆為 numpy 可直接 memmap 的原始二進位檔）：
+
+    meta.json       維度、分群數、段數、嵌入方式等參數
+    centroids.npy   群中心 (nlist, dim)
+    codebooks.npy   每段的代表向量 (m, ksub, dim / m)
+    codes.u8        每筆向量的 PQ 編碼 (n, m)
+    lists.i32       每筆向量所屬的群 (n,)
+    removed.u8      刪除標記 (n,)
+    vectors.f32     原始向量 (n, dim)（rerank 用，可不儲存）
+    ids.txt         每列的 id，一行一筆
+
+開啟時不讀取任何檔案，第一次使用時才載入參數並 memmap 各檔案，編碼與向量由作業系統
+依需要分頁讀入。新增向量以既有的群中心與代表向量編碼後附加到檔案尾端（同一 id 視為更新：
+舊列標記刪除）；刪除只設定標記。大量更新或資料分布改變後應以 build 重新訓練。
+
+需要 numpy（uv sync --extra semantic）。
+"""
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.embedding import normalize_rows, require_numpy
+from services.vector_index import SearchHit, top_k, unique_last
+
+try:
+    import numpy as np
+except ImportError:  # 建立索引時由 require_numpy 提示安裝
+    np = None
+
+INDEX_FORMAT = 1
+
+# 每段的代表向量數（編碼為 uint8）
+MAX_KSUB = 256
+
+# 每次計算距離或編碼的筆數
+BLOCK_SIZE = 65536
+
+_META = "meta.json"
+_CENTROIDS = "centroids.npy"
+_CODEBOOKS = "codebooks.npy"
+_CODES = "codes.u8"
+_LISTS = "lists.i32"
+_REMOVED = "removed.u8"
+_VECTORS = "vectors.f32"
+_IDS = "ids.txt"
+
+
+# ============================================================
+# 訓練
+# ============================================================
+def nearest(data: "np.ndarray", centroids: "np.ndarray") -> "np.ndarray":
+    """每筆資料最近（L2）的中心"""
+    squared = (centroids * centroids).sum(axis=1)
+    labels = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), BLOCK_SIZE):
+        block = data[start:start + BLOCK_SIZE]
+        labels[start:start + BLOCK_SIZE] = np.argmin(squared - 2 * (block @ centroids.T), axis=1)
+    return labels
+
+
+def kmeans(data: "np.ndarray", k: int, iterations: int = 15, seed: int = 0) -> "np.ndarray":
+    """
+    k-means 分群（空群以隨機資料重新初始化）
+
+    Returns:
+        (min(k, len(data)), dim) 的中心
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        labels = nearest(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+        empty = int((~filled).sum())
+        if empty:
+            centroids[~filled] = data[rng.choice(len(data), empty, replace=False)]
+    return centroids
+
+
+def default_nlist(count: int) -> int:
+    """分群數預設為向量數的平方根（每群約 sqrt(n) 筆）"""
+    return int(max(1, min(65536, round(count ** 0.5))))
+
+
+def default_subquantizers(dim: int) -> int:
+    """段數預設為每段 8 維（dim 需可整除）"""
+    for sub_dim in (8, 4, 2, 1):
+        if dim % sub_dim == 0:
+            return dim // sub_dim
+    return dim
+
+
+# ============================================================
+# 索引
+# ============================================================
+class IVFPQIndex:
+    """
+    存放在目錄中的 IVF-PQ 索引（介面同 VectorIndex）
+
+    同一時間只應有一個行程寫入（add、remove、build）。
+    """
+
+    def __init__(self, path: str, nprobe: int = 16, rerank: int = 16):
+        """
+        Args:
+            path: 索引目錄
+            nprobe: 每次查詢掃描的群數（越大越準確、越慢）
+            rerank: 以原始向量重新排序前 k × rerank 名候選（0 表示只用 PQ 分數）
+        """
+        require_numpy()
+        self.path = path
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self._meta: Optional[Dict] = None
+        self._ids: Optional[List[str]] = None
+        self._rows: Optional[Dict[str, int]] = None
+        self._order: Optional["np.ndarray"] = None
+        self._bounds: Optional["np.ndarray"] = None
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """目錄中是否已有索引"""
+        return os.path.isfile(os.path.join(path, _META))
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        ids: Sequence[str],
+        vectors: "np.ndarray",
+        model: str = "",
+        nlist: Optional[int] = None,
+        subquantizers: Optional[int] = None,
+        store_vectors: bool = True,
+        train_size: Optional[int] = None,
+        nprobe: int = 16,
+        rerank: int = 16,
+        seed: int = 0
+    ) -> "IVFPQIndex":
+        """
+        訓練群中心與 PQ 代表向量後建立索引（取代目錄中既有的索引）
+
+        Args:
+            path: 索引目錄
+            ids: 每個向量的 id
+            vectors: (len(ids), dim) 矩陣
+            model: 向量的嵌入方式（載入時用來確認與目前的嵌入方式相同）
+            nlist: 分群數（預設為向量數的平方根）
+            subquantizers: PQ 段數（需整除維度，預設每段 8 維）
+            store_vectors: 是否儲存原始向量（rerank 用，佔用與暴力搜尋相同的磁碟空間）
+            train_size: 訓練用的抽樣筆數（預設 nlist × 50，至少 10000）
+            seed: 亂數種子
+        """
+        require_numpy()
+        vectors = normalize_rows(vectors)
+        if len(vectors) == 0:
+            raise ValueError("沒有可建立索引的向量")
+        dim = vectors.shape[1]
+        nlist = min(nlist or default_nlist(len(vectors)), len(vectors))
+        subquantizers = subquantizers or default_subquantizers(dim)
+        if dim % subquantizers:
+            raise ValueError(f"PQ 段數 {subquantizers} 無法整除向量維度 {dim}")
+
+        rng = np.random.default_rng(seed)
+        train_size = min(len(vectors), train_size or max(nlist * 50, 10000))
+        sample = vectors[np.sort(rng.choice(len(vectors), train_size, replace=False))]
+        centroids = kmeans(sample, nlist, seed=seed)
+        residuals = (sample - centroids[nearest(sample, centroids)]).reshape(len(sample), subquantizers, -1)
+        ksub = min(MAX_KSUB, len(sample))
+        codebooks = np.stack([
+            kmeans(np.ascontiguousarray(residuals[:, j]), ksub, seed=seed + j + 1)
+            for j in range(subquantizers)
+        ])
+
+        # 先在暫存目錄建立，完成後取代舊索引
+        staging = f"{path.rstrip(os.sep)}.building"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, _CENTROIDS), centroids)
+        np.save(os.path.join(staging, _CODEBOOKS), codebooks)
+        for name in (_CODES, _LISTS, _REMOVED, _VECTORS, _IDS):
+            open(os.path.join(staging, name), "wb").close()
+        with open(os.path.join(staging, _META), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": INDEX_FORMAT,
+                "model": model,
+                "dim": dim,
+                "nlist": len(centroids),
+                "subquantizers": subquantizers,
+                "ksub": ksub,
+                "store_vectors": store_vectors,
+            }, f, ensure_ascii=False, indent=2)
+
+        index = cls(staging, nprobe, rerank)
+        index.add(ids, vectors)
+        index._close()
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+        return cls(path, nprobe, rerank)
+
+    # ============================================================
+    # 載入
+    # ============================================================
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def meta(self) -> Dict:
+        """索引參數（只讀取 meta.json）"""
+        if self._meta is None:
+            with open(self._file(_META), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != INDEX_FORMAT:
+                raise ValueError(f"不支援的 ANN 索引格式: {meta.get('format')}")
+            self._meta = meta
+        return self._meta
+
+    def _load(self) -> None:
+        """第一次使用時載入群中心、代表向量與 ids，並 memmap 各檔案"""
+        if self._ids is not None:
+            return
+        self.centroids = np.load(self._file(_CENTROIDS))
+        self.codebooks = np.load(self._file(_CODEBOOKS))
+        with open(self._file(_IDS), encoding="utf-8") as f:
+            self._ids = f.read().splitlines()
+        self._map_files()
+
+    def _memmap(self, name: str, dtype, shape: Tuple[int, ...], mode: str = "r") -> "np.ndarray":
+        """memmap 檔案的前 shape[0] 列（檔案可能比 ids 長：中斷的寫入）"""
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _map_files(self) -> None:
+        count = len(self._ids)
+        meta = self.meta
+        self.codes = self._memmap(_CODES, np.uint8, (count, meta["subquantizers"]))
+        self.lists = self._memmap(_LISTS, np.int32, (count,))
+        self.removed = self._memmap(_REMOVED, np.uint8, (count,), mode="r+")
+        self.vectors = (
+            self._memmap(_VECTORS, np.float32, (count, meta["dim"])) if meta["store_vectors"] else None
+        )
+        self._order = None
+        self._bounds = None
+
+    def _close(self) -> None:
+        """釋放 memmap（取代目錄前使用）"""
+        self._meta = None
+        self._ids = None
+        self._rows = None
+        self.codes = self.lists = self.removed = self.vectors = None
+
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    @property
+    def model(self) -> str:
+        return self.meta.get("model", "")
+
+    @property
+    def ids(self) -> List[str]:
+        """每一列的 id（含已刪除的列）"""
+        self._load()
+        return self._ids
+
+    @property
+    def row_map(self) -> Dict[str, int]:
+        """id 對應的列（只含未刪除的列）"""
+        if self._rows is None:
+            self._load()
+            ids = self._ids
+            self._rows = {ids[row]: row for row in np.flatnonzero(np.asarray(self.removed) == 0).tolist()}
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self.ids) - int(np.count_nonzero(self.removed))
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.row_map
+
+    @property
+    def removed_count(self) -> int:
+        """已標記刪除的列數（比例高時應重新 build）"""
+        self._load()
+        return int(np.count_nonzero(self.removed))
+
+    @property
+    def nbytes(self) -> int:
+        """常駐記憶體（群中心、代表向量與倒排串列，不含由作業系統分頁的 memmap 檔案）"""
+        self._load()
+        size = self.centroids.nbytes + self.codebooks.nbytes
+        if self._order is not None:
+            size += self._order.nbytes + self._bounds.nbytes
+        return size
+
+    @property
+    def disk_bytes(self) -> int:
+        """索引目錄的檔案大小"""
+        return sum(os.path.getsize(self._file(name)) for name in os.listdir(self.path))
+
+    def _inverted_lists(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """依群排序的列與每群的起訖位置（新增後第一次查詢時重建）"""
+        if self._order is None:
+            lists = np.asarray(self.lists)
+            self._order = np.argsort(lists, kind="stable").astype(np.int32)
+            self._bounds = np.searchsorted(lists[self._order], np.arange(self.meta["nlist"] + 1))
+        return self._order, self._bounds
+
+    # ============================================================
+    # 更新
+    # ============================================================
+    def encode(self, vectors: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """將單位向量編碼為 (所屬群, PQ 編碼)"""
+        self._load()
+        meta = self.meta
+        lists = nearest(vectors, self.centroids)
+        residuals = (vectors - self.centroids[lists]).reshape(len(vectors), meta["subquantizers"], -1)
+        codes = np.empty((len(vectors), meta["subquantizers"]), dtype=np.uint8)
+        for j in range(meta["subquantizers"]):
+            codes[:, j] = nearest(np.ascontiguousarray(residuals[:, j]), self.codebooks[j])
+        return lists, codes
+
+    def _append(self, name: str, data: "np.ndarray", row_bytes: int) -> None:
+        """寫入第 len(ids) 列之後（截去中斷寫入留下的多餘資料）"""
+        with open(self._file(name), "r+b") as f:
+            f.seek(len(self._ids) * row_bytes)
+            f.write(np.ascontiguousarray(data).tobytes())
+            f.truncate()
+
+    def add(self, ids: Sequence[str], vectors: "np.ndarray") -> None:
+        """
+        加入或更新向量（以既有的群中心與代表向量編碼，附加到檔案尾端）
+
+        同一批中重複的 id 以最後一個向量為準（只編碼、附加一次）。
+
+        Args:
+            ids: 每個向量的 id
+            vectors: (len(ids), dim) 矩陣
+        """
+        self._load()
+        meta = self.meta
+        vectors = normalize_rows(np.asarray(vectors).reshape(-1, meta["dim"]))
+        if len(vectors) != len(ids):
+            raise ValueError(f"id 數量 ({len(ids)}) 與向量數量 ({len(vectors)}) 不符")
+        if not len(ids):
+            return
+        ids, vectors = unique_last(ids, vectors)
+        self.remove(ids)
+
+        for start in range(0, len(vectors), BLOCK_SIZE):
+            block_ids = ids[start:start + BLOCK_SIZE]
+            block = vectors[start:start + BLOCK_SIZE]
+            lists, codes = self.encode(block)
+            self._append(_CODES, codes, meta["subquantizers"])
+            self._append(_LISTS, lists, 4)
+            self._append(_REMOVED, np.zeros(len(block), dtype=np.uint8), 1)
+            if meta["store_vectors"]:
+                self._append(_VECTORS, block, meta["dim"] * 4)
+            # ids 最後寫入：列數以 ids.txt 為準，中斷時其他檔案多出的部分會被忽略
+            with open(self._file(_IDS), "a", encoding="utf-8") as f:
+                f.write("".join(f"{item_id}\n" for item_id in block_ids))
+            if self._rows is not None:
+                self._rows.update((item_id, len(self._ids) + i) for i, item_id in enumerate(block_ids))
+            self._ids.extend(block_ids)
+        self._map_files()
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """標記刪除，回傳刪除筆數"""
+        rows = [self.row_map.pop(item_id) for item_id in ids if item_id in self.row_map]
+        if rows:
+            self.removed[rows] = 1
+            self.removed.flush()
+        return len(rows)
+
+    def rows_for(self, ids: Iterable[str]) -> "np.ndarray":
+        """id 對應的列（不在索引中的 id 略過）"""
+        row_map = self.row_map
+        return np.array([row_map[item_id] for item_id in ids if item_id in row_map], dtype=np.int64)
+
+    # ============================================================
+    # 搜尋
+    # ============================================================
+    def search(
+        self,
+        query: "np.ndarray",
+        k: int = 10,
+        rows: Optional["np.ndarray"] = None
+    ) -> List[SearchHit]:
+        """近似 cosine 相似度最高的 k 個向量（參數同 search_batch）"""
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, rows)[0]
+
+    def search_batch(
+        self,
+        queries: "np.ndarray",
+        k: int = 10,
+        rows: Optional["np.ndarray"] = None
+    ) -> List[List[SearchHit]]:
+        """
+        多個查詢一起搜尋：群中心分數與 PQ 內積表各以一次矩陣運算算出
+
+        Args:
+            queries: (查詢數, dim) 矩陣
+            k: 每個查詢的結果數
+            rows: 只在這些列中搜尋（如限定文件，直接計算不經倒排串列），None 表示全部
+        """
+        self._load()
+        meta = self.meta
+        queries = normalize_rows(np.asarray(queries).reshape(-1, meta["dim"]))
+        if k <= 0 or len(self) == 0:
+            return [[] for _ in range(len(queries))]
+
+        subquantizers, ksub = meta["subquantizers"], meta["ksub"]
+        coarse = queries @ self.centroids.T
+        tables = np.einsum(
+            "qmd,mkd->qmk", queries.reshape(len(queries), subquantizers, -1), self.codebooks
+        ).reshape(len(queries), -1)
+        offsets = np.arange(subquantizers, dtype=np.intp) * ksub
+
+        if rows is None:
+            order, bounds = self._inverted_lists()
+            probes = top_k(coarse, self.nprobe)[0]
+        results = []
+        for qi, query in enumerate(queries):
+            if rows is None:
+                candidates = np.concatenate([order[bounds[l]:bounds[l + 1]] for l in probes[qi]])
+            else:
+                candidates = np.asarray(rows)
+            if len(candidates):
+                candidates = candidates[self.removed[candidates] == 0]
+            if not len(candidates):
+                results.append([])
+                continue
+
+            if rows is not None and self.vectors is not None:
+                scores = np.asarray(self.vectors[candidates]) @ query
+            else:
+                codes = np.asarray(self.codes[candidates]).astype(np.intp) + offsets
+                scores = coarse[qi, self.lists[candidates]] + tables[qi][codes].sum(axis=1)
+                if self.rerank and self.vectors is not None:
+                    keep = top_k(scores[None], k * self.rerank)[0][0]
+                    candidates = np.sort(candidates[keep])
+                    scores = np.asarray(self.vectors[candidates]) @ query
+            positions, values = top_k(scores[None], k)
+            results.append([
+                (self._ids[row], float(score))
+                for row, score in zip(candidates[positions[0]].tolist(), values[0].tolist())
+            ])
+        return results
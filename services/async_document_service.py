@@ -0,0 +1,617 @@
+"""
+KM Document Management System - Async Document Service
+DocumentService 的 asyncio 版本，適用於非同步 API 層
+"""
+import asyncio
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config.settings import get_settings
+from db.async_connection import AsyncMongoDBConnection, get_async_db_connection
+from models.document import Document, DocumentSummary, Version, DocumentStatus, VersionLayout
+from services.async_file_store import AsyncFileStore
+from services.cache import DocumentCache, get_document_cache
+from services.document_service import (
+    apply_cursor,
+    build_search_query,
+    document_record,
+    document_snapshot,
+    download_paths,
+    encode_cursor,
+    from_snapshot,
+    LOOKUP_REQUIRED_FIELDS,
+    lookup_result,
+    LookupResult,
+    MAX_PAGE_SIZE,
+    metadata_update,
+    new_version_pipeline,
+    raw_collection,
+    RELEVANCE_PROJECTION,
+    RELEVANCE_SORT,
+    result_projection,
+    SEARCH_SORT,
+    search_decoder,
+    SearchPage,
+    status_changed,
+    unique_codes,
+    version_projection,
+    version_record,
+    VERSION_RECORD_PROJECTION,
+    with_fields,
+)
+from services.delta import delta_base_eligible, delta_eligible
+from services.file_store import FileSource, StoredFile
+from services.statistics import (
+    counters_from_pipeline,
+    DETAILED_PIPELINE,
+    detailed_version_pipeline,
+    document_counters,
+    facet_counts,
+    merge_counters,
+    released_counters,
+    statistics_pipeline,
+    stats_update,
+    STATS_ID,
+    status_counters,
+    stored_counters,
+    summarize_counters,
+    version_counters,
+    version_statistics_pipeline,
+)
+from services.text_search import text_query
+
+
+class AsyncDocumentService:
+    """文件操作服務類別（asyncio）"""
+
+    def __init__(
+        self,
+        connection: Optional[AsyncMongoDBConnection] = None,
+        cache: Optional[DocumentCache] = None
+    ):
+        self.conn = connection or get_async_db_connection()
+        self.store = AsyncFileStore(self.conn)
+        self.cache = cache or get_document_cache()
+
+    # ============================================================
+    # F-001: 文件上傳
+    # ============================================================
+    async def upload_document(
+        self,
+        file_path: FileSource,
+        doc_code: str,
+        title: str,
+        department: str,
+        category: str,
+        uploaded_by: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        description: str = "初版",
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None
+    ) -> Document:
+        """上傳新文件（參數同 DocumentService.upload_document）"""
+        if await self.get_by_doc_code(doc_code, use_cache=False):
+            raise ValueError(f"文件編號 {doc_code} 已存在")
+
+        stored, file_name = await self.store.put_dedup(file_path, file_name, chunk_size)
+
+        version = Version(
+            version=1,
+            file_name=file_name,
+            file_type=file_name.split(".")[-1].lower(),
+            file_id=stored.file_id,
+            file_size=stored.file_size,
+            uploaded_by=uploaded_by,
+            uploaded_at=datetime.now(),
+            description=description,
+            content_hash=stored.content_hash,
+            compression=stored.compression,
+            stored_size=stored.stored_size
+        )
+
+        doc = Document(
+            doc_code=doc_code,
+            title=title,
+            department=department,
+            category=category,
+            status=DocumentStatus.ACTIVE.value,
+            current_version=1,
+            versions=[version],
+            metadata=metadata or {},
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            version_layout=get_settings().version_layout
+        )
+
+        # 同時上傳同一編號時後寫入者失敗，釋放已取得的檔案參照
+        try:
+            result = await self.conn.documents.insert_one(document_record(doc))
+        except DuplicateKeyError:
+            await self.store.release(stored.file_id, stored.content_hash)
+            raise ValueError(f"文件編號 {doc_code} 已存在") from None
+        doc._id = result.inserted_id
+        if doc.split_versions:
+            await self.conn.versions.insert_one(version_record(doc_code, version))
+        await self._record_stats(merge_counters(document_counters(doc), stored_counters(stored)))
+        self._invalidate(doc_code)
+        return doc
+
+    # ============================================================
+    # F-002: 版本控管
+    # ============================================================
+    async def upload_new_version(
+        self,
+        doc_code: str,
+        file_path: FileSource,
+        uploaded_by: str,
+        description: str = "",
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
+        """上傳新版本（參數同 DocumentService.upload_new_version，版本號原子遞增）"""
+        stored, file_name = await self._store_version(doc_code, file_path, file_name, chunk_size)
+
+        new_version = Version(
+            version=0,
+            file_name=file_name,
+            file_type=file_name.split(".")[-1].lower(),
+            file_id=stored.file_id,
+            file_size=stored.file_size,
+            uploaded_by=uploaded_by,
+            uploaded_at=datetime.now(),
+            description=description,
+            content_hash=stored.content_hash,
+            compression=stored.compression,
+            stored_size=stored.stored_size
+        )
+
+        result = await self.conn.documents.find_one_and_update(
+            {"doc_code": doc_code},
+            new_version_pipeline(new_version),
+            projection=with_fields(
+                result_projection(return_document, projection), "current_version", "version_layout"
+            ),
+            return_document=ReturnDocument.AFTER
+        )
+        if result is None:
+            await self.store.release(stored.file_id, stored.content_hash)
+            raise ValueError(f"找不到文件: {doc_code}")
+        if result.get("version_layout") == VersionLayout.SPLIT.value:
+            new_version.version = result["current_version"]
+            await self.conn.versions.insert_one(version_record(doc_code, new_version))
+        await self._record_stats(merge_counters(version_counters(new_version), stored_counters(stored)))
+        self._invalidate(doc_code)
+        return Document.from_dict(result) if return_document else None
+
+    async def _store_version(
+        self,
+        doc_code: str,
+        source: FileSource,
+        file_name: Optional[str],
+        chunk_size: Optional[int]
+    ) -> Tuple[StoredFile, str]:
+        """寫入新版本內容（差異儲存僅用於檔案路徑來源，檔案物件一律串流寫入完整內容）"""
+        if isinstance(source, (str, os.PathLike)):
+            name = file_name or os.path.basename(source)
+            size = await asyncio.to_thread(os.path.getsize, source)
+            if delta_eligible(name) and size <= get_settings().delta_max_size:
+                base = await self.resolve_version(doc_code)
+                if base.content_hash and delta_base_eligible(base.file_name, base.file_size):
+                    data = await asyncio.to_thread(Path(source).read_bytes)
+                    return await self.store.put_delta(data, name, base.file_id, base.content_hash, chunk_size), name
+        return await self.store.put_dedup(source, file_name, chunk_size)
+
+    # ============================================================
+    # F-003: Metadata 管理
+    # ============================================================
+    async def update_metadata(
+        self,
+        doc_code: str,
+        metadata: Dict[str, Any],
+        merge: bool = True,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
+        """更新 Metadata（merge=False 則完全覆蓋）"""
+        result = await self.conn.documents.find_one_and_update(
+            {"doc_code": doc_code},
+            metadata_update(metadata, merge),
+            projection=result_projection(return_document, projection),
+            return_document=ReturnDocument.AFTER
+        )
+        if result is None:
+            raise ValueError(f"找不到文件: {doc_code}")
+        self._invalidate(doc_code)
+        return Document.from_dict(result) if return_document else None
+
+    # ============================================================
+    # F-004: 文件查詢
+    # ============================================================
+    async def search(
+        self,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        keyword: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False
+    ) -> List[Document]:
+        """搜尋文件（條件同 DocumentService.search）"""
+        return [
+            doc async for doc in self.iter_search(
+                department, category, keyword, status, include_archived, summary=False
+            )
+        ]
+
+    async def iter_search(
+        self,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        keyword: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False,
+        summary: bool = True,
+        batch_size: int = 500,
+        raw: bool = False
+    ) -> AsyncIterator[Union[Document, DocumentSummary, RawBSONDocument]]:
+        """逐筆產生搜尋結果（參數同 DocumentService.iter_search）"""
+        query = build_search_query(department, category, keyword, status, include_archived)
+        projection = DocumentSummary.PROJECTION if summary else None
+        decode = search_decoder(summary, raw)
+        collection = raw_collection(self.conn.documents) if raw else self.conn.documents
+
+        cursor = collection.find(query, projection).sort(SEARCH_SORT).batch_size(batch_size)
+        try:
+            async for doc in cursor:
+                yield decode(doc)
+        finally:
+            await cursor.close()
+
+    async def search_page(
+        self,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        keyword: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False,
+        page_size: int = 50,
+        cursor: Optional[str] = None,
+        summary: bool = True,
+        raw: bool = False
+    ) -> SearchPage:
+        """分頁搜尋（參數同 DocumentService.search_page）"""
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        query = apply_cursor(
+            build_search_query(department, category, keyword, status, include_archived),
+            cursor
+        )
+        projection = DocumentSummary.PROJECTION if summary else None
+        decode = search_decoder(summary, raw)
+        collection = raw_collection(self.conn.documents) if raw else self.conn.documents
+
+        docs = await collection.find(query, projection).sort(SEARCH_SORT).limit(page_size + 1).to_list()
+        next_cursor = encode_cursor(docs[page_size - 1]) if len(docs) > page_size else None
+        return SearchPage(
+            items=[decode(doc) for doc in docs[:page_size]],
+            next_cursor=next_cursor
+        )
+
+    async def search_relevant(
+        self,
+        keyword: str,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False,
+        limit: int = 20
+    ) -> List[DocumentSummary]:
+        """依相關度搜尋標題（參數同 DocumentService.search_relevant）"""
+        text = text_query(keyword, match_all=False)
+        if not text:
+            return []
+        query = build_search_query(department, category, None, status, include_archived)
+        query.update(text)
+
+        cursor = self.conn.documents.find(query, RELEVANCE_PROJECTION).sort(RELEVANCE_SORT)
+        docs = await cursor.limit(max(1, min(limit, MAX_PAGE_SIZE))).to_list()
+        return [DocumentSummary.from_dict(doc) for doc in docs]
+
+    async def get_by_doc_code(self, doc_code: str, use_cache: bool = True) -> Optional[Document]:
+        """根據文件編號取得文件（參數同 DocumentService.get_by_doc_code）"""
+        key = self._cache_key(doc_code)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return from_snapshot(cached)
+
+        generation = self.cache.generation
+        doc = await self.conn.documents.find_one({"doc_code": doc_code})
+        if doc:
+            self._cache_document(doc, generation)
+            return Document.from_dict(doc)
+        return None
+
+    async def get_many_by_doc_codes(
+        self,
+        doc_codes: Iterable[str],
+        projection: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        chunk_size: Optional[int] = None
+    ) -> LookupResult:
+        """批次取得文件（參數同 DocumentService.get_many_by_doc_codes）"""
+        codes = unique_codes(doc_codes)
+        chunk_size = chunk_size or get_settings().lookup_batch_size
+        cacheable = projection is None
+        fields = with_fields(projection, *LOOKUP_REQUIRED_FIELDS)
+
+        found: Dict[str, Document] = {}
+        if cacheable and use_cache:
+            for code in codes:
+                cached = self.cache.get(self._cache_key(code))
+                if cached is not None:
+                    found[code] = from_snapshot(cached)
+
+        pending = [code for code in codes if code not in found]
+        for start in range(0, len(pending), chunk_size):
+            generation = self.cache.generation
+            query = {"doc_code": {"$in": pending[start:start + chunk_size]}}
+            async for doc in self.conn.documents.find(query, fields):
+                if cacheable:
+                    self._cache_document(doc, generation)
+                found[doc["doc_code"]] = Document.from_dict(doc)
+        return lookup_result(codes, found)
+
+    async def get_all(self, include_archived: bool = False) -> List[Document]:
+        """取得所有文件"""
+        return await self.search(include_archived=include_archived)
+
+    # ============================================================
+    # F-005: 版本歷史
+    # ============================================================
+    async def get_version_history(
+        self,
+        doc_code: str,
+        limit: Optional[int] = None,
+        after_version: int = 0
+    ) -> List[Version]:
+        """取得文件版本歷史（參數同 DocumentService.get_version_history）"""
+        doc = await self.conn.documents.find_one(
+            {"doc_code": doc_code}, {"version_layout": 1, "versions": 1}
+        )
+        if not doc:
+            raise ValueError(f"找不到文件: {doc_code}")
+
+        if doc.get("version_layout") == VersionLayout.SPLIT.value:
+            cursor = self.conn.versions.find(
+                {"doc_code": doc_code, "version": {"$gt": after_version}},
+                VERSION_RECORD_PROJECTION
+            ).sort("version", 1)
+            if limit:
+                cursor = cursor.limit(limit)
+            return [Version.from_dict(v) async for v in cursor]
+
+        versions = [
+            Version.from_dict(v) for v in doc.get("versions", [])
+            if v["version"] > after_version
+        ]
+        return versions[:limit] if limit else versions
+
+    async def get_version(self, doc_code: str, version_num: int) -> Optional[Version]:
+        """取得指定版本"""
+        doc = await self.conn.documents.find_one({"doc_code": doc_code}, version_projection(version_num))
+        if not doc:
+            return None
+        return await self._pick_version(doc_code, doc, version_num)
+
+    async def _pick_version(
+        self,
+        doc_code: str,
+        doc: Dict[str, Any],
+        version_num: Optional[int]
+    ) -> Optional[Version]:
+        """由 version_projection 查詢結果取出版本；split 版面的舊版本改查 versions collection"""
+        if doc.get("versions"):
+            return Version.from_dict(doc["versions"][0])
+        if version_num and doc.get("version_layout") == VersionLayout.SPLIT.value:
+            record = await self.conn.versions.find_one(
+                {"doc_code": doc_code, "version": version_num}, VERSION_RECORD_PROJECTION
+            )
+            if record:
+                return Version.from_dict(record)
+        return None
+
+    # ============================================================
+    # F-006: 文件下載
+    # ============================================================
+    async def resolve_version(self, doc_code: str, version_num: Optional[int] = None) -> Version:
+        """取得要下載的版本（預設為最新版本，只讀取該版本）"""
+        doc = await self.conn.documents.find_one({"doc_code": doc_code}, version_projection(version_num))
+        if not doc:
+            raise ValueError(f"找不到文件: {doc_code}")
+
+        version = await self._pick_version(doc_code, doc, version_num)
+        if not version:
+            if version_num:
+                raise ValueError(f"找不到版本: {doc_code} v{version_num}")
+            raise ValueError(f"文件沒有任何版本: {doc_code}")
+        return version
+
+    async def iter_download(
+        self,
+        doc_code: str,
+        version_num: Optional[int] = None,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """以 GridFS chunk 為單位串流讀取文件（記憶體用量同 DocumentService.iter_download）"""
+        version = await self.resolve_version(doc_code, version_num)
+        async for data in self.store.iter_range(version.file_id, offset, length):
+            yield data
+
+    async def download_to(
+        self,
+        doc_code: str,
+        writer: Any,
+        version_num: Optional[int] = None,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> int:
+        """串流下載文件到可寫入物件（同步或 async），回傳寫入的 bytes 數"""
+        version = await self.resolve_version(doc_code, version_num)
+        return await self.store.copy_range(version.file_id, writer, offset, length)
+
+    async def download_file(
+        self,
+        doc_code: str,
+        version_num: Optional[int] = None,
+        save_path: Optional[str] = None,
+        resume: bool = False
+    ) -> str:
+        """下載文件到本機（參數同 DocumentService.download_file）"""
+        version = await self.resolve_version(doc_code, version_num)
+        file_path, part_path, offset = await asyncio.to_thread(download_paths, version, save_path, resume)
+
+        f = await asyncio.to_thread(open, part_path, "ab" if offset else "wb")
+        try:
+            async for data in self.store.iter_range(version.file_id, offset):
+                await asyncio.to_thread(f.write, data)
+        finally:
+            await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, part_path, file_path)
+        return file_path
+
+    # ============================================================
+    # F-007: 文件歸檔
+    # ============================================================
+    async def archive_document(
+        self,
+        doc_code: str,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
+        """歸檔文件"""
+        now = datetime.now()
+        fields = with_fields(result_projection(return_document, projection), "status")
+        result = await self.conn.documents.find_one_and_update(
+            {"doc_code": doc_code, "status": {"$ne": DocumentStatus.ARCHIVED.value}},
+            {
+                "$set": {
+                    "status": DocumentStatus.ARCHIVED.value,
+                    "updated_at": now
+                }
+            },
+            projection=fields,
+            return_document=ReturnDocument.BEFORE
+        )
+        if result is None:
+            # 不符合條件：文件不存在或已歸檔
+            existing = await self.conn.documents.find_one({"doc_code": doc_code}, fields)
+            if not existing:
+                raise ValueError(f"找不到文件: {doc_code}")
+            return Document.from_dict(existing) if return_document else None
+
+        await self._record_stats(status_counters(result.get("status"), DocumentStatus.ARCHIVED.value))
+        self._invalidate(doc_code)
+        return status_changed(result, DocumentStatus.ARCHIVED.value, now) if return_document else None
+
+    async def restore_document(
+        self,
+        doc_code: str,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
+        """恢復歸檔文件"""
+        now = datetime.now()
+        result = await self.conn.documents.find_one_and_update(
+            {"doc_code": doc_code},
+            {
+                "$set": {
+                    "status": DocumentStatus.ACTIVE.value,
+                    "updated_at": now
+                }
+            },
+            projection=with_fields(result_projection(return_document, projection), "status"),
+            return_document=ReturnDocument.BEFORE
+        )
+        if result is None:
+            raise ValueError(f"找不到文件: {doc_code}")
+
+        await self._record_stats(status_counters(result.get("status"), DocumentStatus.ACTIVE.value))
+        self._invalidate(doc_code)
+        return status_changed(result, DocumentStatus.ACTIVE.value, now) if return_document else None
+
+    # ============================================================
+    # 額外工具方法
+    # ============================================================
+    async def delete_document(self, doc_code: str, delete_files: bool = True) -> bool:
+        """刪除文件（慎用，規則同 DocumentService.delete_document），GridFS 檔案在沒有其他版本參照時才刪除"""
+        data = await self.conn.documents.find_one_and_delete({"doc_code": doc_code})
+        self._invalidate(doc_code)
+        if not data:
+            return False
+        doc = Document.from_dict(data)
+        if doc.split_versions:
+            cursor = self.conn.versions.find({"doc_code": doc_code}, VERSION_RECORD_PROJECTION).sort("version", 1)
+            doc.versions = [Version.from_dict(record) async for record in cursor]
+
+        counters = document_counters(doc, -1)
+        try:
+            if delete_files:
+                for version in doc.versions:
+                    deleted = await self.store.release(version.file_id, version.content_hash, counters)
+                    merge_counters(counters, released_counters(version, deleted))
+        finally:
+            if doc.split_versions:
+                await self.conn.versions.delete_many({"doc_code": doc_code})
+            await self._record_stats(counters)
+        return True
+
+    async def get_statistics(self, detailed: bool = False) -> Dict[str, Any]:
+        """取得統計資訊（參數同 DocumentService.get_statistics）"""
+        stats = await self.conn.stats.find_one({"_id": STATS_ID})
+        summary = summarize_counters(stats) if stats else await self.rebuild_statistics()
+        if detailed:
+            versions_collection = self.conn.versions.name
+            for pipeline in (DETAILED_PIPELINE, detailed_version_pipeline(versions_collection)):
+                cursor = await self.conn.documents.aggregate(pipeline)
+                results = await cursor.to_list()
+                summary.update(facet_counts(results[0] if results else {}))
+        return summary
+
+    async def rebuild_statistics(self) -> Dict[str, Any]:
+        """由 documents 與 blobs 重新計算 stats 計數器"""
+        cursor = await self.conn.documents.aggregate(statistics_pipeline())
+        results = await cursor.to_list()
+        cursor = await self.conn.documents.aggregate(
+            version_statistics_pipeline(self.conn.versions.name)
+        )
+        version_results = await cursor.to_list()
+        storage = await self.store.storage_stats()
+        stats = counters_from_pipeline(results, version_results, storage["stored_bytes"])
+        await self.conn.stats.replace_one({"_id": STATS_ID}, stats, upsert=True)
+        return summarize_counters(stats)
+
+    async def _record_stats(self, counters: Dict[str, int]) -> None:
+        """以 $inc 更新 stats 計數器（尚未建立時不寫入）"""
+        if any(counters.values()):
+            await self.conn.stats.update_one({"_id": STATS_ID}, stats_update(counters))
+
+    def _cache_key(self, doc_code: str) -> tuple:
+        """快取 key（含資料庫名稱）"""
+        return (self.conn.db.name, doc_code)
+
+    def _cache_document(self, doc: Dict[str, Any], generation: int) -> None:
+        """將讀到的完整文件存入快取（停用時不建立快照）"""
+        if self.cache.enabled:
+            self.cache.put(self._cache_key(doc["doc_code"]), document_snapshot(doc), doc["_id"], generation)
+
+    def _invalidate(self, doc_code: str) -> None:
+        """寫入後失效快取"""
+        self.cache.invalidate(self._cache_key(doc_code))
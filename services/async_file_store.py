@@ -0,0 +1,378 @@
+"""
+KM Document Management System - Async GridFS File Store
+FileStore 的 asyncio 版本：串流寫入/讀取 GridFS 並以內容雜湊去重
+"""
+import asyncio
+import hashlib
+import inspect
+import io
+import os
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config.settings import get_settings
+from db.async_connection import AsyncMongoDBConnection
+from services.compression import choose_compression, compressor, decompressor, RangeSlicer
+from services.delta import apply_chain, chain_limit, make_delta, worthwhile
+from services.file_store import (
+    BLOB_PROJECTION,
+    blob_record,
+    delta_base,
+    delta_depth,
+    file_metadata,
+    GRIDFS_BUCKET,
+    FileSource,
+    read_length,
+    reused_file,
+    StoredFile,
+    STORAGE_STATS_PIPELINE,
+    summarize_storage,
+)
+
+
+async def _write(writer: Any, data: bytes) -> None:
+    """寫入一段資料（支援同步與非同步寫入物件）"""
+    result = writer.write(data)
+    if inspect.isawaitable(result):
+        await result
+    drain = getattr(writer, "drain", None)
+    if drain is not None and inspect.iscoroutinefunction(drain):
+        await drain()
+
+
+class AsyncFileStore:
+    """GridFS 非同步串流存取"""
+
+    def __init__(self, connection: AsyncMongoDBConnection, chunk_size: Optional[int] = None):
+        self.conn = connection
+        self.chunk_size = chunk_size or get_settings().gridfs_chunk_size
+
+    async def put_stream(
+        self,
+        file_obj: Any,
+        file_name: str,
+        chunk_size: Optional[int] = None,
+        compression: str = "",
+        delta: Optional[Dict[str, Any]] = None
+    ) -> StoredFile:
+        """
+        以串流方式寫入 GridFS，同時計算檔案大小與 SHA-256
+
+        Args:
+            file_obj: 二進位檔案物件（read 可為同步或 async）
+            file_name: 檔案名稱
+            chunk_size: GridFS chunk 大小（預設使用設定值）
+            compression: 壓縮方式（空字串表示不壓縮）
+            delta: 寫入的是差異時，記錄在 metadata 的基底資訊
+        """
+        chunk_size = chunk_size or self.chunk_size
+        hasher = hashlib.sha256()
+        file_size = stored_size = 0
+        metadata = file_metadata(compression, delta)
+        encoder = compressor(compression) if compression else None
+
+        def encode(data: bytes) -> bytes:
+            hasher.update(data)
+            return encoder.compress(data) if encoder else data
+
+        def read_encoded() -> Tuple[int, bytes]:
+            data = file_obj.read(chunk_size)
+            return len(data), encode(data) if data else b""
+
+        grid_in = self.conn.fs.open_upload_stream(file_name, chunk_size_bytes=chunk_size, metadata=metadata)
+        try:
+            while True:
+                # 讀取、雜湊與壓縮都在執行緒中進行，避免阻塞 event loop
+                if inspect.iscoroutinefunction(file_obj.read):
+                    data = await file_obj.read(chunk_size)
+                    size = len(data)
+                    if data:
+                        data = await asyncio.to_thread(encode, data)
+                else:
+                    size, data = await asyncio.to_thread(read_encoded)
+                if not size:
+                    break
+                file_size += size
+                stored_size += len(data)
+                await grid_in.write(data)
+            if encoder:
+                data = encoder.flush()
+                stored_size += len(data)
+                await grid_in.write(data)
+                # 原始大小在寫入完成後才知道：close 前設定的欄位會隨 files 文件一起寫入
+                await grid_in.set("metadata", dict(metadata, length=file_size))
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        return StoredFile(
+            file_id=grid_in._id,
+            file_size=file_size,
+            content_hash=hasher.hexdigest(),
+            compression=compression,
+            stored_size=stored_size if compression else 0
+        )
+
+    async def put_dedup(
+        self,
+        source: FileSource,
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> Tuple[StoredFile, str]:
+        """
+        從檔案路徑或檔案物件串流寫入 GridFS 並以內容雜湊去重
+
+        Args:
+            compression: 壓縮方式（預設依設定值與檔案類型決定）
+
+        Returns:
+            (StoredFile, 檔案名稱)
+        """
+        if isinstance(source, (str, os.PathLike)):
+            name = file_name or os.path.basename(source)
+            codec = choose_compression(name, compression)
+            f: BinaryIO = await asyncio.to_thread(open, source, "rb")
+            try:
+                stored = await self.put_stream(f, name, chunk_size, codec)
+            finally:
+                await asyncio.to_thread(f.close)
+        else:
+            name = file_name or os.path.basename(getattr(source, "name", "") or "")
+            if not name:
+                raise ValueError("使用檔案物件上傳時必須指定 file_name")
+            stored = await self.put_stream(source, name, chunk_size, choose_compression(name, compression))
+        return await self._register(stored), name
+
+    async def put_delta(
+        self,
+        data: bytes,
+        file_name: str,
+        base_file_id: ObjectId,
+        base_hash: str,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> StoredFile:
+        """以前一版為基底寫入新版本並去重（規則同 FileStore.put_delta，雜湊與比對在執行緒中進行）"""
+        content_hash = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        existing = await self._acquire(content_hash)
+        if existing:
+            return reused_file(existing, len(data), content_hash)
+
+        codec = choose_compression(file_name, compression)
+        base_doc = await self.conn.db[f"{GRIDFS_BUCKET}.files"].find_one({"_id": base_file_id}, {"metadata": 1})
+        depth = delta_depth((base_doc or {}).get("metadata")) + 1
+
+        delta = None
+        if base_doc is not None and depth < get_settings().delta_snapshot_interval:
+            base = await self.read_content(base_file_id)
+            delta = await asyncio.to_thread(make_delta, base, data)
+            if not worthwhile(delta, data) or not await self._acquire_base(base_hash, base_file_id):
+                delta = None
+
+        if delta is None:
+            stored = await self.put_stream(io.BytesIO(data), file_name, chunk_size, codec)
+            return await self._register(stored)
+
+        try:
+            stored = await self.put_stream(
+                io.BytesIO(delta), file_name, chunk_size, codec,
+                delta={"base": base_file_id, "base_hash": base_hash, "depth": depth, "size": len(data)}
+            )
+        except BaseException:
+            await self.release(base_file_id, base_hash)
+            raise
+        stored.stored_size = stored.bytes_stored
+        stored.file_size = len(data)
+        stored.content_hash = content_hash
+        return await self._register(stored)
+
+    async def release(
+        self,
+        file_id: ObjectId,
+        content_hash: str = "",
+        counters: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """
+        釋放一個版本對 GridFS 檔案的參照，計數歸零時才刪除
+
+        Args:
+            file_id: GridFS 檔案 ID
+            content_hash: 內容雜湊
+            counters: 統計計數器增量；連帶刪除的差異基底累加於此（同 FileStore.delete_files）
+
+        Returns:
+            bool: GridFS 檔案是否已刪除
+        """
+        blob = None
+        if content_hash:
+            blob = await self.conn.blobs.find_one_and_update(
+                {"_id": content_hash, "file_id": file_id},
+                {"$inc": {"ref_count": -1}},
+                return_document=ReturnDocument.AFTER
+            )
+
+        if blob is not None:
+            if blob["ref_count"] > 0:
+                return False
+            result = await self.conn.blobs.delete_one(
+                {"_id": content_hash, "ref_count": {"$lte": 0}}
+            )
+            if result.deleted_count == 0:
+                return False
+
+        await self._delete_file(file_id, counters)
+        return True
+
+    async def _delete_file(self, file_id: ObjectId, counters: Optional[Dict[str, int]] = None) -> None:
+        """刪除 GridFS 檔案；差異檔案刪除後釋放其對基底的參照（連帶刪除的基底計入 counters）"""
+        files = self.conn.db[f"{GRIDFS_BUCKET}.files"]
+        doc = await files.find_one({"_id": file_id}, {"metadata": 1})
+        await self.conn.fs.delete(file_id)
+        base = delta_base((doc or {}).get("metadata"))
+        if not base:
+            return
+        base_doc = await files.find_one({"_id": base[1]}, {"length": 1})
+        if await self.release(base[1], base[0], counters) and counters is not None and base_doc:
+            counters["stored_bytes"] = counters.get("stored_bytes", 0) - base_doc["length"]
+
+    async def storage_stats(self) -> Dict[str, int]:
+        """統計實際儲存量與去重節省的容量"""
+        cursor = await self.conn.blobs.aggregate(STORAGE_STATS_PIPELINE)
+        return summarize_storage(await cursor.to_list())
+
+    async def _read_stored(self, file_id: ObjectId) -> Tuple[bytes, Dict[str, Any]]:
+        """讀取 GridFS 檔案的完整內容（解壓縮，差異不還原）與 metadata"""
+        grid_out = await self.conn.fs.open_download_stream(file_id)
+        try:
+            metadata = grid_out.metadata or {}
+            data = await grid_out.read()
+        finally:
+            await grid_out.close()
+
+        compression = metadata.get("compression", "")
+        if compression:
+            data = await asyncio.to_thread(decompressor(compression).decompress, data)
+        return data, metadata
+
+    async def read_content(self, file_id: ObjectId) -> bytes:
+        """讀取完整內容（規則與記憶體用量同 FileStore.read_content，還原在執行緒中進行）"""
+        data, metadata = await self._read_stored(file_id)
+        limit = chain_limit(delta_depth(metadata))
+        deltas: List[bytes] = []
+        base = delta_base(metadata)
+        while base:
+            if len(deltas) >= limit:
+                raise ValueError(f"差異基底鏈超過 {limit} 層: {file_id}")
+            deltas.append(data)
+            data, metadata = await self._read_stored(base[1])
+            base = delta_base(metadata)
+        return await asyncio.to_thread(apply_chain, data, deltas)
+
+    async def iter_range(
+        self,
+        file_id: ObjectId,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        以 GridFS chunk 為單位串流讀取檔案（壓縮的檔案邊讀邊解壓縮）
+
+        差異檔案需先在記憶體還原完整內容（見 FileStore.read_content）
+
+        Args:
+            file_id: GridFS 檔案 ID
+            offset: 起始位置（bytes，以原始內容計算）
+            length: 讀取長度（預設讀到檔尾）
+        """
+        grid_out = await self.conn.fs.open_download_stream(file_id)
+        try:
+            metadata = grid_out.metadata or {}
+            if delta_base(metadata):
+                content = await self.read_content(file_id)
+                remaining = read_length(len(content), offset, length)
+                for start in range(offset, offset + remaining, grid_out.chunk_size):
+                    yield content[start:min(start + grid_out.chunk_size, offset + remaining)]
+                return
+
+            compression = metadata.get("compression", "")
+            total = metadata["length"] if compression else grid_out.length
+            remaining = read_length(total, offset, length)
+
+            if compression:
+                decoder = decompressor(compression)
+                slicer = RangeSlicer(offset, remaining)
+                while not slicer.done:
+                    data = await grid_out.read(grid_out.chunk_size)
+                    if not data:
+                        break
+                    data = slicer.feed(decoder.decompress(data))
+                    if data:
+                        yield data
+                return
+
+            await grid_out.seek(offset)
+            while remaining > 0:
+                position = grid_out.tell()
+                size = min(grid_out.chunk_size - position % grid_out.chunk_size, remaining)
+                data = await grid_out.read(size)
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+        finally:
+            await grid_out.close()
+
+    async def copy_range(
+        self,
+        file_id: ObjectId,
+        writer: Any,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> int:
+        """
+        將檔案（或指定範圍）串流寫入可寫入物件（同步或 async）
+
+        Returns:
+            int: 寫入的 bytes 數
+        """
+        written = 0
+        async for data in self.iter_range(file_id, offset, length):
+            await _write(writer, data)
+            written += len(data)
+        return written
+
+    async def _acquire(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """若雜湊已存在則增加參照計數並回傳 blob 記錄"""
+        return await self.conn.blobs.find_one_and_update(
+            {"_id": content_hash},
+            {"$inc": {"ref_count": 1}},
+            projection=BLOB_PROJECTION
+        )
+
+    async def _acquire_base(self, content_hash: str, file_id: ObjectId) -> bool:
+        """增加差異基底的參照計數（基底需有對應的 blob 記錄）"""
+        result = await self.conn.blobs.update_one(
+            {"_id": content_hash, "file_id": file_id},
+            {"$inc": {"ref_count": 1}}
+        )
+        return result.modified_count > 0
+
+    async def _register(self, stored: StoredFile) -> StoredFile:
+        """登記新寫入的檔案；雜湊重複時改用既有檔案"""
+        existing = await self._acquire(stored.content_hash)
+        if existing is None:
+            try:
+                await self.conn.blobs.insert_one(blob_record(stored))
+                return stored
+            except DuplicateKeyError:
+                existing = await self._acquire(stored.content_hash)
+                if existing is None:
+                    raise
+
+        await self._delete_file(stored.file_id)
+        return reused_file(existing, stored.file_size, stored.content_hash)
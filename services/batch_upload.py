@@ -0,0 +1,172 @@
+"""
+KM Document Management System - Batch Upload
+upload-dir 的上傳來源（目錄、CSV 清單、manifest.json）、進度顯示與斷點紀錄
+"""
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.document_service import BulkImportResult, UploadFileItem
+
+# 各來源共用的必要欄位（可由命令列參數提供預設值）
+REQUIRED_FIELDS = ("department", "category", "uploaded_by")
+
+
+def make_item(
+    file_path: str,
+    defaults: Dict[str, Any],
+    doc_code: Optional[str] = None,
+    title: Optional[str] = None,
+    department: Optional[str] = None,
+    category: Optional[str] = None,
+    uploaded_by: Optional[str] = None,
+    description: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> UploadFileItem:
+    """
+    組出上傳項目，未指定的欄位取自 defaults；文件編號與標題預設為檔名（不含副檔名）
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    fields = {
+        "department": department or defaults.get("department"),
+        "category": category or defaults.get("category"),
+        "uploaded_by": uploaded_by or defaults.get("uploaded_by"),
+    }
+    missing = [name for name in REQUIRED_FIELDS if not fields[name]]
+    if missing:
+        raise ValueError(f"{file_path}: 缺少 {', '.join(missing)}")
+
+    return UploadFileItem(
+        doc_code=doc_code or stem,
+        title=title or stem,
+        file_path=file_path,
+        metadata=metadata or {},
+        description=description or defaults.get("description") or "初版",
+        **fields
+    )
+
+
+def scan_directory(root: str, defaults: Dict[str, Any]) -> Iterator[UploadFileItem]:
+    """依檔名排序走訪目錄（略過隱藏檔），每個檔案一份文件"""
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith("."))
+        for name in sorted(file_names):
+            if not name.startswith("."):
+                yield make_item(os.path.join(dir_path, name), defaults)
+
+
+def read_csv_manifest(path: str, defaults: Dict[str, Any]) -> Iterator[UploadFileItem]:
+    """
+    讀取 CSV 清單
+
+    欄位：file（必要，相對於 CSV 所在目錄）、doc_code、title、department、category、
+    uploaded_by、description、keywords（逗號分隔）、owner
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            metadata: Dict[str, Any] = {}
+            if row.get("keywords"):
+                metadata["keywords"] = [k.strip() for k in row["keywords"].split(",") if k.strip()]
+            if row.get("owner"):
+                metadata["owner"] = row["owner"]
+            yield make_item(
+                os.path.join(base_dir, row["file"]),
+                defaults,
+                doc_code=row.get("doc_code"),
+                title=row.get("title"),
+                department=row.get("department"),
+                category=row.get("category"),
+                uploaded_by=row.get("uploaded_by"),
+                description=row.get("description"),
+                metadata=metadata
+            )
+
+
+def read_json_manifest(path: str, defaults: Dict[str, Any]) -> Iterator[UploadFileItem]:
+    """讀取 manifest.json（data/manifest.json 格式，上傳各文件最新版本的 raw_path）"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    for doc in manifest.get("documents", []):
+        versions = doc.get("versions") or []
+        if not versions:
+            continue
+        yield make_item(
+            os.path.join(base_dir, versions[-1]["raw_path"]),
+            defaults,
+            doc_code=doc.get("doc_id"),
+            title=doc.get("title"),
+            department=doc.get("department"),
+            category=doc.get("category"),
+            metadata=doc.get("metadata")
+        )
+
+
+def load_upload_items(source: str, defaults: Dict[str, Any]) -> Iterator[UploadFileItem]:
+    """依來源類型（目錄、.csv、.json）產生上傳項目"""
+    if os.path.isdir(source):
+        return scan_directory(source, defaults)
+    extension = os.path.splitext(source)[1].lower()
+    if extension == ".csv":
+        return read_csv_manifest(source, defaults)
+    if extension == ".json":
+        return read_json_manifest(source, defaults)
+    raise ValueError(f"不支援的上傳來源: {source}（請指定目錄、.csv 或 manifest.json）")
+
+
+class UploadCheckpoint:
+    """
+    斷點紀錄
+
+    每批完成後附加已處理（成功或已存在）的文件編號，中斷後重新執行時直接略過；
+    失敗的文件不記錄，重新執行時會再嘗試。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, doc_code: str) -> bool:
+        return doc_code in self.done
+
+    def record(self, result: BulkImportResult) -> None:
+        """寫入一批的結果（立即 fsync，避免中斷時遺失）"""
+        codes = result.inserted + result.skipped
+        if not codes:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{code}\n" for code in codes))
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(codes)
+
+
+class UploadProgress:
+    """每批完成後顯示進度與吞吐量"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.result = BulkImportResult()
+        self.started = time.perf_counter()
+
+    def __call__(self, batch_result: BulkImportResult) -> None:
+        self.result.merge(batch_result)
+        done = len(self.result.inserted) + len(self.result.skipped) + len(self.result.failed)
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print(
+            f"  [{done}/{self.total}] 成功 {len(self.result.inserted)}, "
+            f"略過 {len(self.result.skipped)}, 失敗 {len(self.result.failed)} | "
+            f"{done / elapsed:.1f} 檔/秒, {self.result.inserted_bytes / elapsed / 1024 / 1024:.1f} MB/s"
+        )
+
+
+def failure_rows(result: BulkImportResult, limit: int = 20) -> List[List[str]]:
+    """失敗摘要（最多 limit 筆）"""
+    return [[code, reason] for code, reason in list(result.failed.items())[:limit]]
@@ -0,0 +1,223 @@
+"""
+KM Document Management System - Document Cache
+get_by_doc_code 的行程內 LRU/TTL 快取
+
+寫入路徑會主動失效對應的快取；多行程部署時可另外啟動
+ChangeStreamInvalidator 監聽 documents 的 change stream，讓其他行程的寫入也能即時失效。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from config.settings import get_settings
+
+
+class DocumentCache:
+    """
+    LRU + TTL 快取（執行緒安全）
+
+    值需為不可變物件（文件快取存放 BSON bytes，命中時由呼叫端重建 Document），
+    快取本身不複製，也不會因讀取而觸發任何解碼
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: 最多快取筆數（0 表示停用，預設使用設定值）
+            ttl: 快取有效秒數（預設使用設定值）
+        """
+        settings = get_settings()
+        self.max_size = settings.doc_cache_size if max_size is None else max_size
+        self.ttl = settings.doc_cache_ttl if ttl is None else ttl
+        self._lock = threading.Lock()
+        # key -> (到期時間, 值, MongoDB _id)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Any]]" = OrderedDict()
+        self._keys_by_id: Dict[Any, Hashable] = {}
+        # 每次失效遞增；讀取資料庫期間若有失效，結果不寫入快取（避免寫回舊資料）
+        self._generation = 0
+        self._counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def generation(self) -> int:
+        """目前的失效世代（讀取資料庫前取得，寫入快取時傳回）"""
+        return self._generation
+
+    @property
+    def enabled(self) -> bool:
+        """是否啟用快取"""
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """取得快取值（未命中或已過期回傳 None）"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+        return value
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        object_id: Any = None,
+        generation: Optional[int] = None
+    ) -> None:
+        """
+        寫入快取，超過上限時淘汰最久未使用的項目
+
+        Args:
+            key: 快取 key
+            value: 快取值
+            object_id: MongoDB _id（供 change stream 失效使用）
+            generation: 讀取資料庫前的 generation；期間有任何失效則不寫入
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, object_id)
+            if object_id is not None:
+                self._keys_by_id[object_id] = key
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """失效指定 key"""
+        with self._lock:
+            self._generation += 1
+            if self._remove(key):
+                self._counters["invalidations"] += 1
+
+    def invalidate_id(self, object_id: Any) -> None:
+        """依 MongoDB _id 失效（change stream 事件只帶 _id）"""
+        with self._lock:
+            self._generation += 1
+            key = self._keys_by_id.get(object_id)
+            if key is not None and self._remove(key):
+                self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        """清空快取"""
+        with self._lock:
+            self._generation += 1
+            self._counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._keys_by_id.clear()
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        object_id = entry[2]
+        if object_id is not None and self._keys_by_id.get(object_id) == key:
+            del self._keys_by_id[object_id]
+        return True
+
+    # --- 監控 ---
+    def stats(self) -> Dict[str, Any]:
+        """取得快取統計"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["size"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def to_prometheus(self, prefix: str = "km_doc_cache") -> str:
+        """以 Prometheus 文字格式輸出，供監控系統抓取"""
+        lines = []
+        for name, value in self.stats().items():
+            lines.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def watch(self, connection) -> "ChangeStreamInvalidator":
+        """啟動 change stream 監聽，讓其他行程的寫入也能失效本行程的快取"""
+        invalidator = ChangeStreamInvalidator(self, connection)
+        invalidator.start()
+        return invalidator
+
+
+class ChangeStreamInvalidator(threading.Thread):
+    """
+    監聽 documents 的 change stream 並失效快取（需要 replica set 或 sharded cluster）
+
+    連線中斷時先清空快取再重新監聽，確保中斷期間的寫入不會留下過期資料
+    """
+
+    # 會使整個 collection 的快取失效的事件
+    _RESET_EVENTS = {"drop", "rename", "dropDatabase", "invalidate"}
+
+    def __init__(self, cache: DocumentCache, connection, retry_interval: float = 1.0):
+        super().__init__(name="km-doc-cache-invalidator", daemon=True)
+        self.cache = cache
+        self.conn = connection
+        self.retry_interval = retry_interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        resume_token = None
+        while not self._stop_event.is_set():
+            try:
+                with self.conn.documents.watch(resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    while not self._stop_event.is_set() and stream.alive:
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is None:
+                            continue
+                        if change["operationType"] in self._RESET_EVENTS:
+                            self.cache.clear()
+                            resume_token = None
+                        elif "documentKey" in change:
+                            self.cache.invalidate_id(change["documentKey"]["_id"])
+            except PyMongoError:
+                # 中斷期間的事件可能遺失，清空快取後重試
+                self.cache.clear()
+                resume_token = None
+                self._stop_event.wait(self.retry_interval)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止監聽"""
+        self._stop_event.set()
+        self.join(timeout)
+
+
+# 行程內共用的快取（fork 後的子行程各自建立）
+_cache: Optional[DocumentCache] = None
+_cache_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_document_cache() -> DocumentCache:
+    """取得行程內共用的文件快取"""
+    global _cache, _cache_pid
+    with _lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = DocumentCache()
+            _cache_pid = os.getpid()
+        return _cache
@@ -0,0 +1,391 @@
+"""
+KM Document Management System - Chunk Service
+條款 chunks 的儲存與查詢
+
+chunks 存放在 chunks collection，keywords、entities.value 為 multikey 索引，
+article_number 與 doc_id 為複合索引；關鍵字、實體與條款查詢都只需一次索引查找，
+不必在每次啟動時載入所有 *_chunks.json 重建記憶體索引。
+
+載入以每個 chunk 的內容雜湊比對，只寫入新增或變更的 chunk；sync_manifest 另以
+chunk_sources 記錄各文件已載入的 manifest 版本，未變更的文件連 chunks 檔案都不讀取。
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DeleteMany, ReplaceOne, UpdateMany
+
+from config.settings import get_settings
+from db.connection import get_db_connection, MongoDBConnection
+from models.chunk import Chunk
+from services.document_service import batched
+from services.json_stream import open_array_stream
+
+# chunks collection 的索引：(欄位, 索引名稱, 其他選項)
+CHUNK_INDEXES: List[Tuple[List[Tuple[str, int]], str, Dict[str, Any]]] = [
+    ([("chunk_id", ASCENDING)], "idx_chunk_id", {"unique": True}),
+    ([("doc_id", ASCENDING)], "idx_chunk_doc_id", {}),
+    ([("keywords", ASCENDING)], "idx_chunk_keywords", {}),
+    ([("entities.value", ASCENDING)], "idx_chunk_entities", {}),
+    ([("article_number", ASCENDING), ("doc_id", ASCENDING)], "idx_chunk_article", {}),
+]
+
+# 查詢結果依 chunk_id（即條款順序）排序
+CHUNK_SORT = [("chunk_id", ASCENDING)]
+
+
+def match_query(field_name: str, value: str, partial: bool) -> Dict[str, Any]:
+    """
+    完全相符或部分相符的條件
+
+    部分相符以未錨定的 $regex 比對，仍使用索引但需掃描整個索引的 key
+    """
+    if partial:
+        return {field_name: {"$regex": re.escape(value)}}
+    return {field_name: value}
+
+
+def scoped(query: Dict[str, Any], doc_id: Optional[str]) -> Dict[str, Any]:
+    """限定在指定文件（doc_id）內查詢"""
+    if doc_id:
+        query["doc_id"] = doc_id
+    return query
+
+
+# 不計入內容雜湊的欄位（版本變更但內容相同的 chunk 不需重寫）
+_UNHASHED_FIELDS = ("_id", "doc_version", "content_hash")
+
+# manifest 版本資訊中，任一變更即需重新載入的欄位
+SOURCE_FIELDS = ("version", "processed_path", "chunk_count", "ai_processed_at")
+
+
+def chunk_record(raw: Dict[str, Any], doc_id: str, version: int) -> Dict[str, Any]:
+    """將 *_chunks.json 的單筆 chunk 轉為 chunks collection 的記錄（含內容雜湊）"""
+    record = Chunk.from_dict(dict(raw, doc_id=doc_id, doc_version=version)).to_dict()
+    hashed = {key: value for key, value in record.items() if key not in _UNHASHED_FIELDS}
+    encoded = json.dumps(hashed, ensure_ascii=False, sort_keys=True, default=str).encode()
+    record["content_hash"] = hashlib.sha256(encoded).hexdigest()
+    return record
+
+
+def source_record(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """manifest 中文件最新版本的 chunks 來源（尚未經 AI 處理則回傳 None）"""
+    versions = doc.get("versions") or []
+    if not versions:
+        return None
+    latest = versions[-1]
+    if not latest.get("ai_processed") or not latest.get("processed_path"):
+        return None
+    return {name: latest.get(name) for name in SOURCE_FIELDS}
+
+
+@dataclass
+class ChunkSyncResult:
+    """chunks 同步結果（chunk 數與文件 ID）"""
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    synced_docs: List[str] = field(default_factory=list)
+    skipped_docs: List[str] = field(default_factory=list)
+    removed_docs: List[str] = field(default_factory=list)
+
+    @property
+    def written(self) -> int:
+        """寫入（新增、更新、刪除）的 chunk 數"""
+        return self.inserted + self.updated + self.deleted
+
+    def merge(self, other: "ChunkSyncResult") -> "ChunkSyncResult":
+        """累加另一個結果"""
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.deleted += other.deleted
+        self.synced_docs.extend(other.synced_docs)
+        self.skipped_docs.extend(other.skipped_docs)
+        self.removed_docs.extend(other.removed_docs)
+        return self
+
+
+class ChunkService:
+    """條款 chunks 服務"""
+
+    def __init__(self, connection: Optional[MongoDBConnection] = None):
+        self.conn = connection or get_db_connection()
+
+    @property
+    def collection(self):
+        """chunks collection"""
+        return self.conn.chunks
+
+    def ensure_indexes(self) -> None:
+        """建立 chunks collection 的索引"""
+        for keys, name, options in CHUNK_INDEXES:
+            self.collection.create_index(keys, name=name, **options)
+
+    # ============================================================
+    # 載入
+    # ============================================================
+    def sync_chunks(
+        self,
+        doc_id: str,
+        version: int,
+        chunks: Iterable[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> ChunkSyncResult:
+        """
+        以新內容更新一份文件的 chunks
+
+        先取得既有 chunk 的內容雜湊，逐筆比對後只以 bulk_write 寫入新增或變更的 chunk，
+        最後刪除新內容中已不存在的 chunk；內容相同只有版本不同的 chunk 以一次
+        update_many 更新 doc_version。chunks 可為產生器，依批次寫入。
+        chunk_id 已屬於其他文件時不搬移該 chunk，改為拋出錯誤。
+
+        Args:
+            doc_id: 文件 ID
+            version: 文件版本
+            chunks: *_chunks.json 的 chunks
+            batch_size: 每次 bulk_write 的筆數（預設使用設定值）
+
+        Returns:
+            ChunkSyncResult: 新增、更新、未變更與刪除的 chunk 數
+
+        Raises:
+            ValueError: chunk_id 與其他文件的 chunk 重複
+        """
+        batch_size = batch_size or get_settings().bulk_batch_size
+        existing = {
+            data["chunk_id"]: data.get("content_hash", "")
+            for data in self.collection.find({"doc_id": doc_id}, {"_id": 0, "chunk_id": 1, "content_hash": 1})
+        }
+        result = ChunkSyncResult(synced_docs=[doc_id])
+        seen = set()
+
+        def changed_records() -> Iterable[Dict[str, Any]]:
+            for raw in chunks:
+                record = chunk_record(raw, doc_id, version)
+                chunk_id = record["chunk_id"]
+                seen.add(chunk_id)
+                if chunk_id not in existing:
+                    result.inserted += 1
+                elif existing[chunk_id] != record["content_hash"]:
+                    result.updated += 1
+                else:
+                    result.unchanged += 1
+                    continue
+                yield record
+
+        for batch in batched(changed_records(), batch_size):
+            new_ids = [record["chunk_id"] for record in batch if record["chunk_id"] not in existing]
+            self._check_collisions(doc_id, new_ids)
+            # 條件含 doc_id：同時寫入的其他文件搶先使用同一 chunk_id 時由唯一索引拒絕
+            self.collection.bulk_write([
+                ReplaceOne({"chunk_id": record["chunk_id"], "doc_id": doc_id}, record, upsert=True)
+                for record in batch
+            ], ordered=False)
+
+        ops: List[Any] = []
+        if result.unchanged:
+            ops.append(UpdateMany(
+                {"doc_id": doc_id, "doc_version": {"$ne": version}},
+                {"$set": {"doc_version": version}}
+            ))
+        removed = [chunk_id for chunk_id in existing if chunk_id not in seen]
+        if removed:
+            ops.append(DeleteMany({"doc_id": doc_id, "chunk_id": {"$in": removed}}))
+            result.deleted = len(removed)
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return result
+
+    def _check_collisions(self, doc_id: str, chunk_ids: List[str]) -> None:
+        """確認新的 chunk_id 沒有被其他文件使用"""
+        if not chunk_ids:
+            return
+        taken = list(self.collection.find(
+            {"chunk_id": {"$in": chunk_ids}, "doc_id": {"$ne": doc_id}},
+            {"_id": 0, "chunk_id": 1, "doc_id": 1}
+        ).limit(5))
+        if taken:
+            listed = ", ".join(f"{data['chunk_id']}（{data['doc_id']}）" for data in taken)
+            raise ValueError(f"{doc_id}: chunk_id 已屬於其他文件: {listed}")
+
+    def load_chunks(self, data: Dict[str, Any]) -> ChunkSyncResult:
+        """載入一份 *_chunks.json 的內容（含 doc_id、version 與 chunks）"""
+        return self.sync_chunks(data["doc_id"], data.get("version", 1), data.get("chunks", []))
+
+    def load_file(self, path: str) -> ChunkSyncResult:
+        """
+        載入一個 *_chunks.json 檔案
+
+        以串流逐筆讀取 chunks，大型檔案不需整份載入記憶體；
+        doc_id、version 需位於 chunks 之前（.jsonl 則為第一行）。
+        """
+        with open_array_stream(path, "chunks") as stream:
+            doc_id = stream.header.get("doc_id")
+            if not doc_id:
+                raise ValueError(f"{path}: doc_id 需位於 chunks 之前")
+            result = self.sync_chunks(doc_id, stream.header.get("version", 1), stream)
+        print(
+            f"✓ 已載入 chunks: {doc_id} "
+            f"(新增 {result.inserted}, 更新 {result.updated}, 未變更 {result.unchanged}, 刪除 {result.deleted})"
+        )
+        return result
+
+    def sync_manifest(
+        self,
+        manifest_path: str,
+        force: bool = False,
+        prune: bool = False,
+        dry_run: bool = False
+    ) -> ChunkSyncResult:
+        """
+        依 manifest.json 增量同步 chunks
+
+        以各文件最新版本的 version、processed_path、chunk_count、ai_processed_at
+        與 chunk_sources 的記錄比對，只重新載入有變更的文件；文件內再以內容雜湊
+        只寫入變更的 chunk。chunks 寫入完成後才更新 chunk_sources，中斷後重新執行即可。
+
+        Args:
+            manifest_path: manifest.json 路徑（processed_path 相對於其所在目錄）
+            force: 忽略 chunk_sources，重新比對所有文件的 chunk 雜湊
+            prune: 刪除 manifest 中已不存在的文件的 chunks（最新版本尚未處理的文件保留已同步的 chunks）
+            dry_run: 只列出需要同步的文件，不寫入
+
+        Returns:
+            ChunkSyncResult: 同步結果
+        """
+        base_dir = os.path.dirname(os.path.abspath(manifest_path))
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        loaded = {source["_id"]: source for source in self.conn.chunk_sources.find()}
+        result = ChunkSyncResult()
+        listed = set()
+        for doc in manifest.get("documents", []):
+            doc_id = doc["doc_id"]
+            listed.add(doc_id)
+            source = source_record(doc)
+            if source is None:
+                continue
+            previous = loaded.get(doc_id)
+            if not force and previous and all(previous.get(name) == source[name] for name in SOURCE_FIELDS):
+                result.skipped_docs.append(doc_id)
+                continue
+            if dry_run:
+                result.synced_docs.append(doc_id)
+                continue
+
+            with open_array_stream(os.path.join(base_dir, source["processed_path"]), "chunks") as stream:
+                version = source["version"] or stream.header.get("version", 1)
+                result.merge(self.sync_chunks(doc_id, version, stream))
+            self.conn.chunk_sources.replace_one(
+                {"_id": doc_id},
+                dict(source, synced_at=datetime.now()),
+                upsert=True
+            )
+
+        if prune:
+            stale = sorted((set(loaded) | set(self.collection.distinct("doc_id"))) - listed)
+            result.removed_docs.extend(stale)
+            if stale and not dry_run:
+                result.deleted += self.collection.delete_many({"doc_id": {"$in": stale}}).deleted_count
+                self.conn.chunk_sources.delete_many({"_id": {"$in": stale}})
+        return result
+
+    # ============================================================
+    # 查詢
+    # ============================================================
+    def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
+        """依 chunk_id 取得 chunk"""
+        data = self.collection.find_one({"chunk_id": chunk_id})
+        return Chunk.from_dict(data) if data else None
+
+    def get_article(self, article_number: str, doc_id: Optional[str] = None) -> Optional[Chunk]:
+        """
+        取得特定條款
+
+        Args:
+            article_number: 條款編號，如 "第30條"
+            doc_id: 文件 ID（多部法規時指定，未指定則取第一筆）
+        """
+        cursor = self.collection.find(scoped({"article_number": article_number}, doc_id))
+        for data in cursor.sort(CHUNK_SORT).limit(1):
+            return Chunk.from_dict(data)
+        return None
+
+    def get_related_articles(self, article_number: str, doc_id: Optional[str] = None) -> List[Chunk]:
+        """取得相關條款（依 related_articles 的順序，同一文件內查詢）"""
+        chunk = self.get_article(article_number, doc_id)
+        if not chunk or not chunk.related_articles:
+            return []
+        found = {
+            data["article_number"]: Chunk.from_dict(data)
+            for data in self.collection.find({
+                "doc_id": chunk.doc_id,
+                "article_number": {"$in": chunk.related_articles}
+            })
+        }
+        return [found[number] for number in chunk.related_articles if number in found]
+
+    def search_by_keyword(
+        self,
+        keyword: str,
+        partial: bool = False,
+        doc_id: Optional[str] = None,
+        limit: int = 0
+    ) -> List[Chunk]:
+        """
+        依關鍵字搜尋 chunks
+
+        Args:
+            keyword: 關鍵字
+            partial: 是否部分相符（如「加班」符合「加班費」）
+            doc_id: 只搜尋指定文件
+            limit: 最多回傳筆數（0 表示不限）
+        """
+        query = scoped(match_query("keywords", keyword, partial), doc_id)
+        return [Chunk.from_dict(data) for data in self.collection.find(query).sort(CHUNK_SORT).limit(limit)]
+
+    def search_by_entity(
+        self,
+        value: str,
+        entity_type: Optional[str] = None,
+        partial: bool = False,
+        doc_id: Optional[str] = None,
+        limit: int = 0
+    ) -> List[Chunk]:
+        """
+        依實體搜尋 chunks
+
+        Args:
+            value: 實體值，如「雇主」
+            entity_type: 實體類型，如「角色」（指定時需為同一個實體）
+            partial: 是否部分相符
+            doc_id: 只搜尋指定文件
+            limit: 最多回傳筆數（0 表示不限）
+        """
+        if entity_type:
+            condition = match_query("value", value, partial)
+            condition["type"] = entity_type
+            query = {"entities": {"$elemMatch": condition}}
+        else:
+            query = match_query("entities.value", value, partial)
+        query = scoped(query, doc_id)
+        return [Chunk.from_dict(data) for data in self.collection.find(query).sort(CHUNK_SORT).limit(limit)]
+
+    def list_keywords(self, doc_id: Optional[str] = None) -> List[str]:
+        """取得所有關鍵字"""
+        return sorted(self.collection.distinct("keywords", scoped({}, doc_id)))
+
+    def list_entities(self, doc_id: Optional[str] = None) -> List[str]:
+        """取得所有實體值"""
+        return sorted(self.collection.distinct("entities.value", scoped({}, doc_id)))
+
+    def count(self, doc_id: Optional[str] = None) -> int:
+        """chunk 數"""
+        return self.collection.count_documents(scoped({}, doc_id))
@@ -0,0 +1,120 @@
+"""
+KM Document Management System - Compression
+寫入 GridFS 時的串流壓縮
+
+文字、JSON 等內容壓縮後可大幅減少儲存量與下載傳輸量；已是壓縮格式的檔案
+（pdf、zip、圖片、Office Open XML 等）不再壓縮。zlib 為標準函式庫，
+zstd 需另外安裝 zstandard 套件，未安裝時改用 zlib。
+"""
+import zlib
+from typing import Any, Optional
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+from config.settings import get_settings
+
+# 壓縮方式（空字串表示未壓縮）
+NONE = ""
+ZLIB = "zlib"
+ZSTD = "zstd"
+CODECS = (ZLIB, ZSTD)
+
+# 已是壓縮格式的檔案類型（docx/xlsx/pptx 為 zip 封裝）
+PRECOMPRESSED_TYPES = frozenset({
+    "pdf", "zip", "gz", "tgz", "bz2", "xz", "zst", "7z", "rar",
+    "jpg", "jpeg", "png", "gif", "webp", "heic",
+    "mp3", "mp4", "m4a", "mov", "avi", "mkv",
+    "docx", "xlsx", "pptx", "odt", "ods", "odp", "epub",
+})
+
+
+def resolve_codec(name: Optional[str]) -> str:
+    """
+    將設定值轉為實際使用的壓縮方式
+
+    Args:
+        name: none / zlib / zstd（zstd 未安裝時改用 zlib）
+    """
+    name = (name or "").lower()
+    if name in ("", "none"):
+        return NONE
+    if name not in CODECS:
+        raise ValueError(f"不支援的壓縮方式: {name}（可用: none, {', '.join(CODECS)}）")
+    if name == ZSTD and not HAS_ZSTD:
+        return ZLIB
+    return name
+
+
+def choose_compression(file_name: str, codec: Optional[str] = None) -> str:
+    """
+    依檔案類型決定壓縮方式
+
+    Args:
+        file_name: 檔案名稱
+        codec: 壓縮方式（預設使用設定值）
+    """
+    codec = resolve_codec(get_settings().compression if codec is None else codec)
+    if codec and file_name.rsplit(".", 1)[-1].lower() in PRECOMPRESSED_TYPES:
+        return NONE
+    return codec
+
+
+def compressor(codec: str, level: Optional[int] = None) -> Any:
+    """建立串流壓縮物件（compress(data) / flush()）"""
+    level = get_settings().compression_level if level is None else level
+    if codec == ZLIB:
+        return zlib.compressobj(level)
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"不支援的壓縮方式: {codec}")
+
+
+def decompressor(codec: str) -> Any:
+    """建立串流解壓縮物件（decompress(data)）"""
+    if codec == ZLIB:
+        return zlib.decompressobj()
+    if codec == ZSTD:
+        if not HAS_ZSTD:
+            raise RuntimeError("此檔案以 zstd 壓縮，請安裝 zstandard 套件")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"不支援的壓縮方式: {codec}")
+
+
+def compress_bytes(data: bytes, codec: str, level: Optional[int] = None) -> bytes:
+    """壓縮記憶體中的內容"""
+    if not codec:
+        return data
+    c = compressor(codec, level)
+    return c.compress(data) + c.flush()
+
+
+class RangeSlicer:
+    """
+    從解壓縮後的資料流中取出指定範圍
+
+    壓縮後無法直接 seek，只能從頭解壓縮並略過 offset 之前的資料
+    """
+
+    def __init__(self, offset: int, length: int):
+        self.skip = offset
+        self.remaining = length
+
+    @property
+    def done(self) -> bool:
+        return self.remaining <= 0
+
+    def feed(self, data: bytes) -> bytes:
+        """傳入一段解壓縮後的資料，回傳落在範圍內的部分"""
+        if self.skip:
+            if len(data) <= self.skip:
+                self.skip -= len(data)
+                return b""
+            data = data[self.skip:]
+            self.skip = 0
+        data = data[:self.remaining]
+        self.remaining -= len(data)
+        return data
@@ -0,0 +1,165 @@
+"""
+KM Document Management System - Delta Storage
+文字類檔案的新版本以前一版為基底，只儲存差異
+
+法規條文等文件每次修訂通常只改動幾行，完整保存每個版本相當浪費。
+啟用後（DELTA_STORAGE=true）新版本以行為單位與前一版比對，差異以
+複製（基底的位元組範圍）與插入（新內容）兩種操作編碼；每隔固定版本數
+（DELTA_SNAPSHOT_INTERVAL）改存完整快照，讓還原時的基底鏈長度有上限。
+
+差異檔案在 GridFS metadata 記錄基底檔案與鏈深度，讀取時從快照依序還原
+（鏈長度以快照間隔為上限）；差異檔案持有基底 blob 的一次參照，基底不會早於差異被刪除。
+"""
+import difflib
+import struct
+from typing import List, Optional, Sequence
+
+from config.settings import get_settings
+
+# 可使用差異儲存的檔案類型
+DELTA_TYPES = frozenset({
+    "txt", "md", "markdown", "rst", "csv", "tsv", "json", "jsonl",
+    "xml", "html", "htm", "yaml", "yml", "ini", "log",
+})
+
+# 差異大於原始內容的此比例時改存完整內容
+MAX_DELTA_RATIO = 0.5
+
+_MAGIC = b"KMD1"
+_COPY = b"C"
+_INSERT = b"I"
+_COPY_OP = struct.Struct(">QQ")
+_INSERT_OP = struct.Struct(">Q")
+
+
+def delta_eligible(file_name: str) -> bool:
+    """是否啟用差異儲存且檔案類型適用"""
+    settings = get_settings()
+    if not settings.delta_storage or settings.delta_snapshot_interval <= 1:
+        return False
+    return file_name.rsplit(".", 1)[-1].lower() in DELTA_TYPES
+
+
+def delta_base_eligible(file_name: str, file_size: int) -> bool:
+    """
+    前一版是否可作為差異的基底
+
+    建立差異時需將基底整個讀入記憶體比對：基底的類型須適用且不超過 DELTA_MAX_SIZE
+    （例如大型 PDF 改以文字檔取代時，新版本改存完整內容）
+    """
+    return delta_eligible(file_name) and file_size <= get_settings().delta_max_size
+
+
+def _line_offsets(lines: List[bytes]) -> List[int]:
+    """每一行的起始位置（最後附上總長度）"""
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def make_delta(base: bytes, data: bytes) -> bytes:
+    """
+    以行為單位比對，產生由 base 還原 data 的差異
+
+    相同的行以基底的位元組範圍表示（連續範圍合併為一個操作），
+    其餘內容原樣插入。
+
+    Args:
+        base: 前一版內容
+        data: 新版本內容
+
+    Returns:
+        bytes: 差異（apply_delta 的輸入）
+    """
+    base_lines = base.splitlines(keepends=True)
+    new_lines = data.splitlines(keepends=True)
+    base_offsets = _line_offsets(base_lines)
+    new_offsets = _line_offsets(new_lines)
+
+    parts = [_MAGIC]
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            start = base_offsets[i1]
+            parts.append(_COPY + _COPY_OP.pack(start, base_offsets[i2] - start))
+        elif j2 > j1:
+            inserted = data[new_offsets[j1]:new_offsets[j2]]
+            parts.append(_INSERT + _INSERT_OP.pack(len(inserted)) + inserted)
+    return b"".join(parts)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """
+    以基底內容與差異還原新版本內容
+
+    Raises:
+        ValueError: 差異格式錯誤
+    """
+    if not delta.startswith(_MAGIC):
+        raise ValueError("差異格式錯誤")
+    view = memoryview(delta)
+    parts = []
+    position = len(_MAGIC)
+    while position < len(delta):
+        op = delta[position:position + 1]
+        position += 1
+        if op == _COPY:
+            start, size = _COPY_OP.unpack_from(delta, position)
+            position += _COPY_OP.size
+            if start + size > len(base):
+                raise ValueError("差異與基底內容不符")
+            parts.append(base[start:start + size])
+        elif op == _INSERT:
+            (size,) = _INSERT_OP.unpack_from(delta, position)
+            position += _INSERT_OP.size
+            parts.append(bytes(view[position:position + size]))
+            position += size
+        else:
+            raise ValueError("差異格式錯誤")
+    return b"".join(parts)
+
+
+def apply_chain(snapshot: bytes, deltas: Sequence[bytes]) -> bytes:
+    """
+    由完整快照依序套用差異還原內容
+
+    Args:
+        snapshot: 基底鏈最末端的完整內容
+        deltas: 差異（由讀取的檔案往基底方向排列，最後一個直接以 snapshot 為基底）
+    """
+    data = snapshot
+    for delta in reversed(deltas):
+        data = apply_delta(data, delta)
+    return data
+
+
+def chain_limit(depth: int = 0) -> int:
+    """
+    還原時允許的差異鏈長度：快照間隔
+
+    寫入時鏈深度一律小於快照間隔；調低設定前寫入的檔案以其記錄的深度為準
+    """
+    return max(get_settings().delta_snapshot_interval, depth)
+
+
+def worthwhile(delta: bytes, data: bytes) -> bool:
+    """差異是否明顯小於完整內容"""
+    return len(delta) <= len(data) * MAX_DELTA_RATIO
+
+
+class PrefixedReader:
+    """先讀回已讀出的前段資料，再接續原檔案物件（無法 seek 的來源使用）"""
+
+    def __init__(self, prefix: bytes, file_obj):
+        self.prefix = prefix
+        self.file_obj = file_obj
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            data, self.prefix = self.prefix, b""
+            return data + self.file_obj.read()
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            return data
+        return self.file_obj.read(size)
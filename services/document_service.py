@@ -2,40 +2,468 @@
 KM Document Management System - Document Service
 實作所有文件相關的業務邏輯
 """
+import base64
 import os
+import re
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from bson import ObjectId
+from typing import Optional, List, Dict, Any, BinaryIO, Callable, Iterable, Iterator, Tuple, Union
 
-from db.connection import get_db_connection, MongoDBConnection
-from models.document import Document, Version, DocumentStatus
+from bson import decode, encode, ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo import DeleteOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config.settings import get_settings
+from db.connection import get_db_connection, MongoDBConnection, READ_CONNECTION
+from models.document import Document, DocumentSummary, Version, DocumentStatus, VersionLayout
+from services.cache import DocumentCache, get_document_cache
+from services.delta import delta_base_eligible, delta_eligible, PrefixedReader
+from services.file_store import FileStore, FileSource, StoredFile
+from services.statistics import (
+    counters_from_pipeline,
+    DETAILED_PIPELINE,
+    detailed_version_pipeline,
+    document_counters,
+    facet_counts,
+    merge_counters,
+    released_counters,
+    released_files_counters,
+    statistics_pipeline,
+    stats_update,
+    STATS_ID,
+    status_counters,
+    stored_counters,
+    summarize_counters,
+    version_counters,
+    version_statistics_pipeline,
+)
+from services.text_search import TOKENS_FIELD, text_query, tokenize
+
+
+@dataclass
+class BulkImportItem:
+    """批次匯入的單筆文件（內容在記憶體中）"""
+    doc_code: str
+    title: str
+    department: str
+    category: str
+    uploaded_by: str
+    file_name: str
+    content: bytes
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    description: str = "初版"
+
+
+@dataclass
+class UploadFileItem:
+    """批次上傳的單筆文件（內容串流自檔案）"""
+    doc_code: str
+    title: str
+    department: str
+    category: str
+    uploaded_by: str
+    file_path: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    description: str = "初版"
+    file_name: Optional[str] = None
+
+
+@dataclass
+class BulkImportResult:
+    """批次匯入結果"""
+    inserted: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    inserted_bytes: int = 0
+    
+    def merge(self, other: "BulkImportResult") -> "BulkImportResult":
+        """累加另一批的結果"""
+        self.inserted.extend(other.inserted)
+        self.skipped.extend(other.skipped)
+        self.failed.update(other.failed)
+        self.inserted_bytes += other.inserted_bytes
+        return self
+
+
+@dataclass
+class SearchPage:
+    """分頁搜尋結果"""
+    items: List[Union[Document, DocumentSummary, RawBSONDocument]]
+    next_cursor: Optional[str] = None
+
+
+@dataclass
+class LookupResult:
+    """批次查詢結果（documents 依輸入順序排列，missing 為找不到的文件編號）"""
+    documents: Dict[str, Document] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BulkOperationResult:
+    """批次變更結果"""
+    matched: int = 0        # 符合條件的文件數
+    modified: int = 0       # 實際變更（或刪除）的文件數
+    files_deleted: int = 0  # 刪除的 GridFS 檔案數
+
+
+# 分頁大小上限
+MAX_PAGE_SIZE = 1000
+
+# 搜尋排序：updated_at 新到舊，同時間以 _id 決定順序（keyset 分頁）
+SEARCH_SORT = [("updated_at", -1), ("_id", -1)]
+
+# 全文檢索相關度
+TEXT_SCORE = {"$meta": "textScore"}
+RELEVANCE_PROJECTION = dict(DocumentSummary.PROJECTION, score=TEXT_SCORE)
+RELEVANCE_SORT = [("score", TEXT_SCORE)]
+
+
+def raw_collection(collection):
+    """
+    以 RawBSONDocument 讀取的 collection
+
+    伺服器回傳的 BSON 不先解碼成 dict，欄位在第一次存取時才解碼，
+    列表結果可直接以 doc.raw 轉送或自行挑選欄位
+    """
+    return collection.with_options(
+        codec_options=collection.codec_options.with_options(document_class=RawBSONDocument)
+    )
+
+
+def document_snapshot(doc: Dict[str, Any]) -> bytes:
+    """快取用的文件快照（BSON bytes，不可變）"""
+    return encode(doc)
+
+
+def from_snapshot(snapshot: bytes) -> Document:
+    """由快取的快照建立新的 Document（每次命中各自解碼，versions 仍延遲解碼）"""
+    return Document.from_dict(decode(snapshot))
+
+
+def search_decoder(summary: bool, raw: bool) -> Callable[[Any], Any]:
+    """搜尋結果的轉換方式：raw 原樣回傳，否則建立 DocumentSummary 或 Document"""
+    if raw:
+        return lambda doc: doc
+    return DocumentSummary.from_dict if summary else Document.from_dict
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """以最後一筆的 (updated_at, _id) 產生分頁游標"""
+    raw = f"{doc['updated_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """加入 keyset 條件：只取排在游標之後的文件"""
+    if not cursor:
+        return query
+    try:
+        updated_at, _id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        updated_at = datetime.fromisoformat(updated_at)
+        _id = ObjectId(_id)
+    except Exception:
+        raise ValueError(f"無效的分頁游標: {cursor}")
+    keyset = {
+        "$or": [
+            {"updated_at": {"$lt": updated_at}},
+            {"updated_at": updated_at, "_id": {"$lt": _id}}
+        ]
+    }
+    return {"$and": [query, keyset]} if query else keyset
+
+
+# 寫入後只回傳最新版本，避免解碼完整版本歷史
+LATEST_VERSION_PROJECTION = {"versions": {"$slice": -1}}
+
+# versions collection 記錄轉回 Version 時不需要的欄位
+VERSION_RECORD_PROJECTION = {"_id": 0, "doc_code": 0}
+
+
+def version_record(doc_code: str, version: Version) -> Dict[str, Any]:
+    """split 版面寫入 versions collection 的版本記錄"""
+    record = version.to_dict()
+    record["doc_code"] = doc_code
+    return record
+
+
+def version_projection(version_num: Optional[int] = None) -> Dict[str, Any]:
+    """只取單一版本的投影（預設為最新版本），不解碼完整版本歷史"""
+    if version_num:
+        versions: Dict[str, Any] = {"$elemMatch": {"version": version_num}}
+    else:
+        versions = {"$slice": -1}
+    return {"version_layout": 1, "versions": versions}
+
+
+def new_version_pipeline(version: Version) -> List[Dict[str, Any]]:
+    """
+    新增版本的 update pipeline（同步與非同步服務共用）
+    
+    current_version 遞增與 versions 附加在同一次更新中完成，
+    新版本的 version 欄位取自遞增後的 current_version。
+    split 版面的 versions 只保留最新版本（歷史另外寫入 versions collection）。
+    """
+    version_data = version.to_dict()
+    version_data.pop("version")
+    new_version = [{"$mergeObjects": [
+        {"$literal": version_data},
+        {"version": "$current_version"}
+    ]}]
+    return [
+        {
+            "$set": {
+                "current_version": {"$add": [{"$ifNull": ["$current_version", 0]}, 1]},
+                "updated_at": datetime.now()
+            }
+        },
+        {
+            "$set": {
+                "versions": {
+                    "$cond": [
+                        {"$eq": ["$version_layout", VersionLayout.SPLIT.value]},
+                        new_version,
+                        {"$concatArrays": [{"$ifNull": ["$versions", []]}, new_version]}
+                    ]
+                }
+            }
+        }
+    ]
+
+
+# 建立 Document 必要的欄位（批次查詢或寫入後回傳指定投影時一律包含）
+LOOKUP_REQUIRED_FIELDS = ("doc_code", "title", "department", "category")
+
+
+def result_projection(
+    return_document: bool,
+    projection: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    寫入後回傳文件的投影；不需回傳時只取版本號與狀態
+
+    回傳文件時一律包含建立 Document 必要的欄位，指定的投影省略它們也不會失敗
+    """
+    if not return_document:
+        return {"_id": 1, "current_version": 1, "status": 1}
+    return with_fields(projection, *LOOKUP_REQUIRED_FIELDS)
+
+
+def status_changed(before: Dict[str, Any], status: str, updated_at: datetime) -> Document:
+    """由更新前的文件組出狀態變更後的 Document"""
+    after = dict(before, status=status)
+    if "updated_at" in after:
+        after["updated_at"] = updated_at
+    return Document.from_dict(after)
+
+
+def with_fields(projection: Optional[Dict[str, Any]], *names: str) -> Optional[Dict[str, Any]]:
+    """
+    確保回傳文件包含指定欄位（例如狀態變更時需要原本的 status 來更新統計）
+    """
+    if projection is None:
+        return None
+    fields = {key: value for key, value in projection.items() if key not in names}
+    if any(value and not isinstance(value, dict) for key, value in fields.items() if key != "_id"):
+        fields.update(dict.fromkeys(names, 1))
+    return fields
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """依固定筆數分批"""
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def unique_codes(doc_codes: Iterable[str]) -> List[str]:
+    """去除重複的文件編號（保留順序）"""
+    return list(dict.fromkeys(doc_codes))
+
+
+def download_paths(version: Version, save_path: Optional[str], resume: bool) -> Tuple[str, str, int]:
+    """
+    決定下載的儲存路徑、暫存檔路徑與接續位置
+
+    暫存檔名包含 GridFS 檔案 ID：兩次下載之間有新版本時不會接上另一個版本的內容。
+
+    Returns:
+        (儲存路徑, 暫存檔路徑, 接續位置)
+    """
+    if save_path and os.path.isdir(save_path):
+        file_path = os.path.join(save_path, version.file_name)
+    elif save_path:
+        file_path = save_path
+    else:
+        file_path = version.file_name
+
+    part_path = f"{file_path}.{version.file_id}.part"
+    offset = 0
+    if resume and os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+        if offset > version.file_size:
+            offset = 0
+    return file_path, part_path, offset
+
+
+def lookup_result(codes: List[str], found: Dict[str, Document]) -> LookupResult:
+    """依輸入順序整理批次查詢結果"""
+    result = LookupResult()
+    for code in codes:
+        if code in found:
+            result.documents[code] = found[code]
+        else:
+            result.missing.append(code)
+    return result
+
+
+def bulk_selection(
+    doc_codes: Optional[Iterable[str]],
+    query: Optional[Dict[str, Any]]
+) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+    """
+    批次變更的選取條件：文件編號清單、查詢條件或兩者皆符合
+
+    Returns:
+        (去除重複的文件編號或 None, 查詢條件)
+    """
+    if doc_codes is None and query is None:
+        raise ValueError("必須指定文件編號或查詢條件")
+    codes = unique_codes(doc_codes) if doc_codes is not None else None
+    selection = dict(query or {})
+    if codes is not None:
+        selection = {"$and": [selection, {"doc_code": {"$in": codes}}]} if selection else {"doc_code": {"$in": codes}}
+    return codes, selection
+
+
+def metadata_update(metadata: Dict[str, Any], merge: bool) -> Dict[str, Any]:
+    """
+    Metadata 更新指令（同步與非同步服務共用）
+    
+    合併模式以 metadata.<key> 逐欄 $set，不需先讀取現有 Metadata。
+    """
+    fields: Dict[str, Any] = {"updated_at": datetime.now()}
+    if merge:
+        for key, value in metadata.items():
+            fields[f"metadata.{key}"] = value
+    else:
+        fields["metadata"] = metadata
+    return {"$set": fields}
+
+
+def document_record(doc: Document) -> Dict[str, Any]:
+    """文件寫入資料庫的內容（附加全文檢索用的 search_tokens）"""
+    record = doc.to_dict()
+    record[TOKENS_FIELD] = tokenize(doc.title)
+    return record
+
+
+def keyword_query(keyword: str) -> Dict[str, Any]:
+    """
+    關鍵字條件：標題全文索引、doc_code 前綴、metadata.keywords 完全比對
+
+    使用者輸入一律跳脫，不當作正規表示式；每個條件都有索引可用
+    """
+    prefixes = {keyword, keyword.upper()}
+    clauses: List[Dict[str, Any]] = [
+        {"doc_code": {"$in": [re.compile("^" + re.escape(p)) for p in sorted(prefixes)]}},
+        {"metadata.keywords": keyword}
+    ]
+    text = text_query(keyword)
+    if text:
+        clauses.insert(0, text)
+    return {"$or": clauses}
+
+
+def build_search_query(
+    department: Optional[str] = None,
+    category: Optional[str] = None,
+    keyword: Optional[str] = None,
+    status: Optional[str] = None,
+    include_archived: bool = False
+) -> Dict[str, Any]:
+    """組出搜尋條件（同步與非同步服務共用）"""
+    query: Dict[str, Any] = {}
+    
+    # 狀態篩選
+    if status:
+        query["status"] = status
+    elif not include_archived:
+        query["status"] = {"$ne": DocumentStatus.ARCHIVED.value}
+    
+    # 部門篩選
+    if department:
+        query["department"] = department
+    
+    # 分類篩選
+    if category:
+        query["category"] = category
+    
+    # 關鍵字搜尋
+    if keyword:
+        query.update(keyword_query(keyword))
+    
+    return query
 
 
 class DocumentService:
     """文件操作服務類別"""
     
-    def __init__(self, connection: Optional[MongoDBConnection] = None):
+    def __init__(
+        self,
+        connection: Optional[MongoDBConnection] = None,
+        read_connection: Optional[MongoDBConnection] = None,
+        cache: Optional[DocumentCache] = None
+    ):
+        """
+        Args:
+            connection: 主要連線（寫入與一般查詢）
+            read_connection: 搜尋用的讀取連線；未指定時，若有傳入 connection
+                則共用之，否則使用具名連線 reads（secondaryPreferred）
+            cache: get_by_doc_code 快取（預設使用行程內共用快取）
+        """
         self.conn = connection or get_db_connection()
+        if read_connection is None and connection is not None:
+            read_connection = connection
+        self._read_conn = read_connection
+        self.store = FileStore(self.conn)
+        self.cache = cache or get_document_cache()
+    
+    @property
+    def read_conn(self) -> MongoDBConnection:
+        """搜尋用的讀取連線（首次使用時建立）"""
+        if self._read_conn is None:
+            self._read_conn = get_db_connection(name=READ_CONNECTION)
+        return self._read_conn
     
     # ============================================================
     # F-001: 文件上傳
     # ============================================================
     def upload_document(
         self,
-        file_path: str,
+        file_path: FileSource,
         doc_code: str,
         title: str,
         department: str,
         category: str,
         uploaded_by: str,
         metadata: Optional[Dict[str, Any]] = None,
-        description: str = "初版"
+        description: str = "初版",
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None
     ) -> Document:
         """
         上傳新文件
         
         Args:
-            file_path: 檔案路徑
+            file_path: 檔案路徑或已開啟的二進位檔案物件
             doc_code: 文件編號（唯一）
             title: 文件標題
             department: 所屬部門
@@ -43,33 +471,33 @@ class DocumentService:
             uploaded_by: 上傳者
             metadata: 彈性 Metadata
             description: 版本說明
+            file_name: 檔案名稱（傳入檔案物件時使用）
+            chunk_size: GridFS chunk 大小（預設使用設定值）
         
         Returns:
             Document: 新建立的文件物件
         """
         # 檢查文件編號是否已存在
-        if self.get_by_doc_code(doc_code):
+        if self.get_by_doc_code(doc_code, use_cache=False):
             raise ValueError(f"文件編號 {doc_code} 已存在")
         
-        # 讀取檔案
-        file_name = os.path.basename(file_path)
+        # 串流寫入 GridFS（相同內容沿用既有檔案）
+        stored, file_name = self.store.put_dedup(file_path, file_name, chunk_size)
         file_type = file_name.split(".")[-1].lower()
         
-        with open(file_path, "rb") as f:
-            file_data = f.read()
-            file_size = len(file_data)
-            file_id = self.conn.fs.put(file_data, filename=file_name)
-        
         # 建立版本
         version = Version(
             version=1,
             file_name=file_name,
             file_type=file_type,
-            file_id=file_id,
-            file_size=file_size,
+            file_id=stored.file_id,
+            file_size=stored.file_size,
             uploaded_by=uploaded_by,
             uploaded_at=datetime.now(),
-            description=description
+            description=description,
+            content_hash=stored.content_hash,
+            compression=stored.compression,
+            stored_size=stored.stored_size
         )
         
         # 建立文件
@@ -83,12 +511,21 @@ class DocumentService:
             versions=[version],
             metadata=metadata or {},
             created_at=datetime.now(),
-            updated_at=datetime.now()
+            updated_at=datetime.now(),
+            version_layout=get_settings().version_layout
         )
         
-        # 儲存到資料庫
-        result = self.conn.documents.insert_one(doc.to_dict())
+        # 儲存到資料庫（同時上傳同一編號時後寫入者失敗，釋放已取得的檔案參照）
+        try:
+            result = self.conn.documents.insert_one(document_record(doc))
+        except DuplicateKeyError:
+            self.store.release(stored.file_id, stored.content_hash)
+            raise ValueError(f"文件編號 {doc_code} 已存在") from None
         doc._id = result.inserted_id
+        if doc.split_versions:
+            self.conn.versions.insert_one(version_record(doc_code, version))
+        self._record_stats(merge_counters(document_counters(doc), stored_counters(stored)))
+        self._invalidate(doc_code)
         
         print(f"✓ 文件上傳成功: {doc_code} - {title}")
         return doc
@@ -99,67 +536,98 @@ class DocumentService:
     def upload_new_version(
         self,
         doc_code: str,
-        file_path: str,
+        file_path: FileSource,
         uploaded_by: str,
-        description: str = ""
-    ) -> Document:
+        description: str = "",
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
         """
         上傳新版本
         
+        版本號在資料庫端以單一 find_one_and_update 原子遞增，
+        並行上傳不會產生相同版號。啟用差異儲存（DELTA_STORAGE）時，
+        文字類檔案只儲存與目前最新版本的差異。
+        
         Args:
             doc_code: 文件編號
-            file_path: 新版本檔案路徑
+            file_path: 新版本檔案路徑或已開啟的二進位檔案物件
             uploaded_by: 上傳者
             description: 版本說明/變更摘要
+            file_name: 檔案名稱（傳入檔案物件時使用）
+            chunk_size: GridFS chunk 大小（預設使用設定值）
+            return_document: 是否回傳更新後的文件（False 則回傳 None）
+            projection: 回傳文件的欄位投影，如 LATEST_VERSION_PROJECTION
         
         Returns:
-            Document: 更新後的文件物件
+            Optional[Document]: 更新後的文件物件
         """
-        # 取得現有文件
-        doc = self.get_by_doc_code(doc_code)
-        if not doc:
-            raise ValueError(f"找不到文件: {doc_code}")
-        
-        # 計算新版本號
-        new_version_num = doc.current_version + 1
-        
-        # 讀取檔案
-        file_name = os.path.basename(file_path)
+        # 寫入 GridFS（相同內容沿用既有檔案）
+        stored, file_name = self._store_version(doc_code, file_path, file_name, chunk_size)
         file_type = file_name.split(".")[-1].lower()
         
-        with open(file_path, "rb") as f:
-            file_data = f.read()
-            file_size = len(file_data)
-            file_id = self.conn.fs.put(file_data, filename=file_name)
-        
-        # 建立新版本
+        # 建立新版本（版本號由資料庫端決定）
         new_version = Version(
-            version=new_version_num,
+            version=0,
             file_name=file_name,
             file_type=file_type,
-            file_id=file_id,
-            file_size=file_size,
+            file_id=stored.file_id,
+            file_size=stored.file_size,
             uploaded_by=uploaded_by,
             uploaded_at=datetime.now(),
-            description=description
+            description=description,
+            content_hash=stored.content_hash,
+            compression=stored.compression,
+            stored_size=stored.stored_size
         )
         
         # 更新資料庫
-        self.conn.documents.update_one(
+        result = self.conn.documents.find_one_and_update(
             {"doc_code": doc_code},
-            {
-                "$set": {
-                    "current_version": new_version_num,
-                    "updated_at": datetime.now()
-                },
-                "$push": {
-                    "versions": new_version.to_dict()
-                }
-            }
+            new_version_pipeline(new_version),
+            projection=with_fields(
+                result_projection(return_document, projection), "current_version", "version_layout"
+            ),
+            return_document=ReturnDocument.AFTER
         )
+        if result is None:
+            self.store.release(stored.file_id, stored.content_hash)
+            raise ValueError(f"找不到文件: {doc_code}")
+        if result.get("version_layout") == VersionLayout.SPLIT.value:
+            new_version.version = result["current_version"]
+            self.conn.versions.insert_one(version_record(doc_code, new_version))
+        self._record_stats(merge_counters(version_counters(new_version), stored_counters(stored)))
+        self._invalidate(doc_code)
         
-        print(f"✓ 新版本上傳成功: {doc_code} v{new_version_num}")
-        return self.get_by_doc_code(doc_code)
+        print(f"✓ 新版本上傳成功: {doc_code} v{result['current_version']}")
+        return Document.from_dict(result) if return_document else None
+    
+    def _store_version(
+        self,
+        doc_code: str,
+        source: FileSource,
+        file_name: Optional[str],
+        chunk_size: Optional[int]
+    ) -> Tuple[StoredFile, str]:
+        """
+        寫入新版本內容
+        
+        文字類檔案在差異儲存啟用且不超過 DELTA_MAX_SIZE 時讀入記憶體，
+        最新版本同樣適用時以其為基底寫入差異（否則寫入完整內容）；其餘情況串流寫入完整內容。
+        """
+        with FileStore.open_source(source, file_name) as (file_obj, name):
+            if delta_eligible(name):
+                limit = get_settings().delta_max_size
+                data = file_obj.read(limit + 1)
+                if len(data) <= limit:
+                    base = self.resolve_version(doc_code)
+                    if base.content_hash and delta_base_eligible(base.file_name, base.file_size):
+                        return self.store.put_delta(data, name, base.file_id, base.content_hash, chunk_size), name
+                    return self.store.put_bytes(data, name, chunk_size), name
+                file_obj = PrefixedReader(data, file_obj)
+            return self.store.put_dedup(file_obj, name, chunk_size)
     
     # ============================================================
     # F-003: Metadata 管理
@@ -168,8 +636,10 @@ class DocumentService:
         self,
         doc_code: str,
         metadata: Dict[str, Any],
-        merge: bool = True
-    ) -> Document:
+        merge: bool = True,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
         """
         更新 Metadata
         
@@ -177,32 +647,24 @@ class DocumentService:
             doc_code: 文件編號
             metadata: 新的 Metadata
             merge: 是否合併現有 Metadata（False 則完全覆蓋）
+            return_document: 是否回傳更新後的文件（False 則回傳 None）
+            projection: 回傳文件的欄位投影
         
         Returns:
-            Document: 更新後的文件物件
+            Optional[Document]: 更新後的文件物件
         """
-        doc = self.get_by_doc_code(doc_code)
-        if not doc:
-            raise ValueError(f"找不到文件: {doc_code}")
-        
-        if merge:
-            # 合併現有 Metadata
-            new_metadata = {**doc.metadata, **metadata}
-        else:
-            new_metadata = metadata
-        
-        self.conn.documents.update_one(
+        result = self.conn.documents.find_one_and_update(
             {"doc_code": doc_code},
-            {
-                "$set": {
-                    "metadata": new_metadata,
-                    "updated_at": datetime.now()
-                }
-            }
+            metadata_update(metadata, merge),
+            projection=result_projection(return_document, projection),
+            return_document=ReturnDocument.AFTER
         )
+        if result is None:
+            raise ValueError(f"找不到文件: {doc_code}")
+        self._invalidate(doc_code)
         
         print(f"✓ Metadata 更新成功: {doc_code}")
-        return self.get_by_doc_code(doc_code)
+        return Document.from_dict(result) if return_document else None
     
     # ============================================================
     # F-004: 文件查詢
@@ -228,41 +690,180 @@ class DocumentService:
         Returns:
             List[Document]: 符合條件的文件列表
         """
-        query: Dict[str, Any] = {}
+        return list(self.iter_search(
+            department, category, keyword, status, include_archived, summary=False
+        ))
+    
+    def iter_search(
+        self,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        keyword: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False,
+        summary: bool = True,
+        batch_size: int = 500,
+        raw: bool = False
+    ) -> Iterator[Union[Document, DocumentSummary, RawBSONDocument]]:
+        """
+        逐筆產生搜尋結果（游標串流，記憶體用量與結果數量無關）
         
-        # 狀態篩選
-        if status:
-            query["status"] = status
-        elif not include_archived:
-            query["status"] = {"$ne": DocumentStatus.ARCHIVED.value}
+        Args:
+            department / category / keyword / status / include_archived: 同 search
+            summary: 只取列表欄位並回傳 DocumentSummary（False 則回傳完整 Document）
+            batch_size: 每次向伺服器取回的筆數
+            raw: 回傳 RawBSONDocument，不解碼也不建立模型物件（列表直接轉送用）
         
-        # 部門篩選
-        if department:
-            query["department"] = department
+        Yields:
+            DocumentSummary、Document 或 RawBSONDocument
+        """
+        query = build_search_query(department, category, keyword, status, include_archived)
+        projection = DocumentSummary.PROJECTION if summary else None
+        decode = search_decoder(summary, raw)
+        collection = raw_collection(self.read_conn.documents) if raw else self.read_conn.documents
         
-        # 分類篩選
-        if category:
-            query["category"] = category
+        cursor = collection.find(query, projection).sort(SEARCH_SORT).batch_size(batch_size)
+        try:
+            for doc in cursor:
+                yield decode(doc)
+        finally:
+            cursor.close()
+    
+    def search_page(
+        self,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        keyword: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False,
+        page_size: int = 50,
+        cursor: Optional[str] = None,
+        summary: bool = True,
+        raw: bool = False
+    ) -> SearchPage:
+        """
+        分頁搜尋（keyset 分頁，以 updated_at/_id 接續，不使用 skip）
+        
+        Args:
+            department / category / keyword / status / include_archived: 同 search
+            page_size: 每頁筆數（上限 MAX_PAGE_SIZE）
+            cursor: 上一頁回傳的 next_cursor（第一頁為 None）
+            summary: 只取列表欄位並回傳 DocumentSummary
+            raw: 回傳 RawBSONDocument（同 iter_search）
         
-        # 關鍵字搜尋
-        if keyword:
-            query["$or"] = [
-                {"title": {"$regex": keyword, "$options": "i"}},
-                {"metadata.keywords": keyword},
-                {"doc_code": {"$regex": keyword, "$options": "i"}}
-            ]
+        Returns:
+            SearchPage: 本頁結果與下一頁游標（最後一頁為 None）
+        """
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        query = apply_cursor(
+            build_search_query(department, category, keyword, status, include_archived),
+            cursor
+        )
+        projection = DocumentSummary.PROJECTION if summary else None
+        decode = search_decoder(summary, raw)
+        collection = raw_collection(self.read_conn.documents) if raw else self.read_conn.documents
         
-        # 執行查詢
-        results = self.conn.documents.find(query).sort("updated_at", -1)
-        return [Document.from_dict(doc) for doc in results]
+        # 多取一筆判斷是否還有下一頁
+        docs = list(collection.find(query, projection).sort(SEARCH_SORT).limit(page_size + 1))
+        next_cursor = encode_cursor(docs[page_size - 1]) if len(docs) > page_size else None
+        return SearchPage(
+            items=[decode(doc) for doc in docs[:page_size]],
+            next_cursor=next_cursor
+        )
     
-    def get_by_doc_code(self, doc_code: str) -> Optional[Document]:
-        """根據文件編號取得文件"""
+    def search_relevant(
+        self,
+        keyword: str,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = False,
+        limit: int = 20
+    ) -> List[DocumentSummary]:
+        """
+        依相關度搜尋標題（全文索引，任一詞符合即列入，依 textScore 排序）
+        
+        Args:
+            keyword: 關鍵字（中文以二字詞比對）
+            department / category / status / include_archived: 同 search
+            limit: 回傳筆數上限（上限 MAX_PAGE_SIZE）
+        
+        Returns:
+            List[DocumentSummary]: 依相關度排序的文件摘要（含 score）
+        """
+        text = text_query(keyword, match_all=False)
+        if not text:
+            return []
+        query = build_search_query(department, category, None, status, include_archived)
+        query.update(text)
+        
+        cursor = self.read_conn.documents.find(query, RELEVANCE_PROJECTION).sort(RELEVANCE_SORT)
+        cursor = cursor.limit(max(1, min(limit, MAX_PAGE_SIZE)))
+        return [DocumentSummary.from_dict(doc) for doc in cursor]
+    
+    def get_by_doc_code(self, doc_code: str, use_cache: bool = True) -> Optional[Document]:
+        """
+        根據文件編號取得文件
+        
+        Args:
+            doc_code: 文件編號
+            use_cache: 是否使用快取（寫入前的檢查應直接讀取資料庫）
+        """
+        key = self._cache_key(doc_code)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return from_snapshot(cached)
+        
+        generation = self.cache.generation
         doc = self.conn.documents.find_one({"doc_code": doc_code})
         if doc:
+            self._cache_document(doc, generation)
             return Document.from_dict(doc)
         return None
     
+    def get_many_by_doc_codes(
+        self,
+        doc_codes: Iterable[str],
+        projection: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        chunk_size: Optional[int] = None
+    ) -> LookupResult:
+        """
+        批次取得文件（分段 $in 查詢，每段一次往返）
+        
+        Args:
+            doc_codes: 文件編號（重複的編號只查一次）
+            projection: 欄位投影（一律包含建立 Document 的必要欄位；指定時不使用快取）
+            use_cache: 是否使用快取
+            chunk_size: 每次 $in 查詢的編號數（預設使用設定值）
+        
+        Returns:
+            LookupResult: 依輸入順序排列的文件與找不到的編號
+        """
+        codes = unique_codes(doc_codes)
+        chunk_size = chunk_size or get_settings().lookup_batch_size
+        # 投影後的文件欄位不完整，不讀寫快取
+        cacheable = projection is None
+        fields = with_fields(projection, *LOOKUP_REQUIRED_FIELDS)
+        
+        found: Dict[str, Document] = {}
+        if cacheable and use_cache:
+            for code in codes:
+                cached = self.cache.get(self._cache_key(code))
+                if cached is not None:
+                    found[code] = from_snapshot(cached)
+        
+        pending = [code for code in codes if code not in found]
+        for start in range(0, len(pending), chunk_size):
+            generation = self.cache.generation
+            query = {"doc_code": {"$in": pending[start:start + chunk_size]}}
+            for doc in self.conn.documents.find(query, fields):
+                if cacheable:
+                    self._cache_document(doc, generation)
+                found[doc["doc_code"]] = Document.from_dict(doc)
+        return lookup_result(codes, found)
+    
     def get_all(self, include_archived: bool = False) -> List[Document]:
         """取得所有文件"""
         return self.search(include_archived=include_archived)
@@ -270,139 +871,656 @@ class DocumentService:
     # ============================================================
     # F-005: 版本歷史
     # ============================================================
-    def get_version_history(self, doc_code: str) -> List[Version]:
+    def get_version_history(
+        self,
+        doc_code: str,
+        limit: Optional[int] = None,
+        after_version: int = 0
+    ) -> List[Version]:
         """
-        取得文件版本歷史
+        取得文件版本歷史（依版本號由舊到新，可分頁）
         
         Args:
             doc_code: 文件編號
+            limit: 最多回傳筆數（預設全部）
+            after_version: 只取版本號大於此值的版本（取下一頁時傳入上一頁最後的版本號）
         
         Returns:
             List[Version]: 版本歷史列表
         """
-        doc = self.get_by_doc_code(doc_code)
+        doc = self.conn.documents.find_one(
+            {"doc_code": doc_code}, {"version_layout": 1, "versions": 1}
+        )
         if not doc:
             raise ValueError(f"找不到文件: {doc_code}")
         
-        return doc.versions
+        if doc.get("version_layout") == VersionLayout.SPLIT.value:
+            cursor = self.conn.versions.find(
+                {"doc_code": doc_code, "version": {"$gt": after_version}},
+                VERSION_RECORD_PROJECTION
+            ).sort("version", 1)
+            if limit:
+                cursor = cursor.limit(limit)
+            return [Version.from_dict(v) for v in cursor]
+        
+        versions = [
+            Version.from_dict(v) for v in doc.get("versions", [])
+            if v["version"] > after_version
+        ]
+        return versions[:limit] if limit else versions
     
     def get_version(self, doc_code: str, version_num: int) -> Optional[Version]:
         """取得指定版本"""
-        doc = self.get_by_doc_code(doc_code)
+        doc = self.conn.documents.find_one({"doc_code": doc_code}, version_projection(version_num))
         if not doc:
             return None
-        return doc.get_version(version_num)
+        return self._pick_version(doc_code, doc, version_num)
+    
+    def _pick_version(
+        self,
+        doc_code: str,
+        doc: Dict[str, Any],
+        version_num: Optional[int]
+    ) -> Optional[Version]:
+        """由 version_projection 查詢結果取出版本；split 版面的舊版本改查 versions collection"""
+        if doc.get("versions"):
+            return Version.from_dict(doc["versions"][0])
+        if version_num and doc.get("version_layout") == VersionLayout.SPLIT.value:
+            record = self.conn.versions.find_one(
+                {"doc_code": doc_code, "version": version_num}, VERSION_RECORD_PROJECTION
+            )
+            if record:
+                return Version.from_dict(record)
+        return None
     
     # ============================================================
     # F-006: 文件下載
     # ============================================================
+    def resolve_version(self, doc_code: str, version_num: Optional[int] = None) -> Version:
+        """
+        取得要下載的版本（只讀取該版本，不解碼完整版本歷史）
+        
+        Args:
+            doc_code: 文件編號
+            version_num: 版本號（預設為最新版本）
+        
+        Returns:
+            Version: 版本物件
+        """
+        doc = self.conn.documents.find_one({"doc_code": doc_code}, version_projection(version_num))
+        if not doc:
+            raise ValueError(f"找不到文件: {doc_code}")
+        
+        version = self._pick_version(doc_code, doc, version_num)
+        if not version:
+            if version_num:
+                raise ValueError(f"找不到版本: {doc_code} v{version_num}")
+            raise ValueError(f"文件沒有任何版本: {doc_code}")
+        return version
+    
+    def iter_download(
+        self,
+        doc_code: str,
+        version_num: Optional[int] = None,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        以 GridFS chunk 為單位串流讀取文件（可用於 HTTP Range 回應）
+        
+        以差異儲存的版本會先在記憶體還原完整內容，記憶體用量約為 DELTA_MAX_SIZE 的兩倍；
+        其他版本邊讀邊傳，只占用一個 chunk。
+        
+        Args:
+            doc_code: 文件編號
+            version_num: 版本號（預設為最新版本）
+            offset: 起始位置（bytes）
+            length: 讀取長度（預設讀到檔尾）
+        
+        Yields:
+            bytes: 檔案內容片段
+        """
+        version = self.resolve_version(doc_code, version_num)
+        return self.store.iter_range(version.file_id, offset, length)
+    
+    def download_to(
+        self,
+        doc_code: str,
+        writer: BinaryIO,
+        version_num: Optional[int] = None,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> int:
+        """
+        串流下載文件到任意可寫入物件（記憶體用量同 iter_download）
+        
+        Args:
+            doc_code: 文件編號
+            writer: 可寫入的二進位物件（檔案、socket、BytesIO 等）
+            version_num: 版本號（預設為最新版本）
+            offset: 起始位置（bytes）
+            length: 讀取長度（預設讀到檔尾）
+        
+        Returns:
+            int: 寫入的 bytes 數
+        """
+        version = self.resolve_version(doc_code, version_num)
+        return self.store.copy_range(version.file_id, writer, offset, length)
+    
     def download_file(
         self,
         doc_code: str,
         version_num: Optional[int] = None,
-        save_path: Optional[str] = None
+        save_path: Optional[str] = None,
+        resume: bool = False
     ) -> str:
         """
         下載文件
         
+        檔案先串流寫入 `<儲存路徑>.<GridFS 檔案 ID>.part`，完成後才改名；
+        中斷後以 resume=True 重新下載同一版本會從 .part 的大小接續。
+        記憶體用量同 iter_download。
+        
         Args:
             doc_code: 文件編號
             version_num: 版本號（預設為最新版本）
-            save_path: 儲存路徑（預設為當前目錄）
+            save_path: 儲存路徑或目錄（預設為當前目錄）
+            resume: 是否接續未完成的下載
         
         Returns:
             str: 儲存的檔案路徑
         """
-        doc = self.get_by_doc_code(doc_code)
-        if not doc:
-            raise ValueError(f"找不到文件: {doc_code}")
+        version = self.resolve_version(doc_code, version_num)
+        file_path, part_path, offset = download_paths(version, save_path, resume)
         
-        # 取得版本
-        if version_num:
-            version = doc.get_version(version_num)
-            if not version:
-                raise ValueError(f"找不到版本: {doc_code} v{version_num}")
-        else:
-            version = doc.get_latest_version()
-            if not version:
-                raise ValueError(f"文件沒有任何版本: {doc_code}")
+        # 串流寫入檔案
+        with open(part_path, "ab" if offset else "wb") as f:
+            self.store.copy_range(version.file_id, f, offset)
+        os.replace(part_path, file_path)
         
-        # 從 GridFS 讀取檔案
-        file_data = self.conn.fs.get(version.file_id).read()
-        
-        # 決定儲存路徑
-        if save_path:
-            file_path = save_path
+        if offset:
+            print(f"✓ 檔案下載成功（自 {offset} bytes 接續）: {file_path}")
         else:
-            file_path = version.file_name
-        
-        # 寫入檔案
-        with open(file_path, "wb") as f:
-            f.write(file_data)
-        
-        print(f"✓ 檔案下載成功: {file_path}")
+            print(f"✓ 檔案下載成功: {file_path}")
         return file_path
     
     # ============================================================
     # F-007: 文件歸檔
     # ============================================================
-    def archive_document(self, doc_code: str) -> Document:
+    def archive_document(
+        self,
+        doc_code: str,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
         """
         歸檔文件
         
         Args:
             doc_code: 文件編號
+            return_document: 是否回傳更新後的文件（False 則回傳 None）
+            projection: 回傳文件的欄位投影
         
         Returns:
-            Document: 更新後的文件物件
+            Optional[Document]: 更新後的文件物件
         """
-        doc = self.get_by_doc_code(doc_code)
-        if not doc:
-            raise ValueError(f"找不到文件: {doc_code}")
-        
-        if doc.status == DocumentStatus.ARCHIVED.value:
-            print(f"! 文件已經是歸檔狀態: {doc_code}")
-            return doc
-        
-        self.conn.documents.update_one(
-            {"doc_code": doc_code},
+        now = datetime.now()
+        fields = with_fields(result_projection(return_document, projection), "status")
+        result = self.conn.documents.find_one_and_update(
+            {"doc_code": doc_code, "status": {"$ne": DocumentStatus.ARCHIVED.value}},
             {
                 "$set": {
                     "status": DocumentStatus.ARCHIVED.value,
-                    "updated_at": datetime.now()
+                    "updated_at": now
                 }
-            }
+            },
+            projection=fields,
+            return_document=ReturnDocument.BEFORE
         )
         
+        if result is None:
+            # 不符合條件：文件不存在或已歸檔
+            existing = self.conn.documents.find_one({"doc_code": doc_code}, fields)
+            if not existing:
+                raise ValueError(f"找不到文件: {doc_code}")
+            print(f"! 文件已經是歸檔狀態: {doc_code}")
+            return Document.from_dict(existing) if return_document else None
+        
+        self._record_stats(status_counters(result.get("status"), DocumentStatus.ARCHIVED.value))
+        self._invalidate(doc_code)
         print(f"✓ 文件已歸檔: {doc_code}")
-        return self.get_by_doc_code(doc_code)
+        return status_changed(result, DocumentStatus.ARCHIVED.value, now) if return_document else None
     
-    def restore_document(self, doc_code: str) -> Document:
+    def restore_document(
+        self,
+        doc_code: str,
+        return_document: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Document]:
         """
         恢復歸檔文件
         
         Args:
             doc_code: 文件編號
+            return_document: 是否回傳更新後的文件（False 則回傳 None）
+            projection: 回傳文件的欄位投影
         
         Returns:
-            Document: 更新後的文件物件
+            Optional[Document]: 更新後的文件物件
         """
-        doc = self.get_by_doc_code(doc_code)
-        if not doc:
-            raise ValueError(f"找不到文件: {doc_code}")
-        
-        self.conn.documents.update_one(
+        now = datetime.now()
+        result = self.conn.documents.find_one_and_update(
             {"doc_code": doc_code},
             {
                 "$set": {
                     "status": DocumentStatus.ACTIVE.value,
-                    "updated_at": datetime.now()
+                    "updated_at": now
                 }
-            }
+            },
+            projection=with_fields(result_projection(return_document, projection), "status"),
+            return_document=ReturnDocument.BEFORE
         )
+        if result is None:
+            raise ValueError(f"找不到文件: {doc_code}")
         
+        self._record_stats(status_counters(result.get("status"), DocumentStatus.ACTIVE.value))
+        self._invalidate(doc_code)
         print(f"✓ 文件已恢復: {doc_code}")
-        return self.get_by_doc_code(doc_code)
+        return status_changed(result, DocumentStatus.ACTIVE.value, now) if return_document else None
+    
+    # ============================================================
+    # 批次變更
+    # ============================================================
+    def archive_many(
+        self,
+        doc_codes: Optional[Iterable[str]] = None,
+        query: Optional[Dict[str, Any]] = None
+    ) -> BulkOperationResult:
+        """
+        批次歸檔文件
+        
+        Args:
+            doc_codes: 文件編號
+            query: 查詢條件（可與 doc_codes 併用，例如 {"department": "人力資源部"}）
+        
+        Returns:
+            BulkOperationResult: 符合條件與實際歸檔的文件數
+        """
+        codes, selection = bulk_selection(doc_codes, query)
+        result = self._set_status_many(selection, DocumentStatus.ARCHIVED.value)
+        self._invalidate_many(codes)
+        print(f"✓ 批次歸檔完成: {result.modified} 筆（符合條件 {result.matched} 筆）")
+        return result
+    
+    def restore_many(
+        self,
+        doc_codes: Optional[Iterable[str]] = None,
+        query: Optional[Dict[str, Any]] = None
+    ) -> BulkOperationResult:
+        """
+        批次恢復文件（參數同 archive_many）
+        
+        Returns:
+            BulkOperationResult: 符合條件與實際恢復的文件數
+        """
+        codes, selection = bulk_selection(doc_codes, query)
+        result = self._set_status_many(selection, DocumentStatus.ACTIVE.value)
+        self._invalidate_many(codes)
+        print(f"✓ 批次恢復完成: {result.modified} 筆（符合條件 {result.matched} 筆）")
+        return result
+    
+    def update_metadata_many(
+        self,
+        metadata: Dict[str, Any],
+        doc_codes: Optional[Iterable[str]] = None,
+        query: Optional[Dict[str, Any]] = None,
+        merge: bool = True
+    ) -> BulkOperationResult:
+        """
+        批次更新 Metadata（一次 update_many）
+        
+        Args:
+            metadata: 新的 Metadata
+            doc_codes / query: 選取條件（同 archive_many）
+            merge: 是否合併現有 Metadata（False 則完全覆蓋）
+        
+        Returns:
+            BulkOperationResult: 符合條件與實際更新的文件數
+        """
+        codes, selection = bulk_selection(doc_codes, query)
+        update = self.conn.documents.update_many(selection, metadata_update(metadata, merge))
+        self._invalidate_many(codes)
+        
+        result = BulkOperationResult(matched=update.matched_count, modified=update.modified_count)
+        print(f"✓ 批次更新 Metadata 完成: {result.modified} 筆（符合條件 {result.matched} 筆）")
+        return result
+    
+    def delete_many(
+        self,
+        doc_codes: Optional[Iterable[str]] = None,
+        query: Optional[Dict[str, Any]] = None,
+        delete_files: bool = True,
+        batch_size: Optional[int] = None
+    ) -> BulkOperationResult:
+        """
+        批次刪除文件（慎用）
+        
+        每批以一次 bulk_write 刪除文件記錄，再以 release_many 批次釋放 GridFS 檔案；
+        刪除以讀取時的 current_version 為條件，期間有新版本上傳的文件會略過。
+        
+        Args:
+            doc_codes / query: 選取條件（同 archive_many）
+            delete_files: 是否同時刪除 GridFS 中的檔案
+            batch_size: 每批筆數（預設使用設定值）
+        
+        Returns:
+            BulkOperationResult: 符合條件、實際刪除的文件數與刪除的檔案數
+        """
+        codes, selection = bulk_selection(doc_codes, query)
+        batch_size = batch_size or get_settings().bulk_batch_size
+        result = BulkOperationResult()
+        
+        batch: List[Document] = []
+        cursor = self.conn.documents.find(selection).batch_size(batch_size)
+        try:
+            for doc in cursor:
+                batch.append(Document.from_dict(doc))
+                if len(batch) >= batch_size:
+                    self._delete_batch(batch, delete_files, result)
+                    batch = []
+        finally:
+            cursor.close()
+        if batch:
+            self._delete_batch(batch, delete_files, result)
+        self._invalidate_many(codes)
+        
+        print(
+            f"✓ 批次刪除完成: {result.modified} 筆（符合條件 {result.matched} 筆）, "
+            f"刪除檔案 {result.files_deleted} 個"
+        )
+        return result
+    
+    def _set_status_many(self, selection: Dict[str, Any], status: str) -> BulkOperationResult:
+        """
+        批次變更狀態
+        
+        依原本的狀態分別 update_many，各自的 modified_count 即為統計計數器的增量
+        """
+        now = datetime.now()
+        result = BulkOperationResult(matched=self.conn.documents.count_documents(selection))
+        counters: Dict[str, int] = {}
+        for old_status in self.conn.documents.distinct(
+            "status", {"$and": [selection, {"status": {"$ne": status}}]}
+        ):
+            modified = self.conn.documents.update_many(
+                {"$and": [selection, {"status": old_status}]},
+                {"$set": {"status": status, "updated_at": now}}
+            ).modified_count
+            result.modified += modified
+            merge_counters(counters, status_counters(old_status, status, modified))
+        self._record_stats(counters)
+        return result
+    
+    def _delete_batch(self, docs: List[Document], delete_files: bool, result: BulkOperationResult) -> None:
+        """刪除一批文件並釋放檔案"""
+        result.matched += len(docs)
+        self.conn.documents.bulk_write([
+            DeleteOne({"_id": doc._id, "current_version": doc.current_version})
+            for doc in docs
+        ], ordered=False)
+        remaining = set(self.conn.documents.distinct("_id", {"_id": {"$in": [doc._id for doc in docs]}}))
+        deleted = [doc for doc in docs if doc._id not in remaining]
+        if not deleted:
+            return
+        result.modified += len(deleted)
+        
+        # split 版面的完整版本歷史（統計與釋放檔案都需要）
+        split_codes = [doc.doc_code for doc in deleted if doc.split_versions]
+        if split_codes:
+            history: Dict[str, List[Version]] = {}
+            cursor = self.conn.versions.find({"doc_code": {"$in": split_codes}}).sort("version", 1)
+            for record in cursor:
+                history.setdefault(record["doc_code"], []).append(Version.from_dict(record))
+            for doc in deleted:
+                if doc.split_versions:
+                    doc.versions = history.get(doc.doc_code, doc.versions)
+        
+        counters: Dict[str, int] = {}
+        for doc in deleted:
+            merge_counters(counters, document_counters(doc, -1))
+        if delete_files:
+            versions = [version for doc in deleted for version in doc.versions]
+            deleted_files = self.store.release_many(versions, counters)
+            result.files_deleted += len(deleted_files)
+            merge_counters(counters, released_files_counters(versions, deleted_files))
+        
+        if split_codes:
+            self.conn.versions.delete_many({"doc_code": {"$in": split_codes}})
+        self._record_stats(counters)
+    
+    # ============================================================
+    # 批次匯入
+    # ============================================================
+    def bulk_import(
+        self,
+        items: Iterable[BulkImportItem],
+        batch_size: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> BulkImportResult:
+        """
+        批次匯入文件
+        
+        每批以一次 $in 查詢檢查既有編號、直接從記憶體寫入 GridFS，
+        並以 insert_many(ordered=False) 寫入 Metadata；單筆失敗不影響其他文件。
+        
+        Args:
+            items: 要匯入的文件（可為產生器）
+            batch_size: 每批筆數（預設使用設定值）
+            chunk_size: GridFS chunk 大小（預設使用設定值）
+        
+        Returns:
+            BulkImportResult: 成功、略過（已存在）與失敗的文件編號
+        """
+        batch_size = batch_size or get_settings().bulk_batch_size
+        result = BulkImportResult()
+        
+        batch: List[BulkImportItem] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                self._import_batch(batch, chunk_size, result)
+                batch = []
+        if batch:
+            self._import_batch(batch, chunk_size, result)
+        
+        print(
+            f"✓ 批次匯入完成: 成功 {len(result.inserted)} 筆, "
+            f"略過 {len(result.skipped)} 筆, 失敗 {len(result.failed)} 筆"
+        )
+        return result
+    
+    def upload_files(
+        self,
+        items: Iterable[UploadFileItem],
+        workers: int = 4,
+        batch_size: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        on_batch: Optional[Callable[[BulkImportResult], None]] = None
+    ) -> BulkImportResult:
+        """
+        平行上傳多個檔案
+        
+        每批以一次 $in 查詢略過既有編號，再由固定大小的執行緒池將檔案串流寫入 GridFS
+        （同時進行的上傳數不超過 workers），最後以 insert_many 寫入整批 Metadata。
+        
+        Args:
+            items: 要上傳的文件（可為產生器）
+            workers: 同時上傳的檔案數
+            batch_size: 每批筆數（預設使用設定值）
+            chunk_size: GridFS chunk 大小（預設使用設定值）
+            on_batch: 每批完成後呼叫，傳入該批的結果（顯示進度、記錄斷點用）
+        
+        Returns:
+            BulkImportResult: 成功、略過（已存在）與失敗的文件編號
+        """
+        batch_size = batch_size or get_settings().bulk_batch_size
+        result = BulkImportResult()
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for batch in batched(items, batch_size):
+                batch_result = BulkImportResult()
+                self._upload_batch(batch, executor, chunk_size, batch_result)
+                result.merge(batch_result)
+                if on_batch:
+                    on_batch(batch_result)
+        
+        print(
+            f"✓ 批次上傳完成: 成功 {len(result.inserted)} 筆, "
+            f"略過 {len(result.skipped)} 筆, 失敗 {len(result.failed)} 筆"
+        )
+        return result
+    
+    def _upload_batch(
+        self,
+        batch: List[UploadFileItem],
+        executor: Executor,
+        chunk_size: Optional[int],
+        result: BulkImportResult
+    ) -> None:
+        """上傳單一批次"""
+        pending = self._pending_items(batch, result)
+        futures = [
+            executor.submit(self.store.put_dedup, item.file_path, item.file_name, chunk_size)
+            for item in pending
+        ]
+        
+        entries = []
+        for item, future in zip(pending, futures):
+            try:
+                stored, file_name = future.result()
+            except Exception as e:
+                result.failed[item.doc_code] = f"檔案寫入失敗: {e}"
+                continue
+            entries.append((item, stored, file_name))
+        if entries:
+            self._insert_imported(entries, result)
+    
+    def _import_batch(
+        self,
+        batch: List[BulkImportItem],
+        chunk_size: Optional[int],
+        result: BulkImportResult
+    ) -> None:
+        """匯入單一批次"""
+        pending = self._pending_items(batch, result)
+        if not pending:
+            return
+        
+        try:
+            stored_files = self.store.put_many_bytes(
+                [(item.content, item.file_name) for item in pending], chunk_size
+            )
+        except Exception as e:
+            for item in pending:
+                result.failed[item.doc_code] = f"檔案寫入失敗: {e}"
+            return
+        
+        self._insert_imported(
+            [(item, stored, item.file_name) for item, stored in zip(pending, stored_files)],
+            result
+        )
+    
+    def _pending_items(self, batch: List[Any], result: BulkImportResult) -> List[Any]:
+        """以一次 $in 查詢排除已存在與同批重複的文件編號"""
+        codes = [item.doc_code for item in batch]
+        existing = {
+            doc["doc_code"]
+            for doc in self.conn.documents.find(
+                {"doc_code": {"$in": codes}}, {"doc_code": 1, "_id": 0}
+            )
+        }
+        
+        pending: List[Any] = []
+        seen = set()
+        for item in batch:
+            if item.doc_code in existing:
+                result.skipped.append(item.doc_code)
+            elif item.doc_code in seen:
+                result.failed[item.doc_code] = "同一批次中文件編號重複"
+            else:
+                seen.add(item.doc_code)
+                pending.append(item)
+        return pending
+    
+    def _insert_imported(
+        self,
+        entries: List[Tuple[Any, StoredFile, str]],
+        result: BulkImportResult
+    ) -> None:
+        """
+        以 insert_many 寫入已存入 GridFS 的文件
+        
+        Args:
+            entries: (匯入項目, 寫入結果, 檔案名稱) 列表
+            result: 累計結果
+        """
+        now = datetime.now()
+        docs: List[Document] = []
+        for item, stored, file_name in entries:
+            version = Version(
+                version=1,
+                file_name=file_name,
+                file_type=file_name.split(".")[-1].lower(),
+                file_id=stored.file_id,
+                file_size=stored.file_size,
+                uploaded_by=item.uploaded_by,
+                uploaded_at=now,
+                description=item.description,
+                content_hash=stored.content_hash,
+                compression=stored.compression,
+                stored_size=stored.stored_size
+            )
+            docs.append(Document(
+                doc_code=item.doc_code,
+                title=item.title,
+                department=item.department,
+                category=item.category,
+                status=DocumentStatus.ACTIVE.value,
+                current_version=1,
+                versions=[version],
+                metadata=item.metadata,
+                created_at=now,
+                updated_at=now,
+                version_layout=get_settings().version_layout
+            ))
+        
+        errors: Dict[int, Dict[str, Any]] = {}
+        try:
+            self.conn.documents.insert_many([document_record(doc) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error for error in e.details["writeErrors"]}
+        
+        counters: Dict[str, int] = {}
+        version_records: List[Dict[str, Any]] = []
+        for index, (item, stored, _) in enumerate(entries):
+            error = errors.get(index)
+            if error is None:
+                result.inserted.append(item.doc_code)
+                result.inserted_bytes += stored.file_size
+                merge_counters(counters, document_counters(docs[index]))
+                merge_counters(counters, stored_counters(stored))
+                if docs[index].split_versions:
+                    version_records.append(version_record(item.doc_code, docs[index].versions[0]))
+                continue
+            # 寫入失敗：釋放檔案參照
+            self.store.release(stored.file_id, stored.content_hash)
+            if error.get("code") == 11000:
+                result.skipped.append(item.doc_code)
+            else:
+                result.failed[item.doc_code] = error.get("errmsg", "寫入失敗")
+        if version_records:
+            self.conn.versions.insert_many(version_records, ordered=False)
+        self._record_stats(counters)
     
     # ============================================================
     # 額外工具方法
@@ -416,70 +1534,93 @@ class DocumentService:
             delete_files: 是否同時刪除 GridFS 中的檔案
         
         Returns:
-            bool: 是否成功刪除
+            bool: 是否成功刪除（文件不存在或已被其他請求刪除時為 False）
+        
+        Raises:
+            PyMongoError: 釋放檔案失敗（文件記錄已刪除，統計仍會更新）
         """
-        doc = self.get_by_doc_code(doc_code)
-        if not doc:
+        # 先刪除文件記錄：同時刪除同一文件時只有一方取得文件，只由該方釋放檔案
+        data = self.conn.documents.find_one_and_delete({"doc_code": doc_code})
+        self._invalidate(doc_code)
+        if not data:
             return False
+        doc = Document.from_dict(data)
+        if doc.split_versions:
+            cursor = self.conn.versions.find({"doc_code": doc_code}, VERSION_RECORD_PROJECTION).sort("version", 1)
+            doc.versions = [Version.from_dict(record) for record in cursor]
         
-        # 刪除 GridFS 檔案
-        if delete_files:
-            for version in doc.versions:
-                try:
-                    self.conn.fs.delete(version.file_id)
-                except Exception:
-                    pass
-        
-        # 刪除文件記錄
-        self.conn.documents.delete_one({"doc_code": doc_code})
+        # 釋放 GridFS 檔案（無其他版本參照時才刪除）
+        counters = document_counters(doc, -1)
+        try:
+            if delete_files:
+                for version in doc.versions:
+                    deleted = self.store.release(version.file_id, version.content_hash, counters)
+                    merge_counters(counters, released_counters(version, deleted))
+        finally:
+            if doc.split_versions:
+                self.conn.versions.delete_many({"doc_code": doc_code})
+            self._record_stats(counters)
         print(f"✓ 文件已刪除: {doc_code}")
         return True
     
-    def get_statistics(self) -> Dict[str, Any]:
-        """取得統計資訊"""
-        pipeline = [
-            {
-                "$group": {
-                    "_id": None,
-                    "total_documents": {"$sum": 1},
-                    "total_versions": {"$sum": {"$size": "$versions"}},
-                    "by_department": {
-                        "$push": "$department"
-                    },
-                    "by_category": {
-                        "$push": "$category"
-                    },
-                    "by_status": {
-                        "$push": "$status"
-                    }
-                }
-            }
-        ]
+    def get_statistics(self, detailed: bool = False) -> Dict[str, Any]:
+        """
+        取得統計資訊（讀取 stats 計數器，尚未建立時先重建）
         
-        results = list(self.conn.documents.aggregate(pipeline))
+        Args:
+            detailed: 另外即時統計各檔案類型的容量、各部門版本數與每日上傳數
+        """
+        stats = self.conn.stats.find_one({"_id": STATS_ID})
+        summary = summarize_counters(stats) if stats else self.rebuild_statistics()
+        if detailed:
+            versions_collection = self.conn.versions.name
+            for pipeline in (DETAILED_PIPELINE, detailed_version_pipeline(versions_collection)):
+                results = list(self.conn.documents.aggregate(pipeline))
+                summary.update(facet_counts(results[0] if results else {}))
+        return summary
+    
+    def rebuild_statistics(self) -> Dict[str, Any]:
+        """
+        由 documents 與 blobs 重新計算 stats 計數器（修正計數偏差）
         
-        if not results:
-            return {
-                "total_documents": 0,
-                "total_versions": 0,
-                "by_department": {},
-                "by_category": {},
-                "by_status": {}
-            }
+        重建期間的寫入可能未反映在結果中，建議在離峰時執行
+        """
+        results = list(self.conn.documents.aggregate(statistics_pipeline()))
+        version_results = list(self.conn.documents.aggregate(
+            version_statistics_pipeline(self.conn.versions.name)
+        ))
+        stats = counters_from_pipeline(
+            results, version_results, self.store.storage_stats()["stored_bytes"]
+        )
+        self.conn.stats.replace_one({"_id": STATS_ID}, stats, upsert=True)
+        return summarize_counters(stats)
+    
+    def _record_stats(self, counters: Dict[str, int]) -> None:
+        """
+        以 $inc 更新 stats 計數器
         
-        result = results[0]
-        
-        # 計算各分類統計
-        def count_items(items):
-            counts = {}
-            for item in items:
-                counts[item] = counts.get(item, 0) + 1
-            return counts
-        
-        return {
-            "total_documents": result["total_documents"],
-            "total_versions": result["total_versions"],
-            "by_department": count_items(result["by_department"]),
-            "by_category": count_items(result["by_category"]),
-            "by_status": count_items(result["by_status"])
-        }
+        計數器尚未建立時不寫入（第一次 get_statistics 會完整重建）
+        """
+        if any(counters.values()):
+            self.conn.stats.update_one({"_id": STATS_ID}, stats_update(counters))
+    
+    def _cache_key(self, doc_code: str) -> tuple:
+        """快取 key（含資料庫名稱，避免不同資料庫的同編號文件互相覆蓋）"""
+        return (self.conn.db.name, doc_code)
+    
+    def _cache_document(self, doc: Dict[str, Any], generation: int) -> None:
+        """將讀到的完整文件存入快取（停用時不建立快照）"""
+        if self.cache.enabled:
+            self.cache.put(self._cache_key(doc["doc_code"]), document_snapshot(doc), doc["_id"], generation)
+    
+    def _invalidate(self, doc_code: str) -> None:
+        """寫入後失效快取"""
+        self.cache.invalidate(self._cache_key(doc_code))
+    
+    def _invalidate_many(self, doc_codes: Optional[List[str]]) -> None:
+        """批次寫入後失效快取（以查詢條件選取時無法得知編號，直接清空）"""
+        if doc_codes is None:
+            self.cache.clear()
+            return
+        for doc_code in doc_codes:
+            self._invalidate(doc_code)
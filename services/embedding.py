@@ -0,0 +1,141 @@
+"""
+KM Document Management System - Embedding
+chunk 語意搜尋的向量嵌入
+
+預設的 HashingEmbedder 將文字切成字元 n-gram（中文不需斷詞），以固定的雜湊函數
+對應到向量維度，完全在本機計算、結果固定，不需下載模型或呼叫外部服務。
+其他嵌入方式（Sentence-Transformers、OpenAI 等）可繼承 Embedder 後以
+register_embedder 註冊，或直接傳入 SemanticSearchService。
+
+需要 numpy（uv sync --extra semantic；未安裝時建立嵌入器會提示安裝）。
+"""
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from config.settings import get_settings
+
+# 不屬於任何 n-gram 的分隔字元（空白與標點），如「第30條（工時）」切為「第30條」「工時」
+_SEPARATORS = re.compile(r"[\W_]+")
+
+_SIGN_BIT = 0x80000000
+
+
+def require_numpy() -> None:
+    """確認已安裝 numpy"""
+    if not HAS_NUMPY:
+        raise RuntimeError("語意搜尋需要 numpy，請安裝 numpy 套件（uv sync --extra semantic）")
+
+
+def normalize_rows(vectors: "np.ndarray") -> "np.ndarray":
+    """將每一列正規化為單位向量（零向量維持為零），回傳連續的 float32 矩陣"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+@lru_cache(maxsize=1 << 20)
+def _hash_gram(gram: str) -> int:
+    """n-gram 的雜湊值（跨行程固定，不使用 Python 內建 hash）"""
+    return zlib.crc32(gram.encode("utf-8"))
+
+
+class Embedder:
+    """
+    向量嵌入器介面
+
+    embed 回傳 (len(texts), dim) 的 float32 矩陣，每一列為單位向量；
+    name 記錄在儲存的向量上，更換嵌入方式或參數時既有向量會重新計算。
+    """
+    name: str = ""
+    dim: int = 0
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> "np.ndarray":
+        """單一文字的向量"""
+        return self.embed([text])[0]
+
+
+class HashingEmbedder(Embedder):
+    """
+    字元 n-gram 雜湊嵌入
+
+    文字經 NFKC 正規化與轉小寫後，以空白與標點分段，取每段的 min_n～max_n 字元 n-gram；
+    每個 n-gram 以 crc32 決定維度與正負號（正負號抵銷雜湊碰撞的偏差），
+    出現次數取 log 後正規化。共用較多 n-gram 的文字 cosine 相似度較高。
+    """
+
+    def __init__(self, dim: int = 512, min_n: int = 1, max_n: int = 3):
+        require_numpy()
+        if dim <= 0 or min_n <= 0 or max_n < min_n:
+            raise ValueError(f"嵌入參數錯誤: dim={dim}, n-gram={min_n}~{max_n}")
+        self.dim = dim
+        self.min_n = min_n
+        self.max_n = max_n
+        self.name = f"hashing-{dim}-{min_n}{max_n}"
+
+    def grams(self, text: str) -> List[str]:
+        """文字的字元 n-gram"""
+        text = unicodedata.normalize("NFKC", text).lower()
+        grams = []
+        for segment in _SEPARATORS.split(text):
+            length = len(segment)
+            for n in range(self.min_n, min(self.max_n, length) + 1):
+                grams.extend(segment[i:i + n] for i in range(length - n + 1))
+        return grams
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            grams = self.grams(text or "")
+            if not grams:
+                continue
+            hashes = np.fromiter(map(_hash_gram, grams), dtype=np.uint32, count=len(grams))
+            signs = np.where(hashes & _SIGN_BIT, 1.0, -1.0)
+            counts = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+            vectors[row] = np.sign(counts) * np.log1p(np.abs(counts))
+        return normalize_rows(vectors)
+
+
+# 嵌入方式名稱 -> 建立函數（參數為維度）
+EMBEDDERS: Dict[str, Callable[[int], Embedder]] = {
+    "hashing": lambda dim: HashingEmbedder(dim),
+}
+
+
+def register_embedder(name: str, factory: Callable[[int], Embedder]) -> None:
+    """註冊嵌入方式（EMBEDDING_MODEL 設為 name 時使用）"""
+    EMBEDDERS[name] = factory
+
+
+def get_embedder(name: Optional[str] = None, dim: Optional[int] = None) -> Embedder:
+    """
+    依名稱建立嵌入器
+
+    Args:
+        name: 嵌入方式（預設使用 EMBEDDING_MODEL）
+        dim: 向量維度（預設使用 EMBEDDING_DIM）
+    """
+    settings = get_settings()
+    name = name or settings.embedding_model
+    if name not in EMBEDDERS:
+        raise ValueError(f"不支援的嵌入方式: {name}（可用: {', '.join(sorted(EMBEDDERS))}）")
+    return EMBEDDERS[name](dim or settings.embedding_dim)
+
+
+def chunk_text(chunk: Dict[str, Any]) -> str:
+    """chunk 用於嵌入的文字（標題、摘要與條文內容）"""
+    return "\n".join(
+        part for part in (chunk.get("title"), chunk.get("summary"), chunk.get("content")) if part
+    )
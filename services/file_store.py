@@ -0,0 +1,761 @@
+"""
+KM Document Management System - GridFS File Store
+以串流方式寫入 GridFS，記憶體用量僅與 chunk 大小相關
+
+檔案以內容雜湊（SHA-256）去重：blobs collection 記錄
+雜湊 → GridFS 檔案與參照計數，相同內容只保存一份。
+"""
+import hashlib
+import io
+import os
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from bson import Binary, Int64, ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config.settings import get_settings
+from db.connection import MongoDBConnection
+from services.compression import (
+    choose_compression,
+    compress_bytes,
+    compressor,
+    decompressor,
+    RangeSlicer,
+)
+from services.delta import apply_chain, chain_limit, make_delta, worthwhile
+
+
+FileSource = Union[str, BinaryIO]
+
+# GridFS 的 collection 前綴（GridFS(db) 預設值）
+GRIDFS_BUCKET = "fs"
+
+
+@dataclass
+class StoredFile:
+    """GridFS 寫入結果"""
+    file_id: ObjectId
+    file_size: int
+    content_hash: str
+    deduplicated: bool = False
+    compression: str = ""
+    stored_size: int = 0
+
+    @property
+    def bytes_stored(self) -> int:
+        """GridFS 實際佔用的大小"""
+        return self.stored_size or self.file_size
+
+
+# blob 實際儲存大小（壓縮前建立的 blob 沒有 stored_size）
+_BLOB_STORED_SIZE = {"$ifNull": ["$stored_size", "$size"]}
+
+# 取得既有 blob 時需要的欄位
+BLOB_PROJECTION = {"file_id": 1, "compression": 1, "stored_size": 1}
+
+STORAGE_STATS_PIPELINE = [
+    {
+        "$group": {
+            "_id": None,
+            "stored_bytes": {"$sum": _BLOB_STORED_SIZE},
+            # 去重（參照多次只存一份）與壓縮節省的容量
+            "bytes_saved": {
+                "$sum": {
+                    "$subtract": [{"$multiply": ["$ref_count", "$size"]}, _BLOB_STORED_SIZE]
+                }
+            }
+        }
+    }
+]
+
+
+def reused_file(blob: Dict[str, Any], file_size: int, content_hash: str) -> StoredFile:
+    """沿用既有 blob 的寫入結果（壓縮方式以既有檔案為準）"""
+    return StoredFile(
+        file_id=blob["file_id"],
+        file_size=file_size,
+        content_hash=content_hash,
+        deduplicated=True,
+        compression=blob.get("compression", ""),
+        stored_size=blob.get("stored_size", 0)
+    )
+
+
+def blob_record(stored: StoredFile, ref_count: int = 1) -> Dict[str, Any]:
+    """新內容的 blob 記錄"""
+    return {
+        "_id": stored.content_hash,
+        "file_id": stored.file_id,
+        "size": stored.file_size,
+        "stored_size": stored.bytes_stored,
+        "compression": stored.compression,
+        "ref_count": ref_count,
+        "created_at": datetime.now()
+    }
+
+
+def file_metadata(compression: str, delta: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    GridFS 檔案的 metadata：壓縮方式與原始大小（寫入完成、close 前再設定 length），
+    差異檔案另記錄基底（base、base_hash）、鏈深度（depth）與還原後大小（size）
+    """
+    metadata: Dict[str, Any] = {}
+    if compression:
+        metadata["compression"] = compression
+    if delta:
+        metadata["delta"] = delta
+    return metadata or None
+
+
+def delta_base(metadata: Optional[Dict[str, Any]]) -> Optional[Tuple[str, ObjectId]]:
+    """差異檔案的基底 (content_hash, file_id)，完整內容回傳 None"""
+    delta = (metadata or {}).get("delta")
+    return (delta["base_hash"], delta["base"]) if delta else None
+
+
+def delta_depth(metadata: Optional[Dict[str, Any]]) -> int:
+    """差異檔案在基底鏈中的深度（完整內容為 0）"""
+    return ((metadata or {}).get("delta") or {}).get("depth", 0)
+
+
+def read_length(total: int, offset: int, length: Optional[int]) -> int:
+    """檢查讀取範圍並回傳實際讀取長度"""
+    if offset < 0 or offset > total:
+        raise ValueError(f"起始位置超出檔案範圍: {offset} (檔案大小 {total})")
+    if length is not None and length < 0:
+        raise ValueError(f"讀取長度不可為負數: {length}")
+    return total - offset if length is None else min(length, total - offset)
+
+
+def summarize_storage(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """整理儲存量統計結果"""
+    if not results:
+        return {"stored_bytes": 0, "bytes_saved": 0}
+    return {
+        "stored_bytes": results[0]["stored_bytes"],
+        "bytes_saved": results[0]["bytes_saved"]
+    }
+
+
+class FileStore:
+    """GridFS 串流存取"""
+
+    def __init__(self, connection: MongoDBConnection, chunk_size: Optional[int] = None):
+        self.conn = connection
+        self.chunk_size = chunk_size or get_settings().gridfs_chunk_size
+
+    @staticmethod
+    @contextmanager
+    def open_source(
+        source: FileSource,
+        file_name: Optional[str] = None
+    ) -> Iterator[Tuple[BinaryIO, str]]:
+        """
+        開啟上傳來源
+
+        Args:
+            source: 檔案路徑或已開啟的二進位檔案物件
+            file_name: 檔案名稱（預設取自路徑或檔案物件的 name）
+
+        Yields:
+            (檔案物件, 檔案名稱)
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                yield f, file_name or os.path.basename(source)
+        else:
+            name = file_name or os.path.basename(getattr(source, "name", "") or "")
+            if not name:
+                raise ValueError("使用檔案物件上傳時必須指定 file_name")
+            yield source, name
+
+    def put_stream(
+        self,
+        file_obj: BinaryIO,
+        file_name: str,
+        chunk_size: Optional[int] = None,
+        compression: str = "",
+        delta: Optional[Dict[str, Any]] = None
+    ) -> StoredFile:
+        """
+        以串流方式寫入 GridFS
+
+        每次只讀取一個 chunk，同時計算檔案大小與 SHA-256（以原始內容計算）。
+
+        Args:
+            file_obj: 二進位檔案物件
+            file_name: 檔案名稱
+            chunk_size: GridFS chunk 大小（預設使用設定值）
+            compression: 壓縮方式（空字串表示不壓縮）
+            delta: 寫入的是差異時，記錄在 metadata 的基底資訊
+
+        Returns:
+            StoredFile: GridFS 檔案 ID、大小與內容雜湊
+        """
+        chunk_size = chunk_size or self.chunk_size
+        hasher = hashlib.sha256()
+        file_size = stored_size = 0
+        metadata = file_metadata(compression, delta)
+        encoder = compressor(compression) if compression else None
+
+        grid_in = self.conn.fs.new_file(filename=file_name, chunkSize=chunk_size, metadata=metadata)
+        try:
+            while True:
+                data = file_obj.read(chunk_size)
+                if not data:
+                    break
+                hasher.update(data)
+                file_size += len(data)
+                if encoder:
+                    data = encoder.compress(data)
+                stored_size += len(data)
+                grid_in.write(data)
+            if encoder:
+                data = encoder.flush()
+                stored_size += len(data)
+                grid_in.write(data)
+                # 原始大小在寫入完成後才知道：close 前設定的欄位會隨 files 文件一起寫入
+                grid_in.metadata = dict(metadata, length=file_size)
+            grid_in.close()
+        except BaseException:
+            # 清除已寫入的 chunks，避免留下孤兒資料
+            grid_in.abort()
+            raise
+
+        return StoredFile(
+            file_id=grid_in._id,
+            file_size=file_size,
+            content_hash=hasher.hexdigest(),
+            compression=compression,
+            stored_size=stored_size if compression else 0
+        )
+
+    def put(
+        self,
+        source: FileSource,
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> Tuple[StoredFile, str]:
+        """
+        從檔案路徑或檔案物件串流寫入 GridFS
+
+        Args:
+            compression: 壓縮方式（預設依設定值與檔案類型決定）
+
+        Returns:
+            (StoredFile, 檔案名稱)
+        """
+        with self.open_source(source, file_name) as (file_obj, name):
+            codec = choose_compression(name, compression)
+            return self.put_stream(file_obj, name, chunk_size, codec), name
+
+    # ============================================================
+    # 內容定址去重
+    # ============================================================
+    def put_dedup(
+        self,
+        source: FileSource,
+        file_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> Tuple[StoredFile, str]:
+        """
+        串流寫入 GridFS 並以內容雜湊去重
+
+        寫入完成後若相同雜湊已存在，刪除剛寫入的檔案並沿用既有 file_id。
+
+        Returns:
+            (StoredFile, 檔案名稱)
+        """
+        stored, name = self.put(source, file_name, chunk_size, compression)
+        return self._register(stored), name
+
+    def put_bytes(
+        self,
+        data: bytes,
+        file_name: str,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> StoredFile:
+        """
+        寫入記憶體中的內容並去重
+
+        內容雜湊可事先算出，已存在時完全不寫入 GridFS。
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        existing = self._acquire(content_hash)
+        if existing:
+            return reused_file(existing, len(data), content_hash)
+        codec = choose_compression(file_name, compression)
+        stored = self.put_stream(io.BytesIO(data), file_name, chunk_size, codec)
+        return self._register(stored)
+
+    def put_delta(
+        self,
+        data: bytes,
+        file_name: str,
+        base_file_id: ObjectId,
+        base_hash: str,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> StoredFile:
+        """
+        以前一版為基底寫入新版本（差異儲存）並去重
+
+        基底鏈達到快照間隔、差異不夠小、或基底沒有 blob 記錄時改存完整內容。
+
+        Args:
+            data: 新版本內容
+            file_name: 檔案名稱
+            base_file_id: 前一版的 GridFS 檔案 ID
+            base_hash: 前一版的內容雜湊
+
+        Returns:
+            StoredFile: file_size 為還原後大小，stored_size 為差異實際佔用的大小
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        existing = self._acquire(content_hash)
+        if existing:
+            return reused_file(existing, len(data), content_hash)
+
+        codec = choose_compression(file_name, compression)
+        base_doc = self.conn.db[f"{GRIDFS_BUCKET}.files"].find_one({"_id": base_file_id}, {"metadata": 1})
+        depth = delta_depth((base_doc or {}).get("metadata")) + 1
+
+        delta = None
+        if base_doc is not None and depth < get_settings().delta_snapshot_interval:
+            delta = make_delta(self.read_content(base_file_id), data)
+            # 差異持有基底的一次參照，基底不會早於差異被刪除
+            if not worthwhile(delta, data) or not self._acquire_base(base_hash, base_file_id):
+                delta = None
+
+        if delta is None:
+            stored = self.put_stream(io.BytesIO(data), file_name, chunk_size, codec)
+            return self._register(stored)
+
+        try:
+            stored = self.put_stream(
+                io.BytesIO(delta), file_name, chunk_size, codec,
+                delta={"base": base_file_id, "base_hash": base_hash, "depth": depth, "size": len(data)}
+            )
+        except BaseException:
+            self.release(base_file_id, base_hash)
+            raise
+        stored.stored_size = stored.bytes_stored
+        stored.file_size = len(data)
+        stored.content_hash = content_hash
+        return self._register(stored)
+
+    def put_many_bytes(
+        self,
+        items: Sequence[Tuple[bytes, str]],
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> List[StoredFile]:
+        """
+        批次寫入多筆記憶體中的內容並去重
+
+        新內容直接以 insert_many 寫入 fs.chunks / fs.files / blobs，
+        整批只需固定幾次往返，不會為每個檔案各開一個 GridFS 上傳。
+
+        Args:
+            items: (內容, 檔案名稱) 列表
+            chunk_size: GridFS chunk 大小（預設使用設定值）
+            compression: 壓縮方式（預設依設定值與檔案類型決定）
+
+        Returns:
+            List[StoredFile]: 與 items 順序相同的寫入結果
+        """
+        if not items:
+            return []
+
+        chunk_size = chunk_size or self.chunk_size
+        hashes = [hashlib.sha256(data).hexdigest() for data, _ in items]
+        ref_counts = Counter(hashes)
+
+        # 已存在的內容只增加參照計數：一次 $in 查詢取回 blob，再以一次 bulk_write 遞增
+        existing: Dict[str, Dict[str, Any]] = {
+            blob["_id"]: blob
+            for blob in self.conn.blobs.find({"_id": {"$in": list(ref_counts)}}, BLOB_PROJECTION)
+        }
+        if existing:
+            acquired = self.conn.blobs.bulk_write([
+                UpdateOne(
+                    {"_id": content_hash, "file_id": blob["file_id"]},
+                    {"$inc": {"ref_count": ref_counts[content_hash]}}
+                )
+                for content_hash, blob in existing.items()
+            ], ordered=False)
+            if acquired.matched_count < len(existing):
+                # 查詢後有 blob 被釋放刪除：仍指向同一檔案者才已遞增，其餘視為新內容
+                current = {
+                    blob["_id"]: blob["file_id"]
+                    for blob in self.conn.blobs.find({"_id": {"$in": list(existing)}}, {"file_id": 1})
+                }
+                existing = {
+                    content_hash: blob for content_hash, blob in existing.items()
+                    if current.get(content_hash) == blob["file_id"]
+                }
+        reused = set(existing)
+
+        # 新內容：組出 GridFS 的 files / chunks 文件
+        files, chunks, blobs = [], [], []
+        for (data, file_name), content_hash in zip(items, hashes):
+            if content_hash in existing:
+                continue
+            codec = choose_compression(file_name, compression)
+            content = compress_bytes(data, codec)
+            stored = StoredFile(
+                file_id=ObjectId(),
+                file_size=len(data),
+                content_hash=content_hash,
+                compression=codec,
+                stored_size=len(content) if codec else 0
+            )
+            existing[content_hash] = blob_record(stored, ref_counts[content_hash])
+            for n, start in enumerate(range(0, len(content), chunk_size)):
+                chunks.append({
+                    "files_id": stored.file_id,
+                    "n": n,
+                    "data": Binary(content[start:start + chunk_size])
+                })
+            file_doc = {
+                "_id": stored.file_id,
+                "filename": file_name,
+                "chunkSize": chunk_size,
+                "length": Int64(len(content)),
+                "uploadDate": datetime.now(tz=timezone.utc)
+            }
+            if codec:
+                file_doc["metadata"] = dict(file_metadata(codec), length=len(data))
+            files.append(file_doc)
+            blobs.append(existing[content_hash])
+
+        if files:
+            # 先寫 chunks 再寫 files，確保檔案出現時內容已完整
+            if chunks:
+                self.conn.db["fs.chunks"].insert_many(chunks)
+            self.conn.db["fs.files"].insert_many(files)
+            try:
+                self.conn.blobs.insert_many(blobs, ordered=False)
+            except BulkWriteError as e:
+                # 並行上傳了相同內容：改用既有檔案
+                for error in e.details["writeErrors"]:
+                    if error["code"] != 11000:
+                        raise
+                    blob = blobs[error["index"]]
+                    acquired = self.conn.blobs.find_one_and_update(
+                        {"_id": blob["_id"]},
+                        {"$inc": {"ref_count": blob["ref_count"]}},
+                        projection=BLOB_PROJECTION
+                    )
+                    if acquired is None:
+                        raise
+                    self.conn.fs.delete(blob["file_id"])
+                    existing[blob["_id"]] = acquired
+                    reused.add(blob["_id"])
+
+        results = []
+        seen = set()
+        for (data, _), content_hash in zip(items, hashes):
+            stored = reused_file(existing[content_hash], len(data), content_hash)
+            stored.deduplicated = content_hash in reused or content_hash in seen
+            results.append(stored)
+            seen.add(content_hash)
+        return results
+
+    def release(
+        self,
+        file_id: ObjectId,
+        content_hash: str = "",
+        counters: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """
+        釋放一個版本對 GridFS 檔案的參照
+
+        參照計數歸零時才刪除 GridFS 檔案；沒有 blob 記錄的舊版本直接刪除。
+
+        Args:
+            file_id: GridFS 檔案 ID
+            content_hash: 內容雜湊
+            counters: 統計計數器增量；連帶刪除的差異基底累加於此（見 delete_files）
+
+        Returns:
+            bool: GridFS 檔案是否已刪除
+        """
+        blob = None
+        if content_hash:
+            blob = self.conn.blobs.find_one_and_update(
+                {"_id": content_hash, "file_id": file_id},
+                {"$inc": {"ref_count": -1}},
+                return_document=ReturnDocument.AFTER
+            )
+
+        if blob is not None:
+            if blob["ref_count"] > 0:
+                return False
+            # 僅在刪除期間沒有新參照時才移除
+            result = self.conn.blobs.delete_one(
+                {"_id": content_hash, "ref_count": {"$lte": 0}}
+            )
+            if result.deleted_count == 0:
+                return False
+
+        self.delete_files([file_id], counters)
+        return True
+
+    def release_many(
+        self,
+        versions: Iterable[Any],
+        counters: Optional[Dict[str, int]] = None
+    ) -> Set[ObjectId]:
+        """
+        批次釋放多個版本的參照（規則同 release）
+
+        參照計數以一次 bulk_write 遞減，歸零的 blob 與 GridFS 檔案以 $in 批次刪除。
+
+        Args:
+            versions: 要釋放的版本（需有 file_id 與 content_hash）
+            counters: 統計計數器增量；連帶刪除的差異基底累加於此（見 delete_files）
+
+        Returns:
+            Set[ObjectId]: 已刪除的 GridFS 檔案（不含連帶刪除的差異基底）
+        """
+        refs: Counter = Counter()
+        candidates: Set[ObjectId] = set()
+        for version in versions:
+            if version.content_hash:
+                refs[(version.content_hash, version.file_id)] += 1
+            else:
+                candidates.add(version.file_id)
+
+        if refs:
+            self.conn.blobs.bulk_write([
+                UpdateOne({"_id": content_hash, "file_id": file_id}, {"$inc": {"ref_count": -count}})
+                for (content_hash, file_id), count in refs.items()
+            ], ordered=False)
+            blobs = {
+                blob["_id"]: blob
+                for blob in self.conn.blobs.find(
+                    {"_id": {"$in": list({content_hash for content_hash, _ in refs})}},
+                    {"file_id": 1, "ref_count": 1}
+                )
+            }
+            released = {}
+            for content_hash, file_id in refs:
+                blob = blobs.get(content_hash)
+                if blob is None or blob["file_id"] != file_id:
+                    # 沒有 blob 記錄，同 release 直接刪除
+                    candidates.add(file_id)
+                elif blob["ref_count"] <= 0:
+                    released[content_hash] = file_id
+
+            if released:
+                # 僅在刪除期間沒有新參照時才移除
+                self.conn.blobs.delete_many(
+                    {"_id": {"$in": list(released)}, "ref_count": {"$lte": 0}}
+                )
+                kept = self.conn.blobs.distinct("_id", {"_id": {"$in": list(released)}})
+                candidates.update(
+                    file_id for content_hash, file_id in released.items() if content_hash not in kept
+                )
+
+        self.delete_files(candidates, counters)
+        return candidates
+
+    def delete_files(self, file_ids: Iterable[ObjectId], counters: Optional[Dict[str, int]] = None) -> None:
+        """
+        批次刪除 GridFS 檔案（先刪 files 再刪 chunks，順序同 GridFS.delete）
+
+        刪除差異檔案後釋放其對基底的參照。呼叫端只依自己的版本計算儲存量減量，
+        因此連帶刪除的基底（含更深的基底鏈）以 stored_bytes 減量累加到 counters，
+        讓 stats 計數器與 storage_stats 保持一致。
+        """
+        file_ids = list(file_ids)
+        if not file_ids:
+            return
+        files = self.conn.db[f"{GRIDFS_BUCKET}.files"]
+        bases = [
+            delta_base(doc.get("metadata"))
+            for doc in files.find({"_id": {"$in": file_ids}, "metadata.delta": {"$exists": True}}, {"metadata": 1})
+        ]
+        files.delete_many({"_id": {"$in": file_ids}})
+        self.conn.db[f"{GRIDFS_BUCKET}.chunks"].delete_many({"files_id": {"$in": file_ids}})
+        if not bases:
+            return
+        sizes = {
+            doc["_id"]: doc["length"]
+            for doc in files.find({"_id": {"$in": [file_id for _, file_id in bases]}}, {"length": 1})
+        }
+        released = self.release_many(
+            (StoredFile(file_id=file_id, file_size=0, content_hash=content_hash) for content_hash, file_id in bases),
+            counters
+        )
+        if counters is not None:
+            released_bytes = sum(sizes.get(file_id, 0) for file_id in released)
+            if released_bytes:
+                counters["stored_bytes"] = counters.get("stored_bytes", 0) - released_bytes
+
+    def storage_stats(self) -> Dict[str, int]:
+        """
+        統計實際儲存量與去重節省的容量
+
+        Returns:
+            dict: stored_bytes（實際儲存）、bytes_saved（去重節省）
+        """
+        return summarize_storage(list(self.conn.blobs.aggregate(STORAGE_STATS_PIPELINE)))
+
+    def _acquire(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """若雜湊已存在則增加參照計數並回傳 blob 記錄"""
+        return self.conn.blobs.find_one_and_update(
+            {"_id": content_hash},
+            {"$inc": {"ref_count": 1}},
+            projection=BLOB_PROJECTION
+        )
+
+    def _acquire_base(self, content_hash: str, file_id: ObjectId) -> bool:
+        """增加差異基底的參照計數（基底需有對應的 blob 記錄）"""
+        result = self.conn.blobs.update_one(
+            {"_id": content_hash, "file_id": file_id},
+            {"$inc": {"ref_count": 1}}
+        )
+        return result.modified_count > 0
+
+    def _register(self, stored: StoredFile) -> StoredFile:
+        """登記新寫入的檔案；雜湊重複時改用既有檔案"""
+        existing = self._acquire(stored.content_hash)
+        if existing is None:
+            try:
+                self.conn.blobs.insert_one(blob_record(stored))
+                return stored
+            except DuplicateKeyError:
+                # 並行上傳了相同內容
+                existing = self._acquire(stored.content_hash)
+                if existing is None:
+                    raise
+
+        self.delete_files([stored.file_id])
+        return reused_file(existing, stored.file_size, stored.content_hash)
+
+    def _read_stored(self, file_id: ObjectId) -> Tuple[bytes, Dict[str, Any]]:
+        """讀取 GridFS 檔案的完整內容（解壓縮，差異不還原）與 metadata"""
+        grid_out = self.conn.fs.get(file_id)
+        try:
+            metadata = grid_out.metadata or {}
+            data = grid_out.read()
+        finally:
+            grid_out.close()
+
+        compression = metadata.get("compression", "")
+        if compression:
+            data = decompressor(compression).decompress(data)
+        return data, metadata
+
+    def read_content(self, file_id: ObjectId) -> bytes:
+        """
+        讀取完整內容（解壓縮，差異檔案依基底鏈還原）
+
+        沿基底鏈讀到完整快照後依序套用差異；鏈長度上限為 DELTA_SNAPSHOT_INTERVAL，
+        超過時視為資料損毀。還原時記憶體用量約為內容大小的兩倍加上鏈上的差異，
+        差異儲存只用於不超過 DELTA_MAX_SIZE 的文字類檔案。
+
+        Raises:
+            ValueError: 基底鏈超過上限
+        """
+        data, metadata = self._read_stored(file_id)
+        limit = chain_limit(delta_depth(metadata))
+        deltas: List[bytes] = []
+        base = delta_base(metadata)
+        while base:
+            if len(deltas) >= limit:
+                raise ValueError(f"差異基底鏈超過 {limit} 層: {file_id}")
+            deltas.append(data)
+            data, metadata = self._read_stored(base[1])
+            base = delta_base(metadata)
+        return apply_chain(data, deltas)
+
+    def iter_range(
+        self,
+        file_id: ObjectId,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        以 GridFS chunk 為單位串流讀取檔案（壓縮的檔案邊讀邊解壓縮）
+
+        差異檔案需先以 read_content 在記憶體還原完整內容再切出範圍，
+        記憶體用量上限約為 DELTA_MAX_SIZE 的兩倍（見 read_content）。
+
+        Args:
+            file_id: GridFS 檔案 ID
+            offset: 起始位置（bytes，以原始內容計算）
+            length: 讀取長度（預設讀到檔尾）
+
+        Yields:
+            bytes: 每次最多一個 chunk（解壓縮後）的資料
+        """
+        grid_out = self.conn.fs.get(file_id)
+        try:
+            metadata = grid_out.metadata or {}
+            if delta_base(metadata):
+                # 差異檔案：還原完整內容後再切出範圍
+                content = self.read_content(file_id)
+                remaining = read_length(len(content), offset, length)
+                for start in range(offset, offset + remaining, grid_out.chunk_size):
+                    yield content[start:min(start + grid_out.chunk_size, offset + remaining)]
+                return
+
+            compression = metadata.get("compression", "")
+            total = metadata["length"] if compression else grid_out.length
+            remaining = read_length(total, offset, length)
+
+            if compression:
+                # 壓縮後無法 seek：從頭解壓縮並略過 offset 之前的資料
+                decoder = decompressor(compression)
+                slicer = RangeSlicer(offset, remaining)
+                while not slicer.done:
+                    data = grid_out.read(grid_out.chunk_size)
+                    if not data:
+                        break
+                    data = slicer.feed(decoder.decompress(data))
+                    if data:
+                        yield data
+                return
+
+            grid_out.seek(offset)
+            while remaining > 0:
+                # 對齊 chunk 邊界，讓每次讀取只取一個 GridFS chunk
+                position = grid_out.tell()
+                size = min(grid_out.chunk_size - position % grid_out.chunk_size, remaining)
+                data = grid_out.read(size)
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+        finally:
+            grid_out.close()
+
+    def copy_range(
+        self,
+        file_id: ObjectId,
+        writer: BinaryIO,
+        offset: int = 0,
+        length: Optional[int] = None
+    ) -> int:
+        """
+        將檔案（或指定範圍）串流寫入可寫入物件
+
+        Returns:
+            int: 寫入的 bytes 數
+        """
+        written = 0
+        for data in self.iter_range(file_id, offset, length):
+            writer.write(data)
+            written += len(data)
+        return written
@@ -0,0 +1,290 @@
+"""
+KM Document Management System - Streaming JSON
+逐筆讀取大型 JSON 檔案中的陣列（articles[]、chunks[]），記憶體用量只與單筆大小相關
+
+json.load 需要將整個檔案與解析後的物件同時放在記憶體，峰值約為檔案大小的數倍；
+這裡以固定大小分段讀取檔案，用 json.JSONDecoder.raw_decode 一次解析一個陣列元素。
+另支援 JSON Lines（.jsonl / .ndjson）：每行一筆，第一行若含陣列欄位名稱則視為其餘欄位。
+
+    with open_array_stream("data/raw/勞動基準法.json", "articles") as stream:
+        stream.header["law_name"]   # 陣列之前的欄位
+        for article in stream:      # 逐筆產生
+            ...
+        stream.header               # 讀完後包含陣列之後的欄位
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, Optional, TextIO, Union
+
+JSONSource = Union[str, TextIO]
+
+# 每次讀取的字元數
+DEFAULT_READ_SIZE = 1024 * 1024
+
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# 合法 JSON 中一個值之後可能出現的字元
+_TERMINATORS = frozenset(" \t\n\r,:]}")
+
+# JSON Lines 檔尾（null 是合法的一筆資料，不能用 None 表示）
+_END = object()
+
+
+class _Reader:
+    """分段讀取的文字緩衝區"""
+
+    def __init__(self, file_obj: TextIO, read_size: int):
+        self.file_obj = file_obj
+        self.read_size = read_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        """再讀入一段（至少與目前未處理的長度相同，避免大型元素反覆重試）"""
+        if self.eof:
+            return False
+        rest = self.text[self.pos:]
+        data = self.file_obj.read(max(self.read_size, len(rest)))
+        if not data:
+            self.eof = True
+            return False
+        self.text = rest + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """略過空白後的下一個字元（檔尾回傳空字串）"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        """讀取指定的分隔字元"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON 格式錯誤：預期 {char!r}，實際為 {found or '檔尾'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """
+        解析下一個 JSON 值
+
+        解析失敗，或值之後不是分隔字元（如數字 "-2." 尚未讀完）時，再讀入一段後重試
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+                if self.eof or (end < len(self.text) and self.text[end] in _TERMINATORS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self.fill():
+                value, self.pos = self.decoder.raw_decode(self.text, self.pos)
+                return value
+
+
+class JSONArrayStream:
+    """
+    逐筆讀取 JSON 物件中的一個陣列欄位
+
+    開啟時讀到陣列開頭為止，header 為陣列之前的欄位；迭代逐筆產生陣列元素，
+    結束後 header 補上陣列之後的欄位。key 為 None 時整個檔案即為陣列。
+    """
+
+    def __init__(
+        self,
+        source: JSONSource,
+        key: Optional[str] = None,
+        read_size: int = DEFAULT_READ_SIZE
+    ):
+        self.key = key
+        self.header: Dict[str, Any] = {}
+        self._owns_file = isinstance(source, (str, os.PathLike))
+        self._file = open(source, encoding="utf-8-sig") if self._owns_file else source
+        self._reader = _Reader(self._file, read_size)
+        self._found = False
+        self._consumed = False
+        try:
+            self._seek_array()
+        except BaseException:
+            self.close()
+            raise
+
+    def _seek_array(self) -> None:
+        """讀取陣列之前的欄位，停在陣列的第一個元素"""
+        reader = self._reader
+        if self.key is None:
+            reader.expect("[")
+            self._found = True
+            return
+
+        reader.expect("{")
+        if reader.peek() == "}":
+            reader.pos += 1
+            return
+        while True:
+            name = reader.value()
+            reader.expect(":")
+            if name == self.key and reader.peek() == "[":
+                reader.pos += 1
+                self._found = True
+                return
+            self.header[name] = reader.value()
+            if not self._next_member():
+                return
+
+    def _next_member(self) -> bool:
+        """讀取物件成員之間的分隔字元，物件結束時回傳 False"""
+        reader = self._reader
+        if reader.peek() == ",":
+            reader.pos += 1
+            return True
+        reader.expect("}")
+        return False
+
+    @property
+    def found(self) -> bool:
+        """檔案中是否有指定的陣列欄位"""
+        return self._found
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._consumed:
+            raise RuntimeError("串流只能讀取一次")
+        self._consumed = True
+        if not self._found:
+            return
+        reader = self._reader
+        if reader.peek() == "]":
+            reader.pos += 1
+        else:
+            while True:
+                yield reader.value()
+                if reader.peek() == ",":
+                    reader.pos += 1
+                    continue
+                reader.expect("]")
+                break
+
+        # 陣列之後的欄位
+        if self.key is not None and self._next_member():
+            while True:
+                name = reader.value()
+                reader.expect(":")
+                self.header[name] = reader.value()
+                if not self._next_member():
+                    break
+
+    def close(self) -> None:
+        """關閉檔案（傳入的檔案物件由呼叫端關閉）"""
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "JSONArrayStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class JSONLinesStream:
+    """
+    逐行讀取 JSON Lines（介面同 JSONArrayStream）
+
+    第一行若為含 key 欄位的物件（如 {"law_name": ..., "articles": []}），
+    視為 header，其餘每行一筆；空白行略過。
+    """
+
+    def __init__(self, source: JSONSource, key: Optional[str] = None):
+        self.key = key
+        self.header: Dict[str, Any] = {}
+        self._owns_file = isinstance(source, (str, os.PathLike))
+        self._file = open(source, encoding="utf-8-sig") if self._owns_file else source
+        self._first: Any = _END
+        self._line_no = 0
+        try:
+            self._read_header()
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def found(self) -> bool:
+        return True
+
+    def _next_record(self) -> Any:
+        for line in self._file:
+            self._line_no += 1
+            if line.strip():
+                try:
+                    return json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"JSON Lines 第 {self._line_no} 行格式錯誤: {e}") from e
+        return _END
+
+    def _read_header(self) -> None:
+        first = self._next_record()
+        if self.key is not None and isinstance(first, dict) and self.key in first:
+            self.header = {name: value for name, value in first.items() if name != self.key}
+        else:
+            self._first = first
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._first is not _END:
+            first, self._first = self._first, _END
+            yield first
+        while True:
+            record = self._next_record()
+            if record is _END:
+                return
+            yield record
+
+    def close(self) -> None:
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "JSONLinesStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def is_json_lines(source: JSONSource) -> bool:
+    """依副檔名判斷是否為 JSON Lines"""
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    return str(name).lower().endswith(JSON_LINES_EXTENSIONS)
+
+
+def open_array_stream(
+    source: JSONSource,
+    key: Optional[str] = None,
+    read_size: int = DEFAULT_READ_SIZE
+) -> Union[JSONArrayStream, JSONLinesStream]:
+    """
+    依副檔名開啟 JSON 或 JSON Lines 串流
+
+    Args:
+        source: 檔案路徑或文字檔案物件
+        key: 陣列欄位名稱，如 "articles"、"chunks"（None 表示整個檔案即為陣列）
+        read_size: JSON 每次讀取的字元數
+    """
+    if is_json_lines(source):
+        return JSONLinesStream(source, key)
+    return JSONArrayStream(source, key, read_size)
+
+
+def iter_json_array(source: JSONSource, key: Optional[str] = None) -> Iterator[Any]:
+    """逐筆產生陣列元素（不需要其他欄位時使用）"""
+    with open_array_stream(source, key) as stream:
+        yield from stream
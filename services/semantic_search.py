@@ -0,0 +1,270 @@
+"""
+KM Document Management System - Semantic Search
+chunk 的向量嵌入與語意搜尋
+
+每個 chunk 的向量存放在 chunk_embeddings collection（_id 為 chunk_id，另記錄嵌入方式
+與 chunk 的內容雜湊）；sync_embeddings 只重新計算內容或嵌入方式有變更的 chunk。
+搜尋時將所有向量載入 VectorIndex（第一次搜尋時載入，之後的同步直接更新記憶體中的索引）。
+
+設定 ANN_INDEX_PATH 並以 build_ann_index 建立 IVF-PQ 索引後，搜尋改用該索引，
+不需將所有向量載入記憶體；sync_embeddings 會將變更的向量同步寫入索引。
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, ReplaceOne
+
+from config.settings import get_settings
+from db.connection import get_db_connection, MongoDBConnection
+from models.chunk import Chunk
+from services.document_service import batched
+from services.ann_index import IVFPQIndex
+from services.embedding import Embedder, chunk_text, get_embedder
+from services.vector_index import VectorIndex
+
+try:
+    import numpy as np
+except ImportError:  # 建立嵌入器時由 require_numpy 提示安裝
+    np = None
+
+# chunk_embeddings collection 的索引：(欄位, 索引名稱, 其他選項)
+EMBEDDING_INDEXES: List[Tuple[List[Tuple[str, int]], str, Dict[str, Any]]] = [
+    ([("model", ASCENDING)], "idx_embedding_model", {}),
+    ([("doc_id", ASCENDING)], "idx_embedding_doc_id", {}),
+]
+
+# 計算向量需要的 chunk 欄位
+_CHUNK_PROJECTION = {"_id": 0, "chunk_id": 1, "doc_id": 1, "title": 1, "summary": 1, "content": 1, "content_hash": 1}
+
+
+@dataclass
+class EmbeddingSyncResult:
+    """向量同步結果（chunk 數）"""
+    embedded: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+
+
+class SemanticSearchService:
+    """chunk 語意搜尋服務"""
+
+    def __init__(
+        self,
+        connection: Optional[MongoDBConnection] = None,
+        embedder: Optional[Embedder] = None,
+        ann_path: Optional[str] = None
+    ):
+        """
+        Args:
+            connection: 資料庫連線
+            embedder: 嵌入器（預設依 EMBEDDING_MODEL、EMBEDDING_DIM 建立）
+            ann_path: ANN 索引目錄（預設使用 ANN_INDEX_PATH，空字串表示不使用）
+        """
+        self.conn = connection or get_db_connection()
+        self.embedder = embedder or get_embedder()
+        self.ann_path = get_settings().ann_index_path if ann_path is None else ann_path
+        self._index: Optional[VectorIndex] = None
+        self._ann: Optional[IVFPQIndex] = None
+        self._ann_mismatch = False
+
+    @property
+    def collection(self):
+        """chunk_embeddings collection"""
+        return self.conn.chunk_embeddings
+
+    def ensure_indexes(self) -> None:
+        """建立 chunk_embeddings collection 的索引"""
+        for keys, name, options in EMBEDDING_INDEXES:
+            self.collection.create_index(keys, name=name, **options)
+
+    # ============================================================
+    # 向量同步
+    # ============================================================
+    def sync_embeddings(
+        self,
+        doc_id: Optional[str] = None,
+        force: bool = False,
+        batch_size: Optional[int] = None
+    ) -> EmbeddingSyncResult:
+        """
+        計算新增或變更的 chunk 的向量
+
+        以 chunk 的 content_hash 與嵌入方式比對已儲存的向量，只重新計算不同者；
+        chunks 中已不存在的 chunk 的向量一併刪除。索引已載入時同步更新。
+
+        Args:
+            doc_id: 只同步指定文件
+            force: 重新計算所有向量
+            batch_size: 每批計算與寫入的筆數（預設使用設定值）
+        """
+        batch_size = batch_size or get_settings().bulk_batch_size
+        scope = {"doc_id": doc_id} if doc_id else {}
+        model = self.embedder.name
+        stored = {} if force else {
+            data["_id"]: data.get("content_hash")
+            for data in self.collection.find(dict(scope, model=model), {"content_hash": 1})
+        }
+        result = EmbeddingSyncResult()
+        seen = set()
+
+        def changed_chunks() -> Iterable[Dict[str, Any]]:
+            for data in self.conn.chunks.find(scope, _CHUNK_PROJECTION):
+                seen.add(data["chunk_id"])
+                if stored.get(data["chunk_id"]) == data.get("content_hash"):
+                    result.unchanged += 1
+                    continue
+                yield data
+
+        for batch in batched(changed_chunks(), batch_size):
+            vectors = self.embedder.embed([chunk_text(data) for data in batch])
+            self.collection.bulk_write([
+                ReplaceOne({"_id": data["chunk_id"]}, {
+                    "_id": data["chunk_id"],
+                    "doc_id": data["doc_id"],
+                    "model": model,
+                    "content_hash": data.get("content_hash"),
+                    "vector": vector.tobytes(),
+                }, upsert=True)
+                for data, vector in zip(batch, vectors)
+            ], ordered=False)
+            for index in self._loaded_indexes():
+                index.add([data["chunk_id"] for data in batch], vectors)
+            result.embedded += len(batch)
+
+        # 以游標逐筆比對（distinct 的結果受 16 MB 文件大小限制），分批刪除
+        def removed_chunks() -> Iterable[str]:
+            for data in self.collection.find(scope, {"_id": 1}, batch_size=10000):
+                if data["_id"] not in seen:
+                    yield data["_id"]
+
+        for batch in batched(removed_chunks(), batch_size):
+            result.deleted += self.collection.delete_many({"_id": {"$in": batch}}).deleted_count
+            for index in self._loaded_indexes():
+                index.remove(batch)
+        return result
+
+    # ============================================================
+    # 索引
+    # ============================================================
+    def _loaded_indexes(self) -> List[Any]:
+        """同步向量時需一併更新的索引（ANN 索引存在時一律更新，避免與資料庫不一致）"""
+        indexes: List[Any] = [self._index] if self._index is not None else []
+        ann = self.ann_index()
+        if ann is not None:
+            indexes.append(ann)
+        return indexes
+
+    def ann_index(self) -> Optional[IVFPQIndex]:
+        """已建立的 ANN 索引（未設定目錄、尚未建立或嵌入方式不同時回傳 None）"""
+        if self._ann is None and not self._ann_mismatch and self.ann_path and IVFPQIndex.exists(self.ann_path):
+            settings = get_settings()
+            ann = IVFPQIndex(self.ann_path, nprobe=settings.ann_nprobe, rerank=settings.ann_rerank)
+            if ann.model != self.embedder.name:
+                print(f"! ANN 索引的嵌入方式（{ann.model}）與目前設定（{self.embedder.name}）不同，改用暴力搜尋")
+                self._ann_mismatch = True
+                return None
+            self._ann = ann
+        return self._ann
+
+    def build_ann_index(
+        self,
+        nlist: Optional[int] = None,
+        subquantizers: Optional[int] = None,
+        store_vectors: bool = True
+    ) -> IVFPQIndex:
+        """
+        以 chunk_embeddings 的所有向量建立（或重新訓練）ANN 索引
+
+        Args:
+            nlist: 分群數（預設為向量數的平方根）
+            subquantizers: PQ 段數（預設每段 8 維）
+            store_vectors: 是否儲存原始向量供 rerank
+        """
+        if not self.ann_path:
+            raise ValueError("請設定 ANN_INDEX_PATH（ANN 索引目錄）")
+        vectors = self._index if self._index is not None else self.load_index()
+        settings = get_settings()
+        self._ann = IVFPQIndex.build(
+            self.ann_path, vectors.ids, vectors.vectors,
+            model=self.embedder.name,
+            nlist=nlist,
+            subquantizers=subquantizers,
+            store_vectors=store_vectors,
+            nprobe=settings.ann_nprobe,
+            rerank=settings.ann_rerank
+        )
+        # 改用 ANN 索引後不再需要記憶體中的所有向量
+        self._index = None
+        self._ann_mismatch = False
+        return self._ann
+
+    @property
+    def index(self) -> Any:
+        """搜尋使用的索引：已建立 ANN 索引時使用之，否則為記憶體中的向量索引（第一次使用時載入）"""
+        ann = self.ann_index()
+        if ann is not None:
+            return ann
+        if self._index is None:
+            self._index = self.load_index()
+        return self._index
+
+    def load_index(self) -> VectorIndex:
+        """從 chunk_embeddings 載入目前嵌入方式的所有向量"""
+        dim = self.embedder.dim
+        ids: List[str] = []
+        buffers: List[bytes] = []
+        for data in self.collection.find({"model": self.embedder.name}, {"vector": 1}, batch_size=10000):
+            if len(data["vector"]) == dim * 4:
+                ids.append(data["_id"])
+                buffers.append(data["vector"])
+        index = VectorIndex(dim, capacity=len(ids))
+        if ids:
+            index.add(ids, np.frombuffer(b"".join(buffers), dtype=np.float32).reshape(-1, dim))
+        return index
+
+    def refresh(self) -> None:
+        """捨棄已載入的索引，下次搜尋時重新載入（其他行程同步向量後使用）"""
+        self._index = None
+        self._ann = None
+        self._ann_mismatch = False
+
+    # ============================================================
+    # 搜尋
+    # ============================================================
+    def _rows(self, doc_id: Optional[str]) -> Optional["np.ndarray"]:
+        """限定文件時的候選列"""
+        if not doc_id:
+            return None
+        return self.index.rows_for(self.conn.chunks.distinct("chunk_id", {"doc_id": doc_id}))
+
+    def _hydrate(self, hits: List[Tuple[str, float]]) -> List[Tuple[Chunk, float]]:
+        """將 (chunk_id, 分數) 轉為 (Chunk, 分數)，維持分數順序"""
+        found = {
+            data["chunk_id"]: Chunk.from_dict(data)
+            for data in self.conn.chunks.find({"chunk_id": {"$in": [chunk_id for chunk_id, _ in hits]}})
+        }
+        return [(found[chunk_id], score) for chunk_id, score in hits if chunk_id in found]
+
+    def search(self, query: str, k: int = 10, doc_id: Optional[str] = None) -> List[Tuple[Chunk, float]]:
+        """
+        語意搜尋
+
+        Args:
+            query: 查詢文字
+            k: 結果數
+            doc_id: 只搜尋指定文件
+
+        Returns:
+            List[Tuple[Chunk, float]]: chunk 與 cosine 相似度（由高到低）
+        """
+        return self.search_many([query], k, doc_id)[0]
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        k: int = 10,
+        doc_id: Optional[str] = None
+    ) -> List[List[Tuple[Chunk, float]]]:
+        """多個查詢一起搜尋（一次矩陣乘法計算所有查詢的分數）"""
+        vectors = self.embedder.embed(list(queries))
+        return [self._hydrate(hits) for hits in self.index.search_batch(vectors, k, self._rows(doc_id))]
@@ -0,0 +1,259 @@
+"""
+KM Document Management System - Statistics
+統計計數器（stats collection）與重建用的 aggregation pipeline
+
+每次寫入文件時以 $inc 更新單一計數器文件，讀取統計只需一次 find_one；
+計數器與實際資料不一致時可用 rebuild 以 pipeline 重新計算。
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from models.document import Document, Version, VersionLayout
+from services.file_store import StoredFile
+
+# 計數器文件 _id
+STATS_ID = "global"
+
+# 依欄位值分組的計數器
+GROUPED_COUNTERS = ("by_department", "by_category", "by_status", "by_file_type")
+
+# 各文件的版本數：split 版面的 versions 只有最新版本，版本數即 current_version
+_VERSION_COUNT = {
+    "$cond": [
+        {"$eq": ["$version_layout", VersionLayout.SPLIT.value]},
+        "$current_version",
+        {"$size": {"$ifNull": ["$versions", []]}}
+    ]
+}
+
+
+def all_versions_stages(versions_collection: str) -> List[Dict[str, Any]]:
+    """
+    展開所有版本的 pipeline 前段（在 documents 上執行）
+
+    內嵌版面取自 versions 陣列，split 版面取自 versions collection
+    """
+    return [
+        {"$match": {"version_layout": {"$ne": VersionLayout.SPLIT.value}}},
+        {"$unwind": "$versions"},
+        {"$replaceRoot": {"newRoot": "$versions"}},
+        {"$unionWith": versions_collection}
+    ]
+
+
+def statistics_pipeline() -> List[Dict[str, Any]]:
+    """
+    文件層級統計 pipeline：以 $facet 在伺服器端完成所有計數（重建計數器用）
+
+    每個 facet 只回傳分組後的結果，不會把每份文件的欄位收集成陣列
+    """
+    return [
+        {
+            "$facet": {
+                "totals": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "total_documents": {"$sum": 1},
+                            "total_versions": {"$sum": _VERSION_COUNT}
+                        }
+                    }
+                ],
+                "by_department": [{"$sortByCount": "$department"}],
+                "by_category": [{"$sortByCount": "$category"}],
+                "by_status": [{"$sortByCount": "$status"}]
+            }
+        }
+    ]
+
+
+def version_statistics_pipeline(versions_collection: str) -> List[Dict[str, Any]]:
+    """版本層級統計 pipeline（檔案大小與類型，重建計數器用）"""
+    return all_versions_stages(versions_collection) + [
+        {
+            "$facet": {
+                "totals": [{"$group": {"_id": None, "total_bytes": {"$sum": "$file_size"}}}],
+                "by_file_type": [{"$sortByCount": "$file_type"}],
+                # 沒有內容雜湊的舊版本不在 blobs 中，各自佔用儲存空間
+                "legacy_bytes": [
+                    {"$match": {"content_hash": {"$in": [None, ""]}}},
+                    {"$group": {"_id": None, "count": {"$sum": "$file_size"}}}
+                ]
+            }
+        }
+    ]
+
+
+# 進階統計：各部門版本數（文件層級）
+DETAILED_PIPELINE = [
+    {
+        "$facet": {
+            "versions_by_department": [
+                {"$group": {"_id": "$department", "count": {"$sum": _VERSION_COUNT}}},
+                {"$sort": {"count": -1}}
+            ]
+        }
+    }
+]
+
+
+def detailed_version_pipeline(versions_collection: str) -> List[Dict[str, Any]]:
+    """進階統計：各檔案類型容量、每日上傳數（版本層級，依需要即時計算）"""
+    return all_versions_stages(versions_collection) + [
+        {
+            "$facet": {
+                "bytes_by_file_type": [
+                    {"$group": {"_id": "$file_type", "count": {"$sum": "$file_size"}}},
+                    {"$sort": {"count": -1}}
+                ],
+                "uploads_by_day": [
+                    {
+                        "$group": {
+                            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$uploaded_at"}},
+                            "count": {"$sum": 1}
+                        }
+                    },
+                    {"$sort": {"_id": 1}}
+                ]
+            }
+        }
+    ]
+
+
+def facet_counts(facets: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[Any, int]]:
+    """將 $facet 結果的 [{_id, count}] 轉為 {值: 數量}"""
+    return {
+        name: {row["_id"]: row["count"] for row in rows}
+        for name, rows in facets.items()
+    }
+
+
+def _key(value: Any) -> str:
+    """分組值轉為欄位名稱（. 與 $ 在 $inc 路徑中有特殊意義）"""
+    return str(value).replace(".", "．").replace("$", "＄")
+
+
+def _value(key: str) -> str:
+    return key.replace("．", ".").replace("＄", "$")
+
+
+def counters_from_pipeline(
+    results: List[Dict[str, Any]],
+    version_results: List[Dict[str, Any]],
+    blob_bytes: int
+) -> Dict[str, Any]:
+    """
+    由統計 pipeline 結果組出計數器文件
+
+    Args:
+        results: statistics_pipeline 的 aggregate 結果
+        version_results: version_statistics_pipeline 的 aggregate 結果
+        blob_bytes: blobs 中實際儲存的容量
+    """
+    facets = dict(results[0]) if results else {}
+    version_facets = dict(version_results[0]) if version_results else {}
+    totals = (facets.pop("totals", None) or [{}])[0]
+    version_totals = (version_facets.pop("totals", None) or [{}])[0]
+    legacy = (version_facets.pop("legacy_bytes", None) or [{}])[0]
+    facets.update(version_facets)
+
+    stats: Dict[str, Any] = {
+        "_id": STATS_ID,
+        "total_documents": totals.get("total_documents", 0),
+        "total_versions": totals.get("total_versions", 0),
+        "total_bytes": version_totals.get("total_bytes", 0),
+        "stored_bytes": blob_bytes + legacy.get("count", 0),
+        "updated_at": datetime.now()
+    }
+    for name in GROUPED_COUNTERS:
+        stats[name] = {_key(row["_id"]): row["count"] for row in facets.get(name, [])}
+    return stats
+
+
+def summarize_counters(stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """將計數器文件整理為 get_statistics 的回傳格式"""
+    stats = stats or {}
+    total_bytes = stats.get("total_bytes", 0)
+    stored_bytes = stats.get("stored_bytes", 0)
+
+    summary: Dict[str, Any] = {
+        "total_documents": stats.get("total_documents", 0),
+        "total_versions": stats.get("total_versions", 0),
+        "total_bytes": total_bytes,
+        "stored_bytes": stored_bytes,
+        "bytes_saved": max(total_bytes - stored_bytes, 0)
+    }
+    for name in GROUPED_COUNTERS:
+        counts = {_value(key): count for key, count in (stats.get(name) or {}).items() if count > 0}
+        summary[name] = dict(sorted(counts.items(), key=lambda item: -item[1]))
+    return summary
+
+
+# ------------------------------------------------------------
+# 計數器增量
+# ------------------------------------------------------------
+def version_counters(version: Version, sign: int = 1) -> Dict[str, int]:
+    """新增（sign=1）或移除（sign=-1）一個版本的計數器增量"""
+    return {
+        "total_versions": sign,
+        "total_bytes": sign * version.file_size,
+        f"by_file_type.{_key(version.file_type)}": sign
+    }
+
+
+def document_counters(doc: Document, sign: int = 1) -> Dict[str, int]:
+    """新增（sign=1）或刪除（sign=-1）一份文件（含所有版本）的計數器增量"""
+    counters = {
+        "total_documents": sign,
+        f"by_department.{_key(doc.department)}": sign,
+        f"by_category.{_key(doc.category)}": sign,
+        f"by_status.{_key(doc.status)}": sign
+    }
+    for version in doc.versions:
+        merge_counters(counters, version_counters(version, sign))
+    return counters
+
+
+def stored_counters(stored: StoredFile) -> Dict[str, int]:
+    """新寫入的內容增加實際儲存量（去重沿用既有檔案則不增加）"""
+    if stored.deduplicated:
+        return {}
+    return {"stored_bytes": stored.bytes_stored}
+
+
+def released_counters(version: Version, deleted: bool) -> Dict[str, int]:
+    """釋放版本檔案後，GridFS 檔案已刪除則減少實際儲存量"""
+    return {"stored_bytes": -(version.stored_size or version.file_size)} if deleted else {}
+
+
+def released_files_counters(versions: Iterable[Version], deleted_file_ids: Set[Any]) -> Dict[str, int]:
+    """批次釋放後，每個已刪除的 GridFS 檔案減少一次實際儲存量（去重的版本共用同一檔案）"""
+    counters: Dict[str, int] = {}
+    seen = set()
+    for version in versions:
+        if version.file_id in deleted_file_ids and version.file_id not in seen:
+            seen.add(version.file_id)
+            merge_counters(counters, released_counters(version, True))
+    return counters
+
+
+def status_counters(old_status: Optional[str], new_status: str, count: int = 1) -> Dict[str, int]:
+    """狀態變更的計數器增量（count 為變更的文件數）"""
+    if not old_status or old_status == new_status:
+        return {}
+    return {f"by_status.{_key(old_status)}": -count, f"by_status.{_key(new_status)}": count}
+
+
+def merge_counters(target: Dict[str, int], counters: Dict[str, int]) -> Dict[str, int]:
+    """累加計數器增量"""
+    for key, amount in counters.items():
+        target[key] = target.get(key, 0) + amount
+    return target
+
+
+def stats_update(counters: Dict[str, int]) -> Dict[str, Any]:
+    """計數器文件的 $inc 更新指令"""
+    return {
+        "$inc": {key: amount for key, amount in counters.items() if amount},
+        "$set": {"updated_at": datetime.now()}
+    }
@@ -0,0 +1,74 @@
+"""
+KM Document Management System - Text Search
+中文標題斷詞與全文檢索條件
+
+MongoDB 全文索引以空白與標點斷詞，連續的中文字會被視為一個詞而無法部分比對，
+因此寫入時另存 search_tokens（中文單字 + 二字詞、英數字小寫單字），
+全文索引建立在 search_tokens 上並停用語言處理（default_language: none）。
+"""
+import re
+from typing import Any, Dict, List
+
+# 全文索引名稱與欄位
+TEXT_INDEX_NAME = "idx_search_text"
+TOKENS_FIELD = "search_tokens"
+
+_TOKEN_RE = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+")
+_CJK_RE = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+
+def _runs(text: str) -> List[str]:
+    """切出連續的中文字段與英數字單字"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _bigrams(run: str) -> List[str]:
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    產生寫入用的索引詞（不重複，保留順序）
+
+    中文字段產生單字與二字詞，英數字以單字為單位
+    """
+    tokens: Dict[str, None] = {}
+    for run in _runs(text or ""):
+        if _CJK_RE.match(run):
+            tokens.update(dict.fromkeys(run))
+            tokens.update(dict.fromkeys(_bigrams(run)))
+        else:
+            tokens[run] = None
+    return list(tokens)
+
+
+def query_terms(keyword: str) -> List[str]:
+    """
+    產生查詢用的詞（中文字段取二字詞，單一中文字則取單字）
+    """
+    terms: Dict[str, None] = {}
+    for run in _runs(keyword or ""):
+        if _CJK_RE.match(run) and len(run) > 1:
+            terms.update(dict.fromkeys(_bigrams(run)))
+        else:
+            terms[run] = None
+    return list(terms)
+
+
+def text_query(keyword: str, match_all: bool = True) -> Dict[str, Any]:
+    """
+    組出 $text 條件；沒有可查詢的詞時回傳空字典
+
+    Args:
+        keyword: 使用者輸入的關鍵字
+        match_all: True 時每個詞都必須出現（近似子字串比對），
+            False 時任一詞出現即可（依相關度排序用）
+    """
+    terms = query_terms(keyword)
+    if not terms:
+        return {}
+    if match_all:
+        search = " ".join(f'"{term}"' for term in terms)
+    else:
+        search = " ".join(terms)
+    return {"$text": {"$search": search}}
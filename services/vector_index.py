@@ -0,0 +1,194 @@
+"""
+KM Document Management System - Vector Index
+chunk 向量的精確（暴力）最近鄰搜尋
+
+所有向量存放在一個連續的 float32 矩陣（每列一個單位向量），cosine 相似度即內積：
+一次查詢或一批查詢都只需一次矩陣乘法，再以 argpartition 取前 k 名。
+新增時依倍數擴充容量，刪除時以最後一列填補空位，矩陣始終保持連續。
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.embedding import normalize_rows, require_numpy
+
+try:
+    import numpy as np
+except ImportError:  # 建立索引時由 require_numpy 提示安裝
+    np = None
+
+# 搜尋結果：(id, 相似度)
+SearchHit = Tuple[str, float]
+
+# 每批查詢的分數矩陣上限（元素數），避免大量查詢時 (查詢數, 向量數) 的矩陣過大
+MAX_SCORE_ELEMENTS = 64 * 1024 * 1024
+
+
+def top_k(scores: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    每一列分數最高的 k 個位置（依分數由高到低）
+
+    Returns:
+        (位置, 分數)，形狀皆為 (列數, min(k, 欄數))
+    """
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(candidates, order, axis=1),
+        np.take_along_axis(candidate_scores, order, axis=1),
+    )
+
+
+def unique_last(ids: Sequence[str], vectors: "np.ndarray") -> Tuple[Sequence[str], "np.ndarray"]:
+    """同一批中重複的 id 只保留最後一個向量（其餘維持原本順序）"""
+    last = {item_id: i for i, item_id in enumerate(ids)}
+    if len(last) == len(ids):
+        return ids, vectors
+    positions = sorted(last.values())
+    return [ids[i] for i in positions], vectors[positions]
+
+
+class VectorIndex:
+    """
+    id 對應向量的記憶體索引
+
+    vectors 為 (len, dim) 的連續矩陣；同一 id 再次加入時覆寫原本的向量。
+    """
+
+    def __init__(self, dim: int, capacity: int = 0):
+        require_numpy()
+        self.dim = dim
+        self._matrix = np.empty((capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    @property
+    def ids(self) -> List[str]:
+        """每一列的 id"""
+        return self._ids
+
+    @property
+    def vectors(self) -> "np.ndarray":
+        """目前所有向量（矩陣的 view，不複製）"""
+        return self._matrix[:len(self._ids)]
+
+    @property
+    def nbytes(self) -> int:
+        """向量矩陣佔用的記憶體（含預留容量）"""
+        return self._matrix.nbytes
+
+    def _reserve(self, size: int) -> None:
+        if size <= len(self._matrix):
+            return
+        matrix = np.empty((max(size, len(self._matrix) * 2, 1024), self.dim), dtype=np.float32)
+        matrix[:len(self._ids)] = self.vectors
+        self._matrix = matrix
+
+    def add(self, ids: Sequence[str], vectors: "np.ndarray") -> None:
+        """
+        加入或更新向量（會正規化為單位向量）
+
+        同一批中重複的 id 以最後一個向量為準。
+
+        Args:
+            ids: 每個向量的 id
+            vectors: (len(ids), dim) 矩陣
+        """
+        vectors = normalize_rows(np.asarray(vectors).reshape(-1, self.dim))
+        if len(vectors) != len(ids):
+            raise ValueError(f"id 數量 ({len(ids)}) 與向量數量 ({len(vectors)}) 不符")
+        ids, vectors = unique_last(ids, vectors)
+        new_rows = []
+        for i, item_id in enumerate(ids):
+            row = self._rows.get(item_id)
+            if row is None:
+                new_rows.append(i)
+            else:
+                self._matrix[row] = vectors[i]
+        if not new_rows:
+            return
+        start = len(self._ids)
+        self._reserve(start + len(new_rows))
+        self._matrix[start:start + len(new_rows)] = vectors[new_rows]
+        for offset, i in enumerate(new_rows):
+            self._rows[ids[i]] = start + offset
+            self._ids.append(ids[i])
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """刪除向量（以最後一列填補空位），回傳刪除筆數"""
+        removed = 0
+        for item_id in ids:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                continue
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+            removed += 1
+        return removed
+
+    def rows_for(self, ids: Iterable[str]) -> "np.ndarray":
+        """id 對應的列（不在索引中的 id 略過）"""
+        rows = [self._rows[item_id] for item_id in ids if item_id in self._rows]
+        return np.array(rows, dtype=np.int64)
+
+    def search(
+        self,
+        query: "np.ndarray",
+        k: int = 10,
+        rows: Optional["np.ndarray"] = None
+    ) -> List[SearchHit]:
+        """
+        cosine 相似度最高的 k 個向量
+
+        Args:
+            query: (dim,) 查詢向量
+            k: 結果數
+            rows: 只在這些列中搜尋（如限定文件），None 表示全部
+        """
+        return self.search_batch(np.asarray(query).reshape(1, self.dim), k, rows)[0]
+
+    def search_batch(
+        self,
+        queries: "np.ndarray",
+        k: int = 10,
+        rows: Optional["np.ndarray"] = None
+    ) -> List[List[SearchHit]]:
+        """
+        多個查詢一起計算：每批以一次矩陣乘法取得所有分數
+
+        Args:
+            queries: (查詢數, dim) 矩陣
+            k: 每個查詢的結果數
+            rows: 只在這些列中搜尋，None 表示全部
+        """
+        queries = normalize_rows(np.asarray(queries).reshape(-1, self.dim))
+        matrix = self.vectors if rows is None else self.vectors[rows]
+        if len(matrix) == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        results: List[List[SearchHit]] = []
+        step = max(1, MAX_SCORE_ELEMENTS // len(matrix))
+        for start in range(0, len(queries), step):
+            scores = queries[start:start + step] @ matrix.T
+            positions, values = top_k(scores, k)
+            if rows is not None:
+                positions = rows[positions]
+            results.extend(
+                [(self._ids[position], float(score)) for position, score in zip(row_positions, row_scores)]
+                for row_positions, row_scores in zip(positions.tolist(), values.tolist())
+            )
+        return results
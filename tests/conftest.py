@@ -0,0 +1,82 @@
+"""
+測試共用 fixture
+
+需要 MongoDB 的測試在連不到 mongod 時略過（連線設定同 .env / MONGO_* 環境變數）；
+每個測試使用獨立的暫時資料庫，結束後刪除。
+"""
+import dataclasses
+import uuid
+from typing import Callable, Iterator, List, Optional
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from config.settings import get_settings, Settings
+from db.connection import MongoDBConnection
+from services.text_search import TEXT_INDEX_NAME, TOKENS_FIELD
+
+
+def create_document_indexes(conn: MongoDBConnection) -> None:
+    """建立搜尋會用到的 documents / versions 索引（同 scripts/init_db.py）"""
+    conn.documents.create_index("doc_code", unique=True, name="idx_doc_code")
+    conn.documents.create_index([(TOKENS_FIELD, "text")], name=TEXT_INDEX_NAME, default_language="none")
+    conn.documents.create_index("metadata.keywords", name="idx_keywords")
+    conn.documents.create_index([("updated_at", -1), ("_id", -1)], name="idx_updated_id")
+    conn.versions.create_index([("doc_code", 1), ("version", 1)], unique=True, name="idx_doc_code_version")
+
+
+@pytest.fixture(scope="session")
+def mongo_settings() -> Settings:
+    """可連線的 MongoDB 設定；連不到 mongod 時略過測試"""
+    settings = dataclasses.replace(
+        get_settings(), mongo_server_selection_timeout_ms=1000, mongo_min_pool_size=0
+    )
+    client = MongoClient(settings.connection_string, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("無法連線到 MongoDB，略過需要 mongod 的測試")
+    finally:
+        client.close()
+    return settings
+
+
+@pytest.fixture
+def make_settings(mongo_settings: Settings) -> Iterator[Callable[[], Settings]]:
+    """建立使用暫時資料庫的設定（可呼叫多次），測試結束後刪除這些資料庫"""
+    names: List[str] = []
+
+    def make() -> Settings:
+        names.append(f"km_test_{uuid.uuid4().hex[:12]}")
+        return dataclasses.replace(mongo_settings, database_name=names[-1])
+
+    yield make
+    client = MongoClient(mongo_settings.connection_string, serverSelectionTimeoutMS=1000)
+    try:
+        for name in names:
+            client.drop_database(name)
+    finally:
+        client.close()
+
+
+@pytest.fixture
+def make_connection(make_settings: Callable[[], Settings]) -> Iterator[Callable[..., MongoDBConnection]]:
+    """建立暫時資料庫的連線並建立 documents 索引（可指定 make_settings 建立的設定）"""
+    connections: List[MongoDBConnection] = []
+
+    def make(settings: Optional[Settings] = None) -> MongoDBConnection:
+        conn = MongoDBConnection(settings or make_settings(), name=f"test-{len(connections)}")
+        create_document_indexes(conn)
+        connections.append(conn)
+        return conn
+
+    yield make
+    for conn in connections:
+        conn.close()
+
+
+@pytest.fixture
+def db_conn(make_connection: Callable[..., MongoDBConnection]) -> MongoDBConnection:
+    """暫時資料庫的連線（已建立 documents 索引）"""
+    return make_connection()
@@ -0,0 +1,145 @@
+"""
+IVFPQIndex：召回率、更新後重新開啟、中斷寫入的截斷與限定列搜尋
+"""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.ann_index import IVFPQIndex  # noqa: E402
+from services.vector_index import VectorIndex  # noqa: E402
+
+DIM = 32
+
+
+def clustered_vectors(count: int, clusters: int = 24, seed: int = 11) -> "np.ndarray":
+    """分群的測試向量（IVF 分群後召回率才有意義）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIM))
+    labels = rng.integers(0, clusters, count)
+    return (centers[labels] + 0.35 * rng.standard_normal((count, DIM))).astype(np.float32)
+
+
+@pytest.fixture
+def data():
+    vectors = clustered_vectors(3000)
+    return [f"c{i}" for i in range(len(vectors))], vectors
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "ann")
+
+
+def exact_index(ids, vectors) -> VectorIndex:
+    index = VectorIndex(DIM)
+    index.add(ids, vectors)
+    return index
+
+
+def recall(approx, exact) -> float:
+    found = sum(len({i for i, _ in a} & {i for i, _ in e}) for a, e in zip(approx, exact))
+    return found / sum(len(e) for e in exact)
+
+
+def test_build_recall_against_exact_search(data, index_path):
+    ids, vectors = data
+    index = IVFPQIndex.build(index_path, ids, vectors, model="hashing-32-13", nprobe=8, rerank=16)
+    assert IVFPQIndex.exists(index_path)
+    assert not os.path.exists(index_path + ".building")
+    assert len(index) == len(ids) and index.model == "hashing-32-13"
+    assert index.meta["subquantizers"] == DIM // 8
+
+    queries = clustered_vectors(50, seed=12)
+    exact = exact_index(ids, vectors).search_batch(queries, k=10)
+    assert recall(index.search_batch(queries, k=10), exact) >= 0.9
+    # 只用 PQ 分數時仍大致正確
+    pq_only = IVFPQIndex(index_path, nprobe=8, rerank=0)
+    assert recall(pq_only.search_batch(queries, k=10), exact) >= 0.4
+    # 以原始向量 rerank 的分數為精確 cosine
+    hits = index.search(vectors[7], k=1)
+    assert hits[0][0] == "c7" and hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_build_rejects_bad_parameters(data, index_path):
+    ids, vectors = data
+    with pytest.raises(ValueError):
+        IVFPQIndex.build(index_path, [], np.empty((0, DIM), dtype=np.float32))
+    with pytest.raises(ValueError):
+        IVFPQIndex.build(index_path, ids, vectors, subquantizers=5)
+
+
+def test_add_remove_and_reopen(data, index_path):
+    ids, vectors = data
+    index = IVFPQIndex.build(index_path, ids[:2000], vectors[:2000])
+    index.add(ids[2000:], vectors[2000:])
+    updated = clustered_vectors(1, seed=99)
+    index.add(["c5"], updated)
+    assert index.remove(["c10", "c11", "missing"]) == 2
+
+    reopened = IVFPQIndex(index_path)
+    assert len(reopened) == len(ids) - 2
+    assert len(reopened.ids) == len(ids) + 1
+    assert reopened.removed_count == 3
+    assert "c10" not in reopened and "c2999" in reopened
+    assert reopened.search(updated[0], k=1)[0][0] == "c5"
+    assert np.allclose(reopened.vectors[reopened.rows_for(["c5"])[0]], updated[0] / np.linalg.norm(updated[0]))
+    assert "c10" not in {item_id for item_id, _ in reopened.search(vectors[10], k=20)}
+
+
+def test_add_duplicate_ids_in_one_batch_keeps_last(data, index_path):
+    ids, vectors = data
+    index = IVFPQIndex.build(index_path, ids[:500], vectors[:500])
+    first, last = clustered_vectors(2, seed=21)
+    index.add(["new", "c1", "new"], np.stack([first, vectors[2], last]))
+    assert len(index.ids) == 502
+    assert len(index) == 501
+
+    reopened = IVFPQIndex(index_path)
+    assert reopened.ids.count("new") == 1
+    row = reopened.rows_for(["new"])[0]
+    assert np.allclose(reopened.vectors[row], last / np.linalg.norm(last))
+    assert reopened.search(last, k=1)[0][0] == "new"
+
+
+def test_interrupted_append_is_truncated(data, index_path):
+    ids, vectors = data
+    IVFPQIndex.build(index_path, ids[:1000], vectors[:1000])
+    row_bytes = {"codes.u8": DIM // 8, "lists.i32": 4, "removed.u8": 1, "vectors.f32": DIM * 4}
+    # 中斷的寫入：其他檔案已附加，ids.txt 尚未寫入
+    for name, size in row_bytes.items():
+        with open(os.path.join(index_path, name), "ab") as f:
+            f.write(b"\xff" * size * 3)
+
+    index = IVFPQIndex(index_path)
+    assert len(index) == 1000
+    assert index.search(vectors[3], k=1)[0][0] == "c3"
+
+    index.add(ids[1000:1010], vectors[1000:1010])
+    for name, size in row_bytes.items():
+        assert os.path.getsize(os.path.join(index_path, name)) == 1010 * size
+    reopened = IVFPQIndex(index_path)
+    assert len(reopened) == 1010 and reopened.removed_count == 0
+    for i in (1000, 1009):
+        assert reopened.search(vectors[i], k=1)[0][0] == f"c{i}"
+
+
+@pytest.mark.parametrize("store_vectors", [True, False])
+def test_search_restricted_rows(data, index_path, store_vectors):
+    ids, vectors = data
+    index = IVFPQIndex.build(index_path, ids, vectors, store_vectors=store_vectors)
+    allowed = ids[::7]
+    index.remove(allowed[:3])
+    rows = index.rows_for(allowed)
+    assert len(rows) == len(allowed) - 3
+
+    hits = index.search(vectors[0], k=5, rows=rows)
+    assert len(hits) == 5
+    assert {item_id for item_id, _ in hits} <= set(allowed[3:])
+    if store_vectors:
+        # 儲存原始向量時限定列的分數為精確值
+        exact = exact_index(allowed[3:], vectors[::7][3:]).search(vectors[0], k=5)
+        assert [item_id for item_id, _ in hits] == [item_id for item_id, _ in exact]
+        assert [score for _, score in hits] == pytest.approx([score for _, score in exact], abs=1e-5)
+    assert index.search(vectors[0], k=5, rows=index.rows_for([])) == []
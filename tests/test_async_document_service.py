@@ -0,0 +1,186 @@
+"""
+AsyncDocumentService 與 DocumentService 行為一致性測試（需要 mongod）
+
+同一組操作分別以同步與非同步服務在兩個暫時資料庫執行，比對每一步的結果與最後的統計
+"""
+import asyncio
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from db.async_connection import AsyncMongoDBConnection
+from models.document import Document
+from services.async_document_service import AsyncDocumentService
+from services.cache import DocumentCache
+from services.document_service import DocumentService
+
+# 統計中與寫入時間有關、不需比對的欄位
+_VOLATILE_STATS = ("updated_at",)
+
+
+def summarize(doc: Optional[Document]) -> Optional[Dict[str, Any]]:
+    """比對用的文件內容（略過 _id、時間與 GridFS 檔案 ID）"""
+    if doc is None:
+        return None
+    return {
+        "doc_code": doc.doc_code,
+        "title": doc.title,
+        "status": doc.status,
+        "current_version": doc.current_version,
+        "versions": [
+            (v.version, v.file_name, v.file_size, v.content_hash, v.compression, v.stored_size)
+            for v in doc.versions
+        ],
+    }
+
+
+def clean_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in stats.items() if key not in _VOLATILE_STATS}
+
+
+@pytest.fixture
+def files(tmp_path: Path) -> Dict[str, Path]:
+    """測試檔案：兩版文字檔（第二版以差異儲存）與一個二進位檔"""
+    rng = random.Random(7)
+    lines = [f"第{i}條 員工每日工作時間不得超過八小時，編號 {rng.getrandbits(32):08x}\n" for i in range(800)]
+    v1 = tmp_path / "rules.txt"
+    v1.write_text("".join(lines), encoding="utf-8")
+    lines[100] = "第100條 修訂：延長工時應經勞資會議同意\n"
+    lines.append("附則 本辦法自公布日施行\n")
+    v2 = tmp_path / "rules_v2.txt"
+    v2.write_text("".join(lines), encoding="utf-8")
+    binary = tmp_path / "scan.pdf"
+    binary.write_bytes(bytes(rng.getrandbits(8) for _ in range(300_000)))
+    return {"v1": v1, "v2": v2, "binary": binary}
+
+
+def run_sync(service: DocumentService, files: Dict[str, Path]) -> List[Any]:
+    steps: List[Any] = []
+    steps.append(summarize(service.upload_document(
+        str(files["v1"]), "HR-001", "員工工作規則", "人資部", "規章", "tester", metadata={"keywords": ["工時"]}
+    )))
+    steps.append(summarize(service.upload_document(str(files["binary"]), "IT-001", "掃描檔", "資訊部", "SOP", "tester")))
+    steps.append(summarize(service.upload_document(str(files["binary"]), "IT-002", "掃描檔副本", "資訊部", "SOP", "tester")))
+    steps.append(summarize(service.upload_new_version("HR-001", str(files["v2"]), "tester", "修訂第100條")))
+    steps.append(sorted(doc.doc_code for doc in service.search(keyword="工作規則")))
+    steps.append(sorted(doc.doc_code for doc in service.search(keyword="工時")))
+    steps.append(sorted(doc.doc_code for doc in service.search(keyword="it-")))
+    steps.append(b"".join(service.iter_download("HR-001", 1, offset=10)))
+    steps.append(b"".join(service.iter_download("HR-001", 2, offset=1000, length=5000)))
+    steps.append(b"".join(service.iter_download("IT-001", offset=200_000, length=70_000)))
+    steps.append(clean_stats(service.get_statistics()))
+    steps.append(summarize(service.archive_document("HR-001")))
+    steps.append(sorted(doc.doc_code for doc in service.search(department="人資部")))
+    steps.append(summarize(service.restore_document("HR-001")))
+    steps.append(service.delete_document("IT-001"))
+    steps.append(service.delete_document("HR-001"))
+    steps.append(summarize(service.get_by_doc_code("HR-001")))
+    steps.append(clean_stats(service.get_statistics()))
+    steps.append(clean_stats(service.rebuild_statistics()))
+    return steps
+
+
+async def run_async(service: AsyncDocumentService, files: Dict[str, Path]) -> List[Any]:
+    async def download(*args: Any, **kwargs: Any) -> bytes:
+        return b"".join([data async for data in service.iter_download(*args, **kwargs)])
+
+    steps: List[Any] = []
+    steps.append(summarize(await service.upload_document(
+        str(files["v1"]), "HR-001", "員工工作規則", "人資部", "規章", "tester", metadata={"keywords": ["工時"]}
+    )))
+    steps.append(summarize(await service.upload_document(
+        str(files["binary"]), "IT-001", "掃描檔", "資訊部", "SOP", "tester"
+    )))
+    steps.append(summarize(await service.upload_document(
+        str(files["binary"]), "IT-002", "掃描檔副本", "資訊部", "SOP", "tester"
+    )))
+    steps.append(summarize(await service.upload_new_version("HR-001", str(files["v2"]), "tester", "修訂第100條")))
+    steps.append(sorted(doc.doc_code for doc in await service.search(keyword="工作規則")))
+    steps.append(sorted(doc.doc_code for doc in await service.search(keyword="工時")))
+    steps.append(sorted(doc.doc_code for doc in await service.search(keyword="it-")))
+    steps.append(await download("HR-001", 1, offset=10))
+    steps.append(await download("HR-001", 2, offset=1000, length=5000))
+    steps.append(await download("IT-001", offset=200_000, length=70_000))
+    steps.append(clean_stats(await service.get_statistics()))
+    steps.append(summarize(await service.archive_document("HR-001")))
+    steps.append(sorted(doc.doc_code for doc in await service.search(department="人資部")))
+    steps.append(summarize(await service.restore_document("HR-001")))
+    steps.append(await service.delete_document("IT-001"))
+    steps.append(await service.delete_document("HR-001"))
+    steps.append(summarize(await service.get_by_doc_code("HR-001")))
+    steps.append(clean_stats(await service.get_statistics()))
+    steps.append(clean_stats(await service.rebuild_statistics()))
+    return steps
+
+
+async def run_async_service(settings: Any, files: Dict[str, Path]) -> List[Any]:
+    conn = AsyncMongoDBConnection(settings)
+    try:
+        return await run_async(AsyncDocumentService(conn, cache=DocumentCache(0)), files)
+    finally:
+        await conn.close()
+
+
+def test_async_service_matches_sync(make_settings, make_connection, files):
+    sync_conn = make_connection()
+    async_settings = make_settings()
+    make_connection(async_settings)
+    expected = run_sync(DocumentService(sync_conn, cache=DocumentCache(0)), files)
+    actual = asyncio.run(run_async_service(async_settings, files))
+
+    assert len(actual) == len(expected)
+    for step, (got, want) in enumerate(zip(actual, expected)):
+        assert got == want, f"第 {step} 步結果不同"
+    # 刪除後的計數器（含連帶釋放的差異基底）與重建結果一致
+    assert expected[-2] == expected[-1]
+
+
+def test_async_ranged_download_matches_source(make_settings, files):
+    settings = make_settings()
+
+    async def scenario() -> None:
+        conn = AsyncMongoDBConnection(settings)
+        try:
+            service = AsyncDocumentService(conn, cache=DocumentCache(0))
+            await service.upload_document(str(files["v1"]), "HR-001", "員工工作規則", "人資部", "規章", "tester")
+            await service.upload_new_version("HR-001", str(files["v2"]), "tester")
+            await service.upload_document(str(files["binary"]), "IT-001", "掃描檔", "資訊部", "SOP", "tester")
+            for doc_code, version, source in (("HR-001", 1, "v1"), ("HR-001", 2, "v2"), ("IT-001", None, "binary")):
+                content = files[source].read_bytes()
+                for offset, length in ((0, None), (1, 100), (len(content) // 3, 65_000), (len(content), None)):
+                    data = b"".join([chunk async for chunk in service.iter_download(doc_code, version, offset, length)])
+                    end = None if length is None else offset + length
+                    assert data == content[offset:end]
+        finally:
+            await conn.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_delete_and_download_file(make_settings, make_connection, files, tmp_path):
+    settings = make_settings()
+    make_connection(settings)
+
+    async def scenario() -> None:
+        conn = AsyncMongoDBConnection(settings)
+        try:
+            service = AsyncDocumentService(conn, cache=DocumentCache(0))
+            await service.upload_document(str(files["v1"]), "HR-001", "員工工作規則", "人資部", "規章", "tester")
+            await service.upload_document(str(files["v1"]), "HR-002", "員工工作規則副本", "人資部", "規章", "tester")
+            saved = await service.download_file("HR-001", save_path=str(tmp_path), resume=True)
+            assert Path(saved).read_bytes() == files["v1"].read_bytes()
+            assert [path.name for path in tmp_path.glob("*.part")] == []
+
+            assert await service.delete_document("HR-001")
+            # 已被刪除的文件回傳 False，不再釋放共用的檔案
+            assert not await service.delete_document("HR-001")
+            blob = await conn.blobs.find_one({})
+            assert blob["ref_count"] == 1
+            stats = clean_stats(await service.get_statistics())
+            assert stats == clean_stats(await service.rebuild_statistics())
+        finally:
+            await conn.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""
+DocumentCache 與文件快照
+"""
+from datetime import datetime
+
+from bson import ObjectId
+
+from config.settings import Settings
+from services.cache import DocumentCache
+from services.document_service import document_snapshot, from_snapshot
+
+
+def raw_document() -> dict:
+    return {
+        "_id": ObjectId(),
+        "doc_code": "HR-001",
+        "title": "員工手冊",
+        "department": "人資部",
+        "category": "規章",
+        "metadata": {"keywords": ["工時"]},
+        "versions": [{
+            "version": 1, "file_name": "a.txt", "file_type": "txt", "file_id": ObjectId(),
+            "file_size": 5, "uploaded_by": "tester", "uploaded_at": datetime(2024, 1, 1),
+        }],
+    }
+
+
+def test_cache_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("DOC_CACHE_SIZE", raising=False)
+    assert Settings().doc_cache_size == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = DocumentCache(0, 60)
+    cache.put("key", b"value")
+    assert not cache.enabled
+    assert cache.get("key") is None
+
+
+def test_lru_eviction_and_invalidation():
+    cache = DocumentCache(2, 60)
+    cache.put("a", b"1", object_id=1)
+    cache.put("b", b"2", object_id=2)
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    cache.invalidate_id(1)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_put_skipped_after_invalidation_during_read():
+    cache = DocumentCache(10, 60)
+    generation = cache.generation
+    cache.invalidate("a")
+    cache.put("a", b"stale", generation=generation)
+    assert cache.get("a") is None
+
+
+def test_snapshot_hits_build_independent_documents():
+    snapshot = document_snapshot(raw_document())
+    first = from_snapshot(snapshot)
+    first.metadata["keywords"].append("加班")
+    first.versions[0].description = "changed"
+    second = from_snapshot(snapshot)
+    assert second.metadata == {"keywords": ["工時"]}
+    assert second.versions[0].description == ""
+    assert second is not first
+
+
+def test_snapshot_keeps_versions_lazy():
+    document = from_snapshot(document_snapshot(raw_document()))
+    assert object.__getattribute__(document, "_raw_versions")
+    assert document.versions[0].file_name == "a.txt"
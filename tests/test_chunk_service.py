@@ -0,0 +1,72 @@
+"""
+ChunkService 的 manifest 同步（需要 mongod）
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from services.chunk_service import ChunkService
+
+
+def write_chunks(directory: Path, doc_id: str, chunk_ids: List[str]) -> str:
+    name = f"{doc_id}_chunks.json"
+    (directory / name).write_text(json.dumps({
+        "doc_id": doc_id,
+        "version": 1,
+        "chunks": [
+            {"chunk_id": chunk_id, "article_number": f"第{i + 1}條", "content": f"{doc_id} 條文 {i + 1}"}
+            for i, chunk_id in enumerate(chunk_ids)
+        ],
+    }, ensure_ascii=False), encoding="utf-8")
+    return name
+
+
+def manifest_entry(doc_id: str, processed_path: str, processed: bool = True, version: int = 1) -> Dict[str, Any]:
+    return {"doc_id": doc_id, "versions": [{
+        "version": version,
+        "ai_processed": processed,
+        "processed_path": processed_path if processed else None,
+        "chunk_count": 2,
+        "ai_processed_at": "2024-01-01T00:00:00",
+    }]}
+
+
+def write_manifest(directory: Path, documents: List[Dict[str, Any]]) -> str:
+    path = directory / "manifest.json"
+    path.write_text(json.dumps({"documents": documents}, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def chunk_service(db_conn) -> ChunkService:
+    service = ChunkService(db_conn)
+    service.ensure_indexes()
+    return service
+
+
+def test_prune_keeps_documents_awaiting_processing(chunk_service, tmp_path):
+    law = write_chunks(tmp_path, "LAW-001", ["LAW-001_001", "LAW-001_002"])
+    rules = write_chunks(tmp_path, "HR-001", ["HR-001_001", "HR-001_002"])
+    chunk_service.sync_manifest(write_manifest(tmp_path, [
+        manifest_entry("LAW-001", law), manifest_entry("HR-001", rules),
+    ]))
+    assert chunk_service.collection.count_documents({}) == 4
+
+    # LAW-001 上傳新版本但尚未經 AI 處理；HR-001 已從 manifest 移除
+    result = chunk_service.sync_manifest(write_manifest(tmp_path, [
+        manifest_entry("LAW-001", law, processed=False, version=2),
+    ]), prune=True)
+    assert result.removed_docs == ["HR-001"]
+    assert chunk_service.collection.count_documents({"doc_id": "LAW-001"}) == 2
+    assert chunk_service.collection.count_documents({"doc_id": "HR-001"}) == 0
+
+
+def test_chunk_id_collision_is_rejected(chunk_service):
+    chunk = {"chunk_id": "SHARED_001", "article_number": "第1條", "content": "條文"}
+    chunk_service.sync_chunks("LAW-001", 1, [chunk])
+    with pytest.raises(ValueError):
+        chunk_service.sync_chunks("LAW-002", 1, [dict(chunk, content="另一份文件的條文")])
+    assert chunk_service.get_chunk("SHARED_001").doc_id == "LAW-001"
+    assert chunk_service.get_chunk("SHARED_001").content == "條文"
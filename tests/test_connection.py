@@ -0,0 +1,60 @@
+"""
+MongoDBConnection 的 fork 安全（不需要 mongod：MongoClient 建立時不連線）
+"""
+import dataclasses
+import os
+import threading
+import time
+
+import pytest
+
+import db.connection as connection_module
+from config.settings import get_settings
+from db.connection import MongoDBConnection
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 os.fork")
+
+
+def test_forked_child_threads_share_one_reconnect(monkeypatch):
+    settings = dataclasses.replace(get_settings(), mongo_min_pool_size=0)
+    conn = MongoDBConnection(settings, name="fork-test")
+    parent_client = conn.client
+    created = []
+
+    class SlowClient(connection_module.MongoClient):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            time.sleep(0.05)  # 拉長建立時間，讓其他執行緒同時檢查 PID
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(connection_module, "MongoClient", SlowClient)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # 子行程：多個執行緒同時第一次使用連線
+        status = 1
+        try:
+            clients = []
+            threads = [threading.Thread(target=lambda: clients.append(conn.client)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            ok = (
+                len(created) == 1
+                and len({id(client) for client in clients}) == 1
+                and clients[0] is not parent_client
+                and conn.pid == os.getpid()
+            )
+            os.write(write_fd, b"1" if ok else b"0")
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    assert result == b"1"
+    # 父行程的連線不受影響
+    assert conn.client is parent_client and not created
+    conn.close()
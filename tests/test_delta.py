@@ -0,0 +1,173 @@
+"""
+差異編碼與差異儲存（寫入與還原需要 mongod）
+"""
+import dataclasses
+import random
+
+import pytest
+
+from config import settings as settings_module
+from config.settings import get_settings
+from services.cache import DocumentCache
+from services.delta import (
+    apply_chain,
+    apply_delta,
+    chain_limit,
+    delta_base_eligible,
+    make_delta,
+    MAX_DELTA_RATIO,
+    worthwhile,
+)
+from services.document_service import DocumentService
+from services.file_store import delta_depth, FileStore
+
+
+def numbered_lines(count: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    return [f"第{i}條 {rng.getrandbits(48):012x} 員工應遵守本規則\n".encode("utf-8") for i in range(count)]
+
+
+@pytest.fixture
+def delta_settings(monkeypatch):
+    """啟用差異儲存、快照間隔 3 的設定"""
+    settings = dataclasses.replace(get_settings(), delta_storage=True, delta_snapshot_interval=3)
+    monkeypatch.setattr(settings_module, "_settings", settings)
+    return settings
+
+
+# ------------------------------------------------------------
+# make_delta / apply_delta
+# ------------------------------------------------------------
+@pytest.mark.parametrize("base, data", [
+    (b"", b""),
+    (b"", b"new\ncontent"),
+    (b"old\ncontent\n", b""),
+    (b"same\nlines\n", b"same\nlines\n"),
+    (b"a\nb\nc", b"a\nb\nc\nd"),  # 最後一行沒有換行
+    (b"a\r\nb\r\nc\r\n", b"a\r\nB\r\nc\r\n"),
+    ("甲\n乙\n丙\n".encode("utf-8"), "甲\n乙改\n丙\n丁\n".encode("utf-8")),
+    (b"\x00\xff\nbinary\n", b"\x00\xfe\nbinary\n"),
+])
+def test_delta_round_trip(base, data):
+    assert apply_delta(base, make_delta(base, data)) == data
+
+
+def test_delta_round_trip_with_edits():
+    base_lines = numbered_lines(500)
+    lines = list(base_lines)
+    lines[10] = "第10條 修訂\n".encode("utf-8")
+    del lines[200:205]
+    lines.insert(300, "新增條文\n".encode("utf-8"))
+    lines.append(b"no newline at end")
+    base, data = b"".join(base_lines), b"".join(lines)
+
+    delta = make_delta(base, data)
+    assert apply_delta(base, delta) == data
+    assert worthwhile(delta, data)
+
+
+def test_identical_content_is_a_single_copy():
+    base = b"".join(numbered_lines(100))
+    delta = make_delta(base, base)
+    assert len(delta) < 32
+    assert apply_delta(base, delta) == base
+
+
+def test_apply_delta_rejects_bad_input():
+    with pytest.raises(ValueError):
+        apply_delta(b"base", b"XXXX")
+    with pytest.raises(ValueError):
+        apply_delta(b"short", make_delta(b"a much longer base\n", b"a much longer base\n"))
+    with pytest.raises(ValueError):
+        apply_delta(b"", make_delta(b"", b"x") + b"Z")
+
+
+def test_apply_chain_applies_from_snapshot():
+    versions = [b"".join(numbered_lines(50))]
+    for i in range(4):
+        lines = versions[-1].splitlines(keepends=True)
+        lines[i * 7] = f"修訂 {i}\n".encode("utf-8")
+        versions.append(b"".join(lines))
+    # 由最新版往快照方向排列
+    deltas = [make_delta(versions[i - 1], versions[i]) for i in range(len(versions) - 1, 0, -1)]
+    assert apply_chain(versions[0], deltas) == versions[-1]
+    assert apply_chain(versions[0], []) == versions[0]
+
+
+def test_worthwhile_ratio():
+    data = b"x" * 1000
+    assert worthwhile(b"d" * int(len(data) * MAX_DELTA_RATIO), data)
+    assert not worthwhile(b"d" * (int(len(data) * MAX_DELTA_RATIO) + 1), data)
+    assert not worthwhile(make_delta(b"", data), data)
+
+
+def test_delta_base_eligible(delta_settings, monkeypatch):
+    assert delta_base_eligible("rules.txt", 1000)
+    assert not delta_base_eligible("scan.pdf", 1000)
+    monkeypatch.setattr(settings_module, "_settings", dataclasses.replace(delta_settings, delta_max_size=999))
+    assert not delta_base_eligible("rules.txt", 1000)
+
+
+def test_chain_limit_and_depth(delta_settings):
+    assert chain_limit() == 3
+    assert chain_limit(7) == 7
+    assert delta_depth(None) == 0
+    assert delta_depth({"delta": {"depth": 2}}) == 2
+
+
+# ------------------------------------------------------------
+# 差異儲存（需要 mongod）
+# ------------------------------------------------------------
+def test_put_delta_snapshots_at_interval(db_conn, delta_settings):
+    store = FileStore(db_conn)
+    lines = numbered_lines(400)
+    contents = []
+    stored = []
+    for i in range(6):
+        lines[i * 20] = f"第{i * 20}條 第 {i} 次修訂\n".encode("utf-8")
+        contents.append(b"".join(lines))
+        if not stored:
+            stored.append(store.put_bytes(contents[-1], "rules.txt"))
+        else:
+            previous = stored[-1]
+            stored.append(store.put_delta(contents[-1], "rules.txt", previous.file_id, previous.content_hash))
+
+    files = db_conn.db["fs.files"]
+    depths = [delta_depth(files.find_one({"_id": s.file_id})["metadata"]) for s in stored]
+    # 深度達到快照間隔時改存完整內容
+    assert depths == [0, 1, 2, 0, 1, 2]
+    for s, content in zip(stored, contents):
+        assert s.file_size == len(content)
+        assert store.read_content(s.file_id) == content
+    assert stored[1].stored_size < len(contents[1]) * MAX_DELTA_RATIO
+
+
+def test_read_content_rejects_overlong_chain(db_conn, delta_settings, monkeypatch):
+    store = FileStore(db_conn)
+    lines = numbered_lines(400)
+    first = store.put_bytes(b"".join(lines), "rules.txt")
+    lines[0] = "修訂\n".encode("utf-8")
+    second = store.put_delta(b"".join(lines), "rules.txt", first.file_id, first.content_hash)
+    assert store.read_content(second.file_id) == b"".join(lines)
+
+    # 記錄的深度與實際鏈長度不符（資料損毀）時不無限追溯
+    db_conn.db["fs.files"].update_one({"_id": second.file_id}, {"$set": {"metadata.delta.depth": 0}})
+    monkeypatch.setattr(settings_module, "_settings", dataclasses.replace(delta_settings, delta_snapshot_interval=0))
+    with pytest.raises(ValueError):
+        store.read_content(second.file_id)
+
+
+def test_new_version_over_ineligible_base_is_stored_in_full(db_conn, delta_settings, tmp_path):
+    service = DocumentService(db_conn, cache=DocumentCache(0))
+    scan = tmp_path / "scan.pdf"
+    scan.write_bytes(b"".join(numbered_lines(400)))
+    rules = tmp_path / "rules.txt"
+    rules.write_bytes(b"".join(numbered_lines(400)[:-1]))
+    service.upload_document(str(scan), "HR-001", "員工工作規則", "人資部", "規章", "tester")
+    service.upload_new_version("HR-001", str(rules), "tester")
+
+    # 前一版不適用差異儲存（PDF）：新版本存完整內容，不讀入前一版
+    version = db_conn.documents.find_one({"doc_code": "HR-001"})["versions"][-1]
+    assert version["version"] == 2
+    assert delta_depth(db_conn.db["fs.files"].find_one({"_id": version["file_id"]})["metadata"]) == 0
+    assert service.store.read_content(version["file_id"]) == rules.read_bytes()
@@ -0,0 +1,53 @@
+"""
+DocumentService 上傳與刪除的並行情境（需要 mongod）
+"""
+from pathlib import Path
+
+import pytest
+
+from services.cache import DocumentCache
+from services.document_service import DocumentService
+
+
+@pytest.fixture
+def service(db_conn) -> DocumentService:
+    return DocumentService(db_conn, cache=DocumentCache(0))
+
+
+@pytest.fixture
+def rules(tmp_path: Path) -> Path:
+    path = tmp_path / "rules.txt"
+    path.write_text("".join(f"第{i}條 員工每日工作時間不得超過八小時\n" for i in range(200)), encoding="utf-8")
+    return path
+
+
+def blob_refs(conn) -> int:
+    return sum(blob["ref_count"] for blob in conn.blobs.find({}, {"ref_count": 1}))
+
+
+def test_duplicate_upload_race_releases_blob(service, rules, monkeypatch):
+    service.upload_document(str(rules), "HR-001", "員工工作規則", "人資部", "規章", "tester")
+    assert blob_refs(service.conn) == 1
+
+    # 另一個請求在檢查之後才寫入同一編號
+    monkeypatch.setattr(service, "get_by_doc_code", lambda *args, **kwargs: None)
+    with pytest.raises(ValueError):
+        service.upload_document(str(rules), "HR-001", "員工工作規則", "人資部", "規章", "tester")
+    assert blob_refs(service.conn) == 1
+    assert service.conn.documents.count_documents({}) == 1
+
+
+def test_delete_releases_files_once(service, rules):
+    service.upload_document(str(rules), "HR-001", "員工工作規則", "人資部", "規章", "tester")
+    service.upload_document(str(rules), "HR-002", "員工工作規則副本", "人資部", "規章", "tester")
+    assert blob_refs(service.conn) == 2
+
+    assert service.delete_document("HR-001")
+    # 已被刪除的文件不再釋放檔案（同時刪除時只有一方成功）
+    assert not service.delete_document("HR-001")
+    assert blob_refs(service.conn) == 1
+    assert service.conn.fs.exists(service.get_by_doc_code("HR-002").versions[0].file_id)
+    stats, rebuilt = service.get_statistics(), service.rebuild_statistics()
+    stats.pop("updated_at", None)
+    rebuilt.pop("updated_at", None)
+    assert stats == rebuilt
@@ -0,0 +1,42 @@
+"""
+下載的儲存路徑與接續位置
+"""
+from datetime import datetime
+
+from bson import ObjectId
+
+from models.document import Version
+from services.document_service import download_paths
+
+
+def make_version(file_size: int = 100) -> Version:
+    return Version(1, "rules.txt", "txt", ObjectId(), file_size, "tester", datetime(2024, 1, 1))
+
+
+def test_save_path_directory_file_and_default(tmp_path):
+    version = make_version()
+    assert download_paths(version, str(tmp_path), False)[0] == str(tmp_path / "rules.txt")
+    assert download_paths(version, str(tmp_path / "out.txt"), False)[0] == str(tmp_path / "out.txt")
+    assert download_paths(version, None, False)[0] == "rules.txt"
+
+
+def test_resume_only_continues_the_same_file(tmp_path):
+    old, new = make_version(), make_version()
+    file_path, old_part, _ = download_paths(old, str(tmp_path), True)
+    with open(old_part, "wb") as f:
+        f.write(b"x" * 40)
+
+    assert download_paths(old, str(tmp_path), True) == (file_path, old_part, 40)
+    assert download_paths(old, str(tmp_path), False)[2] == 0
+    # 兩次下載之間上傳了新版本：使用另一個暫存檔，從頭下載
+    _, new_part, offset = download_paths(new, str(tmp_path), True)
+    assert new_part != old_part and str(new.file_id) in new_part
+    assert offset == 0
+
+
+def test_resume_restarts_when_part_is_too_large(tmp_path):
+    version = make_version(file_size=10)
+    _, part_path, _ = download_paths(version, str(tmp_path), True)
+    with open(part_path, "wb") as f:
+        f.write(b"x" * 11)
+    assert download_paths(version, str(tmp_path), True)[2] == 0
@@ -0,0 +1,74 @@
+"""
+HashingEmbedder：結果固定、NFKC 正規化與單位向量
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.embedding import chunk_text, get_embedder, HashingEmbedder, normalize_rows  # noqa: E402
+
+
+def cosine(a, b) -> float:
+    return float(np.dot(a, b))
+
+
+def test_embedding_is_deterministic():
+    texts = ["員工每日工作時間不得超過八小時", "延長工時應經勞資會議同意"]
+    first = HashingEmbedder(256).embed(texts)
+    second = HashingEmbedder(256).embed(texts)
+    assert first.dtype == np.float32
+    assert first.shape == (2, 256)
+    assert np.array_equal(first, second)
+    # 批次與單筆結果相同
+    assert np.array_equal(first[1], HashingEmbedder(256).embed_one(texts[1]))
+
+
+def test_embedding_applies_nfkc_and_lowercase():
+    embedder = HashingEmbedder(128)
+    assert embedder.grams("ＡＢ１") == embedder.grams("ab1")
+    assert np.array_equal(embedder.embed_one("ＩＳＯ　９００１"), embedder.embed_one("iso 9001"))
+    # 標點與空白只是分隔
+    assert embedder.grams("第30條（工時）") == embedder.grams("第30條 工時")
+
+
+def test_grams_per_segment():
+    embedder = HashingEmbedder(64, min_n=1, max_n=2)
+    assert embedder.grams("ab cd") == ["a", "b", "ab", "c", "d", "cd"]
+    assert embedder.grams("") == []
+
+
+def test_embeddings_are_unit_vectors():
+    vectors = HashingEmbedder(512).embed(["勞動基準法", "加班費怎麼計算", "a", "", "!!!"])
+    norms = np.linalg.norm(vectors, axis=1)
+    assert np.allclose(norms[:3], 1.0, atol=1e-6)
+    # 沒有 n-gram 的文字為零向量
+    assert np.all(vectors[3:] == 0)
+
+
+def test_similar_texts_score_higher():
+    embedder = HashingEmbedder(512)
+    query = embedder.embed_one("延長工作時間")
+    related = embedder.embed_one("雇主延長勞工之工作時間者，應給付加班費")
+    unrelated = embedder.embed_one("資訊安全政策與密碼管理")
+    assert cosine(query, related) > cosine(query, unrelated)
+
+
+def test_normalize_rows_keeps_zero_rows():
+    vectors = normalize_rows(np.array([[3, 4], [0, 0]], dtype=np.float64))
+    assert vectors.dtype == np.float32
+    assert np.allclose(vectors, [[0.6, 0.8], [0, 0]])
+
+
+def test_embedder_parameters():
+    assert HashingEmbedder(256, 2, 4).name == "hashing-256-24"
+    assert get_embedder("hashing", 64).dim == 64
+    with pytest.raises(ValueError):
+        HashingEmbedder(0)
+    with pytest.raises(ValueError):
+        HashingEmbedder(64, min_n=3, max_n=2)
+    with pytest.raises(ValueError):
+        get_embedder("unknown", 64)
+
+
+def test_chunk_text_skips_empty_parts():
+    assert chunk_text({"title": "第1條", "summary": None, "content": "內容"}) == "第1條\n內容"
@@ -0,0 +1,150 @@
+"""
+串流 JSON 解析：與 json.load 的結果比對（以極小的讀取大小讓值跨越緩衝區邊界）
+"""
+import io
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from services.json_stream import iter_json_array, JSONArrayStream, JSONLinesStream, open_array_stream
+
+# 1 與 2 讓每個值都被切開；7、64 測試一般的邊界位置
+READ_SIZES = (1, 2, 3, 7, 64)
+
+ARTICLES = [
+    {"article_number": "第1條", "content": "為規定勞動條件最低標準，特制定本法。", "score": -12.5e-3},
+    {"article_number": "第2條", "content": "引號 \" 反斜線 \\ 換行 \n 跳脫 é 😀", "tags": []},
+    {"nested": {"a": [1, 2, {"b": None}], "c": {"d": {"e": [True, False]}}}, "empty": {}},
+    12345678901234567890,
+    -0.0,
+    "字串",
+    [],
+    None,
+]
+
+
+def stream_result(text: str, key: Optional[str], read_size: int) -> Tuple[List[Any], Dict[str, Any]]:
+    with JSONArrayStream(io.StringIO(text), key, read_size=read_size) as stream:
+        items = list(stream)
+        return items, stream.header
+
+
+def expected_result(text: str, key: Optional[str]) -> Tuple[List[Any], Dict[str, Any]]:
+    data = json.load(io.StringIO(text))
+    if key is None:
+        return data, {}
+    if not isinstance(data.get(key), list):  # 同名欄位不是陣列時視為一般欄位
+        return [], data
+    return data[key], {name: value for name, value in data.items() if name != key}
+
+
+@pytest.mark.parametrize("read_size", READ_SIZES)
+@pytest.mark.parametrize("text, key", [
+    (json.dumps({"law_name": "勞動基準法", "version": 3, "articles": ARTICLES}, ensure_ascii=False), "articles"),
+    (json.dumps({"law_name": "勞動基準法", "articles": ARTICLES}, ensure_ascii=True, indent=2), "articles"),
+    # 陣列之後的欄位
+    (json.dumps({"doc_id": "LAW-001", "chunks": ARTICLES, "total": 8, "meta": {"x": [1.5e10]}}), "chunks"),
+    (json.dumps(ARTICLES), None),
+    ('{"articles": []}', "articles"),
+    ("[]", None),
+    ('{"a": 1, "articles" : [ 1 ,2,\n\t3 ] , "b": "end"}', "articles"),
+    # 同名欄位不是陣列時視為一般欄位
+    ('{"articles": 5}', "articles"),
+    ('{"other": [1, 2]}', "articles"),
+    ("{}", "articles"),
+])
+def test_matches_json_load(text, key, read_size):
+    assert stream_result(text, key, read_size) == expected_result(text, key)
+
+
+@pytest.mark.parametrize("read_size", READ_SIZES)
+def test_numbers_split_at_buffer_boundaries(read_size):
+    numbers = [0, -1, 10, 123456789, -2.5, 1e-7, 6.02e23, -0.125, 1.0]
+    text = "[" + ",".join(repr(n) for n in numbers) + "]"
+    assert stream_result(text, None, read_size)[0] == json.loads(text)
+    # 檔尾的數字後沒有分隔字元
+    assert stream_result('{"n": [1], "last": 12345}', "n", read_size)[1] == {"last": 12345}
+
+
+def test_header_available_before_iteration_and_after():
+    text = json.dumps({"law_name": "勞動基準法", "articles": [1, 2], "updated": "2024-01-01"})
+    with JSONArrayStream(io.StringIO(text), "articles", read_size=4) as stream:
+        assert stream.found
+        assert stream.header == {"law_name": "勞動基準法"}
+        assert list(stream) == [1, 2]
+        assert stream.header == {"law_name": "勞動基準法", "updated": "2024-01-01"}
+        with pytest.raises(RuntimeError):
+            list(stream)
+
+
+def test_top_level_value_must_be_array():
+    with pytest.raises(ValueError):
+        stream_result('"not an array"', None, 64)
+    with pytest.raises(ValueError):
+        stream_result("[1, 2]", "articles", 64)
+
+
+def test_missing_array_reads_header_only():
+    with JSONArrayStream(io.StringIO('{"a": 1, "b": [2]}'), "articles") as stream:
+        assert not stream.found
+        assert list(stream) == []
+        assert stream.header == {"a": 1, "b": [2]}
+
+
+@pytest.mark.parametrize("read_size", (1, 5, 64))
+@pytest.mark.parametrize("text, key", [
+    ('{"articles": [1, 2', "articles"),
+    ('{"articles": [{"a": ', "articles"),
+    ('{"articles": ["unterminated', "articles"),
+    ('{"articles": [1, 2]', "articles"),
+    ('{"articles": [1 2]}', "articles"),
+    ('{"articles": [1,, 2]}', "articles"),
+    ('{"law_name" "x", "articles": []}', "articles"),
+    ("[1, 2", None),
+    ("", None),
+    ("[tru]", None),
+])
+def test_truncated_or_malformed_input_raises(text, key, read_size):
+    with pytest.raises(ValueError):
+        stream_result(text, key, read_size)
+    with pytest.raises(ValueError):
+        json.loads(text)
+
+
+def test_file_path_with_bom(tmp_path):
+    path = tmp_path / "law.json"
+    path.write_text(json.dumps({"law_name": "勞動基準法", "articles": ARTICLES}, ensure_ascii=False), encoding="utf-8-sig")
+    with open_array_stream(str(path), "articles") as stream:
+        assert isinstance(stream, JSONArrayStream)
+        assert stream.header == {"law_name": "勞動基準法"}
+        assert list(stream) == ARTICLES
+    assert list(iter_json_array(str(path), "articles")) == ARTICLES
+
+
+# ------------------------------------------------------------
+# JSON Lines
+# ------------------------------------------------------------
+def test_json_lines_with_header(tmp_path):
+    path = tmp_path / "chunks.jsonl"
+    lines = [json.dumps({"doc_id": "LAW-001", "version": 2, "chunks": []})]
+    lines += [json.dumps(item, ensure_ascii=False) for item in ARTICLES]
+    path.write_text("\n".join(lines[:3]) + "\n\n   \n" + "\n".join(lines[3:]) + "\n", encoding="utf-8")
+    with open_array_stream(str(path), "chunks") as stream:
+        assert isinstance(stream, JSONLinesStream)
+        assert stream.header == {"doc_id": "LAW-001", "version": 2}
+        assert list(stream) == ARTICLES
+
+
+def test_json_lines_without_header():
+    source = io.StringIO("\n".join(json.dumps(item) for item in ARTICLES))
+    with JSONLinesStream(source, "chunks") as stream:
+        assert stream.header == {}
+        assert list(stream) == ARTICLES
+    assert list(JSONLinesStream(io.StringIO(""), "chunks")) == []
+
+
+def test_json_lines_reports_bad_line():
+    stream = JSONLinesStream(io.StringIO('{"chunks": []}\n{"a": 1}\n\n{"b": \n'), "chunks")
+    with pytest.raises(ValueError, match="第 4 行"):
+        list(stream)
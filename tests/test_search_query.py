@@ -0,0 +1,119 @@
+"""
+關鍵字搜尋條件：跳脫使用者輸入，以及每個條件都使用索引（explain 測試需要 mongod）
+"""
+import re
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+from services.document_service import build_search_query, keyword_query
+from services.text_search import TEXT_INDEX_NAME, TOKENS_FIELD, tokenize
+
+
+def doc_code_patterns(query: Dict[str, Any]) -> List[re.Pattern]:
+    return next(clause["doc_code"]["$in"] for clause in query["$or"] if "doc_code" in clause)
+
+
+# ------------------------------------------------------------
+# 條件組成
+# ------------------------------------------------------------
+def test_keyword_query_clauses():
+    query = keyword_query("hr-手冊")
+    assert query["$or"][0] == {"$text": {"$search": '"hr" "手冊"'}}
+    assert {"metadata.keywords": "hr-手冊"} in query["$or"]
+    assert sorted(p.pattern for p in doc_code_patterns(query)) == ["^HR\\-手冊", "^hr\\-手冊"]
+
+
+def test_keyword_query_escapes_regex_metacharacters():
+    keyword = "a.b*(c|d)[e]^$+?{2}\\"
+    patterns = doc_code_patterns(keyword_query(keyword))
+    for pattern in patterns:
+        assert pattern.pattern.startswith("^")
+    assert any(p.match(keyword + "-001") for p in patterns)
+    assert any(p.match(keyword.upper() + "-001") for p in patterns)
+    # 特殊字元不被當作正規表示式
+    assert not any(p.match("aXbbb(c|d)[e]") for p in patterns)
+    assert not any(p.match("x" + keyword) for p in patterns)
+
+
+def test_keyword_query_keeps_raw_keyword_for_exact_keywords_match():
+    keyword = ".*"
+    query = keyword_query(keyword)
+    assert {"metadata.keywords": ".*"} in query["$or"]
+    assert [p.pattern for p in doc_code_patterns(query)] == ["^\\.\\*"]
+    # 沒有可查詢的詞時不加入 $text
+    assert not any("$text" in clause for clause in query["$or"])
+
+
+def test_build_search_query_excludes_archived_by_default():
+    assert build_search_query(keyword="手冊")["status"] == {"$ne": "archived"}
+    assert "status" not in build_search_query(include_archived=True)
+
+
+# ------------------------------------------------------------
+# explain：每個條件都走索引（需要 mongod）
+# ------------------------------------------------------------
+def plan_stages(plan: Any) -> Iterator[Tuple[str, str]]:
+    """走訪 explain 的查詢計畫，產生 (stage, indexName)"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"], plan.get("indexName", "")
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def winning_plan(conn, query: Dict[str, Any]) -> List[Tuple[str, str]]:
+    explain = conn.documents.find(query).explain()
+    return list(plan_stages(explain["queryPlanner"]["winningPlan"]))
+
+
+@pytest.fixture
+def search_conn(db_conn):
+    titles = ["員工手冊", "資訊安全政策", "請假規則", "採購作業程序", "ISO 9001 稽核程序"]
+    db_conn.documents.insert_many([
+        {
+            "doc_code": f"{prefix}-{i:04d}",
+            "title": f"{titles[i % len(titles)]} {i}",
+            TOKENS_FIELD: tokenize(f"{titles[i % len(titles)]} {i}"),
+            "department": "人資部",
+            "category": "規章",
+            "status": "active",
+            "metadata": {"keywords": [f"kw{i % 50}"]},
+        }
+        for prefix in ("HR", "IT", "PUR")
+        for i in range(300)
+    ])
+    return db_conn
+
+
+def test_keyword_query_uses_text_and_index_scans(search_conn):
+    stages = winning_plan(search_conn, keyword_query("員工手冊"))
+    names = {stage for stage, _ in stages}
+    indexes = {index for _, index in stages}
+    assert "COLLSCAN" not in names
+    assert any(stage.startswith("TEXT") for stage in names)
+    assert {TEXT_INDEX_NAME, "idx_doc_code", "idx_keywords"} <= indexes
+
+
+def test_doc_code_prefix_regex_uses_index_scan(search_conn):
+    query = {"$or": [clause for clause in keyword_query("hr-00")["$or"] if "doc_code" in clause]}
+    stages = winning_plan(search_conn, query)
+    assert ("IXSCAN", "idx_doc_code") in stages
+    assert "COLLSCAN" not in {stage for stage, _ in stages}
+    assert search_conn.documents.count_documents(query) == 100
+
+
+def test_metadata_keywords_uses_index_scan(search_conn):
+    stages = winning_plan(search_conn, {"metadata.keywords": "kw7"})
+    assert ("IXSCAN", "idx_keywords") in stages
+    assert "COLLSCAN" not in {stage for stage, _ in stages}
+
+
+def test_search_query_with_filters_avoids_collscan(search_conn):
+    query = build_search_query(keyword="kw7")
+    stages = winning_plan(search_conn, query)
+    assert "COLLSCAN" not in {stage for stage, _ in stages}
+    assert search_conn.documents.count_documents(query) == 18
@@ -0,0 +1,56 @@
+"""
+services.text_search 的斷詞與 $text 條件
+"""
+from services.text_search import query_terms, text_query, tokenize
+
+
+def test_tokenize_cjk_unigrams_and_bigrams():
+    assert tokenize("員工手冊") == ["員", "工", "手", "冊", "員工", "工手", "手冊"]
+
+
+def test_tokenize_mixed_text_lowercases_words_and_drops_punctuation():
+    assert tokenize("ISO-9001 稽核，Policy v2") == ["iso", "9001", "稽", "核", "稽核", "policy", "v2"]
+
+
+def test_tokenize_deduplicates_in_order():
+    assert tokenize("工作工作") == ["工", "作", "工作", "作工"]
+
+
+def test_tokenize_empty():
+    assert tokenize("") == []
+    assert tokenize(None) == []
+    assert tokenize("、。！") == []
+
+
+def test_query_terms_use_bigrams_for_cjk_runs():
+    assert query_terms("員工手冊") == ["員工", "工手", "手冊"]
+
+
+def test_query_terms_single_cjk_character():
+    assert query_terms("員") == ["員"]
+    assert query_terms("員 手冊") == ["員", "手冊"]
+
+
+def test_query_terms_mixed_text():
+    assert query_terms("ISO 9001 稽核") == ["iso", "9001", "稽核"]
+
+
+def test_query_terms_are_indexed_tokens_of_matching_title():
+    # 標題包含關鍵字時，查詢的每個詞都在標題的索引詞中（match_all 才找得到）
+    title = "113年度員工手冊（修訂版）ISO 9001"
+    tokens = set(tokenize(title))
+    for keyword in ("員工手冊", "員", "修訂", "度員工", "iso", "9001"):
+        assert set(query_terms(keyword)) <= tokens, keyword
+
+
+def test_text_query_match_all_quotes_each_term():
+    assert text_query("員工手冊") == {"$text": {"$search": '"員工" "工手" "手冊"'}}
+
+
+def test_text_query_match_any_leaves_terms_unquoted():
+    assert text_query("員工手冊 iso", match_all=False) == {"$text": {"$search": "員工 工手 手冊 iso"}}
+
+
+def test_text_query_without_terms():
+    assert text_query("") == {}
+    assert text_query("－／！") == {}
@@ -0,0 +1,124 @@
+"""
+VectorIndex 的新增、更新、刪除與 top_k
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.vector_index import top_k, VectorIndex  # noqa: E402
+
+
+def unit(*values: float) -> "np.ndarray":
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def random_vectors(count: int, dim: int, seed: int = 5) -> "np.ndarray":
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+def brute_force(vectors: "np.ndarray", query: "np.ndarray", k: int) -> list:
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return np.argsort(-scores, kind="stable")[:k].tolist()
+
+
+# ------------------------------------------------------------
+# top_k
+# ------------------------------------------------------------
+def test_top_k_orders_by_score():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7], [0.4, 0.2, 0.8, 0.0]], dtype=np.float32)
+    positions, values = top_k(scores, 2)
+    assert positions.tolist() == [[1, 3], [2, 0]]
+    assert np.allclose(values, [[0.9, 0.7], [0.8, 0.4]])
+
+
+def test_top_k_larger_than_columns():
+    scores = np.array([[0.3, 0.1, 0.2]], dtype=np.float32)
+    positions, values = top_k(scores, 10)
+    assert positions.tolist() == [[0, 2, 1]]
+    assert values.shape == (1, 3)
+
+
+def test_top_k_matches_full_sort():
+    scores = random_vectors(3, 300)
+    positions, _ = top_k(scores, 7)
+    assert positions.tolist() == np.argsort(-scores, axis=1, kind="stable")[:, :7].tolist()
+
+
+# ------------------------------------------------------------
+# VectorIndex
+# ------------------------------------------------------------
+def test_add_and_search():
+    index = VectorIndex(3)
+    index.add(["x", "y", "z"], np.array([[1, 0, 0], [0, 2, 0], [0, 0, 3]], dtype=np.float32))
+    assert len(index) == 3 and "y" in index
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1.0)
+    hits = index.search(unit(0.1, 1, 0), k=2)
+    assert [item_id for item_id, _ in hits] == ["y", "x"]
+    assert hits[0][1] == pytest.approx(float(unit(0.1, 1, 0)[1]), abs=1e-6)
+
+
+def test_add_validates_length():
+    index = VectorIndex(2)
+    with pytest.raises(ValueError):
+        index.add(["a", "b"], np.ones((3, 2), dtype=np.float32))
+
+
+def test_add_updates_existing_ids():
+    index = VectorIndex(2)
+    index.add(["a", "b"], np.array([[1, 0], [0, 1]], dtype=np.float32))
+    index.add(["b", "c"], np.array([[1, 1], [-1, 0]], dtype=np.float32))
+    assert index.ids == ["a", "b", "c"]
+    assert np.allclose(index.vectors[1], unit(1, 1))
+
+
+def test_add_duplicate_ids_in_one_batch_keeps_last():
+    index = VectorIndex(2)
+    index.add(["a", "b", "a"], np.array([[1, 0], [0, 1], [-1, 0]], dtype=np.float32))
+    assert index.ids == ["b", "a"]
+    assert np.allclose(index.vectors[index.rows_for(["a"])[0]], [-1, 0])
+    # 已存在的 id 重複出現時同樣以最後一個為準
+    index.add(["b", "b"], np.array([[1, 1], [1, -1]], dtype=np.float32))
+    assert len(index) == 2
+    assert np.allclose(index.vectors[index.rows_for(["b"])[0]], unit(1, -1))
+
+
+def test_remove_swaps_last_row_into_gap():
+    vectors = random_vectors(5, 4)
+    index = VectorIndex(4)
+    index.add(["a", "b", "c", "d", "e"], vectors)
+    assert index.remove(["b", "missing"]) == 1
+    assert index.ids == ["a", "e", "c", "d"]
+    assert index.rows_for(["e", "b", "d"]).tolist() == [1, 3]
+    assert np.allclose(index.vectors[1], vectors[4] / np.linalg.norm(vectors[4]))
+    # 刪除最後一列不需搬移
+    assert index.remove(["d"]) == 1
+    assert index.ids == ["a", "e", "c"]
+    assert index.remove(["a", "e", "c"]) == 3
+    assert len(index) == 0 and index.search(unit(1, 0, 0, 0)) == []
+
+
+def test_capacity_grows_and_search_matches_brute_force():
+    vectors = random_vectors(3000, 16)
+    ids = [f"id{i}" for i in range(len(vectors))]
+    index = VectorIndex(16, capacity=10)
+    for start in range(0, len(ids), 700):
+        index.add(ids[start:start + 700], vectors[start:start + 700])
+    assert len(index) == 3000 and index.nbytes >= index.vectors.nbytes
+
+    queries = random_vectors(4, 16, seed=9)
+    for query, hits in zip(queries, index.search_batch(queries, k=10)):
+        assert [item_id for item_id, _ in hits] == [ids[i] for i in brute_force(vectors, query, 10)]
+
+
+def test_search_restricted_rows():
+    vectors = random_vectors(50, 8)
+    ids = [f"id{i}" for i in range(50)]
+    index = VectorIndex(8)
+    index.add(ids, vectors)
+    allowed = [f"id{i}" for i in range(0, 50, 5)]
+    hits = index.search(vectors[3], k=4, rows=index.rows_for(allowed))
+    expected = brute_force(vectors[::5], vectors[3], 4)
+    assert [item_id for item_id, _ in hits] == [allowed[i] for i in expected]
+    assert index.search(vectors[3], k=4, rows=index.rows_for([])) == []